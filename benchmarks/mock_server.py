@@ -0,0 +1,296 @@
+"""
+A local stand-in for the Calcbench API that serves synthetic data.
+
+Responses are generated (and gzipped) once per size and kept in memory so the server is not what is being measured.
+
+Usage::
+
+    >>> server = MockCalcbenchServer(sizes={"mappedData": 100_000})
+    >>> server.start()
+    >>> cb.standardized(company_identifiers=["MSFT"], metrics=["revenue"])
+    >>> server.stop()
+
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import calcbench as cb
+from calcbench.api_client import _rig_for_testing
+
+DEFAULT_SIZES = {
+    "mappedData": 100_000,
+    "dimensionalData": 50_000,
+    "footnoteSearch": 5_000,
+    "rawXBRLData": 100_000,
+    "filingsV2": 20_000,
+}
+"""
+Number of items returned by each end-point
+"""
+
+FOOTNOTE_PAGE_SIZE = 1_000
+
+TICKERS = [f"T{i:04}" for i in range(500)]
+PERIODS = ["1Q", "2Q", "3Q", "Y"]
+
+
+def standardized_point(i: int) -> Dict[str, Any]:
+    year = 2000 + i % 24
+    period = i % 5
+    return {
+        "ticker": TICKERS[i % len(TICKERS)],
+        "metric": f"metric_{i % 40}",
+        "fiscal_year": year,
+        "fiscal_period": period,
+        "calendar_year": year,
+        "calendar_period": period,
+        "value": float(i) * 1.5,
+        "preliminary": i % 11 == 0,
+        "XBRL": True,
+        "CIK": f"{i % len(TICKERS):010}",
+        "calcbench_entity_id": i % len(TICKERS),
+        "filing_type": "10-K" if period == 0 else "10-Q",
+        "trace_url": f"https://www.calcbench.com/trace/{i}",
+        "date_reported": f"{year + 1}-02-{1 + i % 28:02}T16:05:00",
+        "period_start": f"{year}-01-01T00:00:00",
+        "period_end": f"{year}-12-31T00:00:00",
+        "filing_accession_number": f"0000000000-{year % 100:02}-{i:06}",
+        "filing_id": i // 40,
+        "date_modified": f"{year + 1}-03-01T00:00:00",
+        "revision_number": i % 3,
+        "standardized_id": i,
+    }
+
+
+def dimensional_point(i: int) -> Dict[str, Any]:
+    return {
+        **standardized_point(i),
+        "metric": "OperatingSegmentRevenue",
+        "container": "SegmentReportingInformationOperatingSegments",
+        "dimensions": {"StatementBusinessSegmentsAxis": f"Segment{i % 7}Member"},
+        "label": f"Segment {i % 7}",
+        "standardized_label": None,
+    }
+
+
+def disclosure(i: int) -> Dict[str, Any]:
+    year = 2010 + i % 14
+    period = PERIODS[i % len(PERIODS)]
+    ticker = TICKERS[i % len(TICKERS)]
+    return {
+        "fact_id": i,
+        "entity_name": f"Company {ticker}",
+        "accession_id": i // 10,
+        "footnote_type": i % 30,
+        "SEC_URL": f"https://www.sec.gov/Archives/edgar/data/{i}.htm",
+        "sec_filing_id": i // 10,
+        "blob_id": f"blob-{i}",
+        "fiscal_year": year,
+        "fiscal_period": period,
+        "calendar_year": year,
+        "calendar_period": period,
+        "filing_date": f"{year + 1}-02-15",
+        "received_date": f"{year + 1}-02-15",
+        "document_type": "10-K" if period == "Y" else "10-Q",
+        "guide_link": None,
+        "page_url": f"https://www.calcbench.com/disclosure/{i}",
+        "entity_id": i % len(TICKERS),
+        "id_detail": False,
+        "local_name": f"Note{i % 30}",
+        "CIK": f"{i % len(TICKERS):010}",
+        "sec_accession_number": f"0000000000-{year % 100:02}-{i:06}",
+        "network_id": i,
+        "ticker": ticker,
+        "filing_type": 1,
+        "description": f"Disclosure {i % 30}",
+        "disclosure_type_name": f"Disclosure{i % 30}",
+        "period_end_date": f"{year}-12-31",
+        "footnote_type_title": "Debt",
+        "date_reported": f"{year + 1}-02-15T16:05:00",
+        "name": f"Disclosure{i % 30}",
+    }
+
+
+def raw_XBRL_fact(i: int) -> Dict[str, Any]:
+    year = 2010 + i % 14
+    return {
+        "fact_id": i,
+        "entity_name": f"Company {TICKERS[i % len(TICKERS)]}",
+        "ticker": TICKERS[i % len(TICKERS)],
+        "CIK": f"{i % len(TICKERS):010}",
+        "XBRL_tag": f"us-gaap_Tag{i % 200}",
+        "Value": float(i),
+        "unit_of_measure": "USD",
+        "dimension_string": (
+            f"us-gaap_StatementBusinessSegmentsAxis:Segment{i % 7}Member"
+            if i % 3
+            else None
+        ),
+        "fiscal_year": year,
+        "fiscal_period": PERIODS[i % len(PERIODS)],
+        "filing_date": f"{year + 1}-02-15T00:00:00",
+        "filing_end_date": f"{year}-12-31T00:00:00",
+        "period_end": f"{year}-12-31T00:00:00",
+        "period_start": f"{year}-01-01T00:00:00",
+        "period_instant": None,
+        "form_type": "10-K",
+        "accession_id": i // 100,
+    }
+
+
+def filing(i: int) -> Dict[str, Any]:
+    year = 2010 + i % 14
+    return {
+        "is_xbrl": True,
+        "is_wire": False,
+        "calcbench_id": i,
+        "sec_accession_id": f"0000000000-{year % 100:02}-{i:06}",
+        "sec_html_url": f"https://www.sec.gov/Archives/edgar/data/{i}.htm",
+        "document_type": "10-K",
+        "filing_type": "annualQuarterlyReport",
+        "filing_date": f"{year + 1}-02-15T16:05:00",
+        "fiscal_period": "Y",
+        "fiscal_year": year,
+        "calcbench_accepted": f"{year + 1}-02-15T16:06:00",
+        "calcbench_finished_load": f"{year + 1}-02-15T16:10:00",
+        "entity_id": i % len(TICKERS),
+        "ticker": TICKERS[i % len(TICKERS)],
+        "entity_name": f"Company {TICKERS[i % len(TICKERS)]}",
+        "CIK": f"{i % len(TICKERS):010}",
+        "period_index": i % 100,
+        "period_end_date": f"{year}-12-31T00:00:00",
+        "calendar_year": year,
+        "calendar_period": "Y",
+        "standardized_XBRL": True,
+        "filing_id": i,
+        "has_standardized_data": True,
+    }
+
+
+GENERATORS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "mappedData": standardized_point,
+    "dimensionalData": dimensional_point,
+    "footnoteSearch": disclosure,
+    "rawXBRLData": raw_XBRL_fact,
+    "filingsV2": filing,
+}
+
+
+class MockCalcbenchServer:
+    """
+    Serve synthetic responses on localhost and point the client at them.
+    """
+
+    def __init__(self, sizes: Mapping[str, int] = DEFAULT_SIZES):
+        self.sizes = {**DEFAULT_SIZES, **sizes}
+        self._bodies: Dict[str, bytes] = {}
+        self._footnote_pages: List[bytes] = []
+        self._gzipped: Dict[int, bytes] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+
+    def body(self, end_point: str, offset: Optional[int] = None) -> bytes:
+        with self._lock:
+            if end_point == "footnoteSearch":
+                if not self._footnote_pages:
+                    self._footnote_pages = self._paginate(self.sizes[end_point])
+                page = (offset or 0) // FOOTNOTE_PAGE_SIZE
+                return self._footnote_pages[min(page, len(self._footnote_pages) - 1)]
+            if end_point not in self._bodies:
+                generator = GENERATORS[end_point]
+                self._bodies[end_point] = json.dumps(
+                    [generator(i) for i in range(self.sizes[end_point])]
+                ).encode("utf-8")
+            return self._bodies[end_point]
+
+    def gzipped(self, body: bytes) -> bytes:
+        with self._lock:
+            if id(body) not in self._gzipped:
+                self._gzipped[id(body)] = gzip.compress(body, compresslevel=6)
+            return self._gzipped[id(body)]
+
+    def response_bytes(self, end_point: str) -> int:
+        if end_point == "footnoteSearch":
+            self.body(end_point)
+            return sum(len(page) for page in self._footnote_pages)
+        return len(self.body(end_point))
+
+    def _paginate(self, size: int) -> List[bytes]:
+        pages = []
+        for start in range(0, max(size, 1), FOOTNOTE_PAGE_SIZE):
+            end = min(start + FOOTNOTE_PAGE_SIZE, size)
+            pages.append(
+                json.dumps(
+                    {
+                        "footnotes": [disclosure(i) for i in range(start, end)],
+                        "moreResults": end < size,
+                        "nextGroupStartOffset": end,
+                    }
+                ).encode("utf-8")
+            )
+        return pages
+
+    def start(self) -> Tuple[str, int]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length", 0))
+                request = self.rfile.read(length)
+                if self.headers.get("content-encoding") == "gzip":
+                    request = gzip.decompress(request)
+                if self.path.startswith("/account/LogOnAjax"):
+                    self._reply(b"true")
+                    return
+                end_point = self.path.split("/api/", 1)[-1].split("?")[0]
+                if end_point not in GENERATORS:
+                    self.send_error(404)
+                    return
+                offset = None
+                if end_point == "footnoteSearch":
+                    offset = (json.loads(request).get("pageParameters") or {}).get(
+                        "startOffset"
+                    )
+                self._reply(server.body(end_point, offset))
+
+            def _reply(self, body: bytes):
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                if len(body) > 1024 and "gzip" in self.headers.get(
+                    "accept-encoding", ""
+                ):
+                    body = server.gzipped(body)
+                    self.send_header("content-encoding", "gzip")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address[:2]
+        _rig_for_testing(domain=f"{host}:{port}", scheme="http")
+        cb.set_credentials("benchmark@calcbench.com", "benchmark")
+        return host, port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockCalcbenchServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
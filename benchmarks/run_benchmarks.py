@@ -0,0 +1,210 @@
+"""
+Measure the client against a local mock server.
+
+For each scenario reports end-to-end latency, throughput, peak Python memory and how the time splits between the network, JSON decoding, pydantic validation and building the DataFrame.
+
+Usage::
+
+    $ pip install -e .[Pandas]
+    $ python benchmarks/run_benchmarks.py --repeat 5 --json results.json
+    $ # after a change
+    $ python benchmarks/run_benchmarks.py --repeat 5 --baseline results.json
+
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import pandas as pd
+
+import calcbench as cb
+from calcbench.instrumentation import RequestMetrics
+
+from mock_server import DEFAULT_SIZES, MockCalcbenchServer
+
+
+class Scenario(NamedTuple):
+    end_point: str
+    run: Callable[[], Any]
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "standardized": Scenario(
+        "mappedData",
+        lambda: cb.standardized(company_identifiers=["MSFT"], metrics=["revenue"]),
+    ),
+    "standardized_columnar": Scenario(
+        "mappedData",
+        lambda: cb.standardized(
+            company_identifiers=["MSFT"], metrics=["revenue"], engine="columnar"
+        ),
+    ),
+    "standardized_batches": Scenario(
+        "mappedData",
+        lambda: cb.standardized(
+            company_identifiers=["MSFT"],
+            metrics=["revenue"],
+            engine="columnar",
+            batch_size=10_000,
+        ),
+    ),
+    "dimensional": Scenario(
+        "dimensionalData",
+        lambda: cb.dimensional(
+            company_identifiers=["MSFT"], metrics=["OperatingSegmentRevenue"]
+        ),
+    ),
+    "disclosure_dataframe": Scenario(
+        "footnoteSearch",
+        lambda: cb.disclosure_dataframe(
+            company_identifiers=["MSFT"], disclosure_names=["Debt"], all_history=True
+        ),
+    ),
+    "raw_XBRL": Scenario(
+        "rawXBRLData",
+        lambda: cb.raw_XBRL(
+            company_identifiers=["MSFT"],
+            clauses=[{"value": "Revenues", "parameter": "XBRLtag", "operator": 10}],
+        ),
+    ),
+    "filings_dataframe": Scenario(
+        "filingsV2",
+        lambda: cb.filings_dataframe(company_identifiers=["MSFT"]),
+    ),
+}
+
+
+def measure(
+    name: str, scenario: Scenario, server: MockCalcbenchServer, repeat: int
+) -> Dict[str, Any]:
+    scenario.run()  # warm up, the server generates the response the first time
+    elapsed: List[float] = []
+    breakdowns: List[Dict[str, float]] = []
+    rows = 0
+    for _ in range(repeat):
+        with RequestMetrics() as metrics:
+            start = time.perf_counter()
+            result = scenario.run()
+            elapsed.append(time.perf_counter() - start)
+        rows = len(result)
+        summary = metrics.summary()
+        requests = summary["requests"].sum()
+        breakdowns.append(
+            {
+                timing: (summary[f"{timing}_mean"] * summary["requests"]).sum()
+                for timing in ("network_time", "decode_time", "validation_time")
+            }
+        )
+    tracemalloc.start()
+    scenario.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(elapsed)
+    breakdown = {
+        timing: statistics.median(b[timing] for b in breakdowns)
+        for timing in breakdowns[0]
+    }
+    response_bytes = server.response_bytes(scenario.end_point)
+    return {
+        "scenario": name,
+        "rows": rows,
+        "requests": int(requests),
+        "median_s": median,
+        "min_s": min(elapsed),
+        "rows_per_s": rows / median if median else float("nan"),
+        "MB_per_s": response_bytes / 2**20 / median if median else float("nan"),
+        "peak_MB": peak / 2**20,
+        "network_s": breakdown["network_time"],
+        "decode_s": breakdown["decode_time"],
+        "validation_s": breakdown["validation_time"],
+        # Everything that is not the request, mostly building the DataFrame
+        "frame_s": max(median - sum(breakdown.values()), 0),
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline_path: str, tolerance: float
+) -> List[str]:
+    """
+    Scenarios that are slower, or use more memory, than the baseline by more than `tolerance`
+    """
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["scenario"])
+        if not previous:
+            continue
+        for measure in ("median_s", "peak_MB"):
+            if result[measure] > previous[measure] * (1 + tolerance):
+                regressions.append(
+                    f"{result['scenario']} {measure} {previous[measure]:.3f} -> {result[measure]:.3f}"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="scenarios to run, defaults to all of them",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help=f"multiply the number of items returned by each end-point, {DEFAULT_SIZES}",
+    )
+    parser.add_argument(
+        "--size",
+        action="append",
+        default=[],
+        metavar="END_POINT=ITEMS",
+        help="number of items returned by an end-point, eg. mappedData=500000",
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare to results written with --json")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fraction slower than the baseline that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = {k: int(v * args.scale) for k, v in DEFAULT_SIZES.items()}
+    for size in args.size:
+        end_point, items = size.split("=")
+        sizes[end_point] = int(items)
+
+    results = []
+    with MockCalcbenchServer(sizes=sizes) as server:
+        for name in args.scenario or SCENARIOS:
+            print(f"running {name}", file=sys.stderr)
+            results.append(measure(name, SCENARIOS[name], server, args.repeat))
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(pd.DataFrame(results).set_index("scenario").round(3))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
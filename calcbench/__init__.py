@@ -7,17 +7,35 @@ from datetime import datetime
 import logging
 from .api_client import (
     enable_backoff,
+    enable_disclosure_contents_cache,
+    enable_disclosure_store,
+    enable_request_compression,
+    enable_response_cache,
     html_diff,
+    set_concurrency,
     set_credentials,
     set_proxies,
+    set_rate_limit,
     __version__,
 )
 
+from .instrumentation import (
+    RequestEvent,
+    RequestMetrics,
+    add_request_listener,
+    remove_request_listener,
+)
+
 from .disclosures import (
+    clear_disclosure_contents_cache,
+    disclosure_contents,
     disclosure_dataframe,
     disclosure_search,
+    disclosure_texts,
 )
 
+from .disclosure_index import DisclosureIndex
+
 # disclosure(search|dataframe) used to be document(search|dataframe) akittredge August 2021
 from .disclosures import disclosure_search as document_search
 from .disclosures import disclosure_dataframe as document_dataframe
@@ -28,10 +46,16 @@ from .filing import filings, Filing, filings_dataframe
 from .metrics import available_metrics, available_metrics_dataframe
 from .standardized_numeric import (
     standardized_raw,
+    standardized_raw_batches,
     standardized,
 )
 
-from .raw_numeric_XBRL import raw_XBRL, raw_xbrl_raw
+from .standardized_sync import (
+    sync_standardized_point_in_time,
+    read_standardized_point_in_time,
+)
+
+from .raw_numeric_XBRL import raw_XBRL, raw_xbrl_raw, raw_xbrl_raw_batches
 
 from .raw_numeric_non_XBRL import non_XBRL_numeric_raw, non_XBRL_numeric
 
@@ -42,7 +66,11 @@ from .business_combinations import (
     business_combinations,
 )
 
-from .press_release import press_release_raw, press_release_data
+from .press_release import (
+    press_release_raw,
+    press_release_data,
+    press_release_data_periods,
+)
 
 from .face_statements import face_statement
 
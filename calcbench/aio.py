@@ -0,0 +1,530 @@
+"""
+asyncio versions of the functions that get data from Calcbench.
+
+Requires the aiohttp package. ``pip install calcbench-api-client[aiohttp]``
+
+Requests follow the same policies as the synchronous functions: they are retried if :func:`calcbench.enable_backoff` is on, limited by :func:`calcbench.set_rate_limit`, cached by :func:`calcbench.enable_response_cache`, compressed by :func:`calcbench.enable_request_compression` and reported to request listeners.  Failed requests raise the same `requests` exceptions.  The rate limiter blocks, it is waited for on a thread of the event loop's default executor.
+
+Usage::
+
+    >>> import asyncio
+    >>> from calcbench import aio
+    >>> async def main(tickers):
+    >>>     return await asyncio.gather(
+    >>>         *[aio.standardized_raw(company_identifiers=[t], metrics=["revenue"], all_history=True) for t in tickers]
+    >>>     )
+    >>> points = asyncio.run(main(cb.tickers(index="SP500")))
+
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import date, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+
+from pydantic import BaseModel
+import requests
+from requests import RequestException
+from requests.structures import CaseInsensitiveDict
+
+from calcbench import api_client
+from calcbench.api_client import (
+    HEADERS,
+    _SESSION_STUFF,
+    _cache_key,
+    _cache_ttl,
+    _decode,
+    _emit_failure,
+    _get_credentials,
+    _payload_data,
+    _request_body,
+)
+from calcbench.api_query_params import (
+    APIQueryParams,
+    CompanyIdentifiers,
+    PeriodArgument,
+)
+from calcbench.dimensional import _dimensional_raw_payload
+from calcbench.disclosures import _disclosure_search_payloads
+from calcbench.filing import _filings_payload
+from calcbench.instrumentation import RequestEvent
+from calcbench.models.dimensional import DimensionalDataPoint
+from calcbench.models.disclosure import DisclosureAPIPageParameters
+from calcbench.models.disclosure_search_results import DisclosureSearchResults
+from calcbench.models.filing import Filing
+from calcbench.models.filing_type import FilingType
+from calcbench.models.period_type import PeriodType
+from calcbench.models.standardized import StandardizedPoint
+from calcbench.raw_numeric_XBRL import (
+    RAW_XBRL_END_POINT,
+    RawDataClause,
+    _parse_raw_results,
+    _raw_data_payload,
+)
+from calcbench.response_cache import ResponseCache
+from calcbench.retry import call_with_retries_async, policy_for
+from calcbench.standardized_numeric import _standardized_raw_payload
+
+if TYPE_CHECKING:
+    import aiohttp
+else:
+    try:
+        import aiohttp
+    except ImportError:
+        "Can't find aiohttp, won't be able to use the async functions."
+        pass
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _AsyncState:
+    """
+    aiohttp sessions and semaphores belong to an event loop, we make new ones if the loop changes.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.retired_sessions: List["aiohttp.ClientSession"] = []
+        """Sessions replaced by :func:`set_max_concurrency`, they may have requests in flight so they are closed by :func:`close`"""
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.login_lock: Optional[asyncio.Lock] = None
+
+
+_STATE = _AsyncState(max_concurrency=10)
+
+
+def set_max_concurrency(max_concurrency: int):
+    """Maximum number of requests in flight at the same time.
+
+    The connection pool is resized before the next request.
+
+    :param max_concurrency: number of concurrent requests, defaults to 10.
+
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    _STATE.max_concurrency = max_concurrency
+    _STATE.semaphore = None
+
+
+async def close():
+    """
+    Close the aiohttp session.  Call this before the event loop finishes.
+    """
+    sessions = _STATE.retired_sessions
+    if _STATE.session is not None:
+        sessions = sessions + [_STATE.session]
+    for session in sessions:
+        await session.close()
+    _STATE.session = None
+    _STATE.retired_sessions = []
+
+
+async def _calcbench_session() -> "aiohttp.ClientSession":
+    loop = asyncio.get_running_loop()
+    if _STATE.loop is not loop:
+        _STATE.loop = loop
+        _STATE.session = None
+        _STATE.retired_sessions = []
+        _STATE.semaphore = None
+        _STATE.login_lock = asyncio.Lock()
+    assert _STATE.login_lock
+    async with _STATE.login_lock:
+        if _STATE.session is None or _STATE.session.closed:
+            _STATE.session = await _logged_in_session()
+        elif _STATE.session.connector.limit != _STATE.max_concurrency:  # type: ignore
+            # The connector can not be resized, the new session shares the login cookies
+            _STATE.retired_sessions.append(_STATE.session)
+            _STATE.session = _new_session(cookie_jar=_STATE.session.cookie_jar)
+    return _STATE.session
+
+
+def _new_session(
+    cookie_jar: Optional["aiohttp.abc.AbstractCookieJar"] = None,
+) -> "aiohttp.ClientSession":
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=_STATE.max_concurrency),
+        timeout=aiohttp.ClientTimeout(total=_SESSION_STUFF["timeout"]),
+        headers={"User-Agent": HEADERS["User-Agent"]},
+        cookie_jar=cookie_jar,
+    )
+
+
+async def _logged_in_session() -> "aiohttp.ClientSession":
+    user_name, password = _get_credentials()
+    session = _new_session()
+    async with session.post(
+        _SESSION_STUFF["logon_url"],
+        data={"email": user_name, "password": password, "rememberMe": "true"},
+        ssl=_ssl(),
+        proxy=_proxy(_SESSION_STUFF["logon_url"]),
+    ) as r:
+        r.raise_for_status()
+        text = await r.text()
+    if text != "true":
+        await session.close()
+        _SESSION_STUFF["calcbench_user_name"] = None
+        _SESSION_STUFF["calcbench_password"] = None
+        raise ValueError(
+            "Incorrect Credentials, use the email and password you use to login to Calcbench."
+        )
+    return session
+
+
+def _semaphore() -> asyncio.Semaphore:
+    if _STATE.semaphore is None:
+        _STATE.semaphore = asyncio.Semaphore(_STATE.max_concurrency)
+    return _STATE.semaphore
+
+
+def _ssl() -> Optional[bool]:
+    return None if _SESSION_STUFF["ssl_verify"] else False
+
+
+def _proxy(url: str) -> Optional[str]:
+    proxies = _SESSION_STUFF.get("proxies") or {}
+    return proxies.get(url.split(":")[0])
+
+
+async def _json_POST(end_point: str, payload: Union[dict, BaseModel]):
+    data = _payload_data(payload)
+    bytes_sent = len(data.encode("utf-8"))
+    cache = _SESSION_STUFF["response_cache"]
+    if cache:
+        key = _cache_key(cache, "POST", end_point, data)
+        cached = _cached(
+            cache,
+            key,
+            _cache_ttl(cache, end_point, payload),
+            RequestEvent(end_point=end_point, bytes_sent=bytes_sent),
+        )
+        if cached is not None:
+            return cached
+    url = _SESSION_STUFF["api_url_base"].format(end_point)
+    logger.debug(f"posting to {url}, {data}")
+    body, headers = _request_body(data)
+
+    async def post(attempt: int):
+        event = RequestEvent(
+            end_point=end_point,
+            bytes_sent=bytes_sent,
+            wire_bytes_sent=len(body),
+            attempt=attempt,
+        )
+        content = await _request(
+            "POST", url, event, log=payload, data=body, headers=headers
+        )
+        return _decode(
+            content,
+            event,
+            parse=None,
+            on_decoded=(lambda: cache.put(key, content)) if cache else None,
+        )
+
+    return await _with_backoff(end_point, post)
+
+
+async def _json_GET(path: str, params: Mapping[str, Any] = {}):
+    cache = _SESSION_STUFF["response_cache"]
+    if cache:
+        key = _cache_key(
+            cache,
+            "GET",
+            path,
+            json.dumps(params, default=str),
+            base_url=_SESSION_STUFF["domain"],
+        )
+        cached = _cached(
+            cache, key, cache.ttl(path), RequestEvent(end_point=path, method="GET")
+        )
+        if cached is not None:
+            return cached
+    url = _SESSION_STUFF["domain"].format(path)
+
+    async def get(attempt: int):
+        event = RequestEvent(end_point=path, method="GET", attempt=attempt)
+        content = await _request(
+            "GET", url, event, log=params, params=params, headers=HEADERS
+        )
+        return _decode(
+            content,
+            event,
+            parse=None,
+            on_decoded=(lambda: cache.put(key, content)) if cache else None,
+        )
+
+    return await _with_backoff(path, get)
+
+
+def _cached(
+    cache: ResponseCache, key: str, ttl: Optional[timedelta], event: RequestEvent
+):
+    """
+    The decoded response from the response cache, None if it is not cached.  The cache is on the local disk so it is read in the event loop.
+    """
+    start = time.perf_counter()
+    cached = cache.get(key, ttl)
+    if cached is None:
+        return None
+    event.network_time = time.perf_counter() - start
+    event.from_cache = True
+    event.bytes_received = len(cached)
+    return _decode(cached, event, parse=None)
+
+
+async def _with_backoff(end_point: str, f: Callable[[int], Awaitable[T]]) -> T:
+    """
+    Retry `f`, which is called with the try number, if :func:`calcbench.enable_backoff` is on.
+    """
+    if not _SESSION_STUFF["enable_backoff"]:
+        return await f(1)
+    attempt = 0
+
+    def on_attempt(number: int):
+        nonlocal attempt
+        attempt = number
+
+    return await call_with_retries_async(
+        lambda: f(attempt),
+        policy=policy_for(
+            end_point,
+            _SESSION_STUFF["retry_policy"],
+            _SESSION_STUFF["end_point_retry_policies"],
+        ),
+        giveup=_SESSION_STUFF["backoff_giveup"],
+        budget=_SESSION_STUFF["retry_budget"],
+        circuit_breaker=_SESSION_STUFF["circuit_breaker"],
+        on_attempt=on_attempt,
+        description=end_point,
+    )
+
+
+async def _request(
+    method: str, url: str, event: RequestEvent, log: Any, **kwargs
+) -> bytes:
+    """
+    Make a request and read the response.
+
+    aiohttp exceptions are raised as the `requests` exceptions the synchronous client raises, so retry policies and `giveup` functions apply to both.
+
+    :param log: logged with the url if the request fails
+    """
+    session = await _calcbench_session()
+    release = await _acquire_rate_limit()
+    start = time.perf_counter()
+    try:
+        try:
+            async with _semaphore():
+                async with session.request(
+                    method, url, ssl=_ssl(), proxy=_proxy(url), **kwargs
+                ) as response:
+                    event.status = response.status
+                    content = await response.read()
+                    if response.status >= 400:
+                        raise _http_error(response, content)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _request_exception(e) from e
+    except RequestException as e:
+        _emit_failure(event, e, time.perf_counter() - start)
+        if isinstance(e, requests.HTTPError):
+            logger.error("Exception {0}, {1}".format(url, log))
+        raise
+    finally:
+        release()
+    event.network_time = time.perf_counter() - start
+    event.bytes_received = len(content)
+    return content
+
+
+async def _acquire_rate_limit() -> Callable[[], None]:
+    """
+    Wait for the rate limiter set by :func:`calcbench.set_rate_limit` on a thread, it blocks.
+
+    :return: call this when the request is finished
+    """
+    if _SESSION_STUFF["rate_limiter"] is None:
+        return lambda: None
+    acquired = asyncio.get_running_loop().run_in_executor(
+        None, api_client._acquire_rate_limit
+    )
+    try:
+        return await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        acquired.add_done_callback(_release_when_acquired)
+        raise
+
+
+def _release_when_acquired(acquired: "asyncio.Future[Callable[[], None]]"):
+    """
+    The waiting task was cancelled but the thread still gets a slot, give it back
+    """
+    if not acquired.cancelled() and acquired.exception() is None:
+        acquired.result()()
+
+
+def _http_error(
+    response: "aiohttp.ClientResponse", content: bytes
+) -> requests.HTTPError:
+    """
+    A `requests.HTTPError` with a response carrying the status, headers and body, eg. for `Retry-After`.
+    """
+    requests_response = requests.Response()
+    requests_response.status_code = response.status
+    requests_response.reason = response.reason or ""
+    requests_response.headers = CaseInsensitiveDict(response.headers)
+    requests_response.url = str(response.url)
+    requests_response._content = content
+    return requests.HTTPError(
+        f"{response.status} Error: {response.reason} for url: {response.url}",
+        response=requests_response,
+    )
+
+
+def _request_exception(e: Exception) -> RequestException:
+    if isinstance(e, asyncio.TimeoutError):
+        return requests.Timeout(str(e))
+    if isinstance(e, aiohttp.ClientPayloadError):
+        return requests.exceptions.ChunkedEncodingError(str(e))
+    if isinstance(e, aiohttp.ClientConnectionError):
+        return requests.ConnectionError(str(e))
+    return RequestException(str(e))
+
+
+async def standardized_raw(**kwargs) -> Sequence[StandardizedPoint]:
+    """Standardized data.
+
+    Takes the same arguments as :func:`calcbench.standardized_raw`.
+    """
+    payload = _standardized_raw_payload(**kwargs)
+    response = await _json_POST("mappedData", payload)
+    return [StandardizedPoint(**d) for d in response]
+
+
+async def dimensional_raw(
+    company_identifiers: CompanyIdentifiers = [],
+    metrics: Sequence[str] = [],
+    start_year: Optional[int] = None,
+    start_period: PeriodArgument = None,
+    end_year: Optional[int] = None,
+    end_period: PeriodArgument = None,
+    period_type: PeriodType = PeriodType.Annual,
+    all_history: bool = True,
+    as_originally_reported: bool = False,
+) -> Sequence[DimensionalDataPoint]:
+    """Segments and Breakouts
+
+    See :func:`calcbench.dimensional_raw`.
+    """
+    payload = _dimensional_raw_payload(
+        company_identifiers=company_identifiers,
+        metrics=metrics,
+        start_year=start_year,
+        start_period=start_period,
+        end_year=end_year,
+        end_period=end_period,
+        period_type=period_type,
+        all_history=all_history,
+        as_originally_reported=as_originally_reported,
+    )
+    return [
+        DimensionalDataPoint(**p) for p in await _json_POST("dimensionalData", payload)
+    ]
+
+
+async def filings(
+    company_identifiers: CompanyIdentifiers = [],
+    entire_universe: bool = False,
+    include_non_xbrl: bool = True,
+    received_date: Optional[date] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    include_press_releases_and_proxies: bool = True,
+    filing_types: Sequence[FilingType] = [],
+) -> List[Filing]:
+    """SEC filings
+
+    See :func:`calcbench.filings`.
+    """
+    payload = _filings_payload(
+        company_identifiers=company_identifiers,
+        entire_universe=entire_universe,
+        include_non_xbrl=include_non_xbrl,
+        received_date=received_date,
+        start_date=start_date,
+        end_date=end_date,
+        include_press_releases_and_proxies=include_press_releases_and_proxies,
+        filing_types=filing_types,
+    )
+    return [Filing(**f) for f in await _json_POST("filingsV2", payload)]
+
+
+async def disclosure_search(**kwargs) -> AsyncGenerator[DisclosureSearchResults, None]:
+    """Footnotes and other text
+
+    Takes the same arguments as :func:`calcbench.disclosure_search`, except `progress_bar`.
+
+    Usage::
+
+        >>> async for disclosure in aio.disclosure_search(company_identifiers=["msft"], disclosure_names=["RiskFactors"], all_history=True):
+        >>>     print(disclosure)
+
+    """
+    for payload in _disclosure_search_payloads(**kwargs):
+        async for r in _document_search_results(payload):
+            yield r
+
+
+async def _document_search_results(
+    payload: APIQueryParams[DisclosureAPIPageParameters],
+) -> AsyncGenerator[DisclosureSearchResults, None]:
+    """
+    Keep making requests until the server returns "moreResults" == false
+    """
+    results: Dict[str, Any] = {"moreResults": True}
+    while results["moreResults"]:
+        results = await _json_POST("footnoteSearch", payload)
+        if not results:
+            return
+        for result in results["footnotes"]:
+            yield DisclosureSearchResults(**result)
+        payload.pageParameters.startOffset = results["nextGroupStartOffset"]
+
+    payload.pageParameters.startOffset = None
+
+
+async def raw_xbrl_raw(
+    company_identifiers: CompanyIdentifiers = [],
+    entire_universe: bool = False,
+    clauses: Sequence[RawDataClause] = [],
+) -> Sequence[Mapping[str, object]]:
+    """Data as reported in the XBRL documents
+
+    See :func:`calcbench.raw_xbrl_raw`.
+    """
+    payload = _raw_data_payload(
+        company_identifiers=company_identifiers,
+        entire_universe=entire_universe,
+        clauses=clauses,
+        end_point=RAW_XBRL_END_POINT,
+    )
+    results = await _json_POST(RAW_XBRL_END_POINT, payload)
+    return _parse_raw_results(results, end_point=RAW_XBRL_END_POINT)
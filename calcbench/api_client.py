@@ -6,17 +6,25 @@ Created on Mar 14, 2015
 @contact: andrew@calcbench.com
 """
 
+import codecs
 import dataclasses
+import gzip
+import inspect
 import json
 import logging
 import os
-from datetime import datetime
+import re
+from datetime import date, datetime, timedelta
+from pathlib import Path
 from functools import wraps
 from typing import (
     TYPE_CHECKING,
+    Any,
     Callable,
     Dict,
     Iterable,
+    Iterator,
+    Mapping,
     Optional,
     Tuple,
     Union,
@@ -26,7 +34,9 @@ import getpass
 import warnings
 import subprocess
 import sys
-
+import threading
+import time
+import weakref
 
 if TYPE_CHECKING:
     # https://github.com/microsoft/pyright/issues/1358
@@ -39,10 +49,22 @@ else:
 
 
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
 from requests.sessions import Session
 from requests import HTTPError
 
 from calcbench.api_query_params import APIQueryParams
+from calcbench.disclosure_store import DisclosureStore, _ContentCache
+from calcbench.instrumentation import RequestEvent, _emit
+from calcbench.rate_limit import RateLimiter
+from calcbench.response_cache import ResponseCache
+from calcbench.retry import (
+    CircuitBreaker,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retries,
+    policy_for,
+)
 
 
 import requests
@@ -67,6 +89,19 @@ class _SESSION_VARIABLES(TypedDict):
     enable_backoff: bool
     proxies: Dict[str, str]
     backoff_giveup: Optional[Callable[[RequestException], bool]]
+    retry_policy: RetryPolicy
+    end_point_retry_policies: Dict[str, RetryPolicy]
+    retry_budget: Optional[RetryBudget]
+    circuit_breaker: Optional[CircuitBreaker]
+    pool_size: int
+    session_per_thread: bool
+    response_cache: Optional[ResponseCache]
+    cache_closed_date_ranges: bool
+    closed_date_range_ttl: Optional[timedelta]
+    compress_requests_min_bytes: Optional[int]
+    rate_limiter: Optional[RateLimiter]
+    disclosure_store: Optional[DisclosureStore]
+    disclosure_contents_cache: Optional[_ContentCache]
 
 
 _SESSION_STUFF: _SESSION_VARIABLES = {
@@ -81,8 +116,31 @@ _SESSION_STUFF: _SESSION_VARIABLES = {
     "enable_backoff": False,
     "proxies": {},
     "backoff_giveup": None,
+    "retry_policy": RetryPolicy(),
+    "end_point_retry_policies": {},
+    "retry_budget": RetryBudget(),
+    "circuit_breaker": CircuitBreaker(),
+    "pool_size": 10,  # urllib3's default pool size
+    "session_per_thread": False,
+    "response_cache": None,
+    "cache_closed_date_ranges": True,
+    "closed_date_range_ttl": timedelta(days=30),
+    "compress_requests_min_bytes": None,
+    "rate_limiter": None,
+    "disclosure_store": None,
+    "disclosure_contents_cache": None,
 }
 
+_SESSION_LOCK = threading.RLock()
+"""
+Guards logging in and swapping the shared session so concurrent threads do not race to log in.
+"""
+
+_THREAD_SESSIONS = threading.local()
+"""
+Sessions handed out to threads when `session_per_thread` is set, rebuilt when the shared session or the pool size changes.
+"""
+
 KEYRING_SERVICE_NAME = "calcbench_api"
 
 USERNAME_ENVIRONMENT_VARIABLE = "CALCBENCH_USERNAME"
@@ -172,37 +230,93 @@ def _get_credentials() -> Tuple[str, str]:
 
 
 def _calcbench_session() -> Session:
+    """
+    The logged-in session used for requests.
+
+    Only one thread logs in, the others wait for it.  If `session_per_thread` is set each thread gets its own session sharing the cookies of the logged-in session.
+    """
     session = _SESSION_STUFF.get("session")
     if not session:
-        user_name, password = _get_credentials()
-
-        session = requests.Session()
-        if _SESSION_STUFF.get("proxies"):
-            session.proxies.update(_SESSION_STUFF["proxies"])
-        r = session.post(
-            _SESSION_STUFF["logon_url"],
-            {"email": user_name, "password": password, "rememberMe": "true"},
-            verify=_SESSION_STUFF["ssl_verify"],
-            timeout=_SESSION_STUFF["timeout"],
+        with _SESSION_LOCK:
+            session = _SESSION_STUFF.get("session")
+            if not session:
+                session = _logged_in_session()
+                _SESSION_STUFF["session"] = session
+    if not _SESSION_STUFF["session_per_thread"]:
+        return session
+    thread_session = getattr(_THREAD_SESSIONS, "session", None)
+    if (
+        thread_session is None
+        or _THREAD_SESSIONS.parent() is not session
+        or _THREAD_SESSIONS.pool_size != _SESSION_STUFF["pool_size"]
+    ):
+        if thread_session is not None:
+            thread_session.close()
+        thread_session = _new_session()
+        thread_session.cookies.update(session.cookies)
+        _THREAD_SESSIONS.session = thread_session
+        # A weak reference, the id of a garbage collected session can be reused
+        _THREAD_SESSIONS.parent = weakref.ref(session)
+        _THREAD_SESSIONS.pool_size = _SESSION_STUFF["pool_size"]
+    return thread_session
+
+
+def _new_session() -> Session:
+    session = requests.Session()
+    pool_size = _SESSION_STUFF["pool_size"]
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if _SESSION_STUFF.get("proxies"):
+        session.proxies.update(_SESSION_STUFF["proxies"])
+    return session
+
+
+def _logged_in_session() -> Session:
+    user_name, password = _get_credentials()
+
+    session = _new_session()
+    r = session.post(
+        _SESSION_STUFF["logon_url"],
+        {"email": user_name, "password": password, "rememberMe": "true"},
+        verify=_SESSION_STUFF["ssl_verify"],
+        timeout=_SESSION_STUFF["timeout"],
+    )
+    r.raise_for_status()
+    if r.text != "true":
+        _SESSION_STUFF["calcbench_user_name"] = None
+        _SESSION_STUFF["calcbench_password"] = None
+        raise ValueError(
+            "Incorrect Credentials, use the email and password you use to login to Calcbench."
         )
-        r.raise_for_status()
-        if r.text != "true":
-            _SESSION_STUFF["calcbench_user_name"] = None
-            _SESSION_STUFF["calcbench_password"] = None
-            raise ValueError(
-                "Incorrect Credentials, use the email and password you use to login to Calcbench."
-            )
-        else:
-            _SESSION_STUFF["session"] = session
     return session
 
 
-def _rig_for_testing(domain="localhost:444", suppress_http_warnings=True):
-    _SESSION_STUFF["api_url_base"] = "https://" + domain + "/api/{0}"
-    _SESSION_STUFF["logon_url"] = "https://" + domain + "/account/LogOnAjax"
-    _SESSION_STUFF["domain"] = "https://" + domain + "/{0}"
+def _check_pool_size(max_workers: int):
+    """
+    Warn if the connection pool is smaller than `max_workers`, called by functions that make concurrent requests.
+
+    The pool is only resized by :func:`set_concurrency`, connections that do not fit in the pool are discarded after each request.
+    """
+    if max_workers > _SESSION_STUFF["pool_size"]:
+        warnings.warn(
+            f"max_workers={max_workers} is larger than the connection pool ({_SESSION_STUFF['pool_size']}), call calcbench.set_concurrency({max_workers}) to reuse connections"
+        )
+
+
+def _reset_session():
+    with _SESSION_LOCK:
+        _SESSION_STUFF["session"] = None
+
+
+def _rig_for_testing(
+    domain="localhost:444", suppress_http_warnings=True, scheme="https"
+):
+    _SESSION_STUFF["api_url_base"] = f"{scheme}://{domain}/api/{{0}}"
+    _SESSION_STUFF["logon_url"] = f"{scheme}://{domain}/account/LogOnAjax"
+    _SESSION_STUFF["domain"] = f"{scheme}://{domain}/{{0}}"
     _SESSION_STUFF["ssl_verify"] = False
-    _SESSION_STUFF["session"] = None
+    _reset_session()
     if suppress_http_warnings:
         from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
@@ -210,75 +324,502 @@ def _rig_for_testing(domain="localhost:444", suppress_http_warnings=True):
 
 
 def _add_backoff(f):
+    """
+    Retry `f` according to the policy of the end-point it is called with, the `end_point` or `path` argument.
+    """
+    parameters = list(inspect.signature(f).parameters)
+    end_point_parameter = next(
+        (p for p in ("end_point", "path") if p in parameters), None
+    )
+
     @wraps(f)
     def wrapper(*args, **kwargs):
-        if _SESSION_STUFF["enable_backoff"]:
-            import backoff
-
-            return backoff.on_exception(
-                backoff.expo,
-                requests.exceptions.RequestException,
-                max_tries=8,
-                logger=logger,
-                giveup=_SESSION_STUFF["backoff_giveup"],
-            )(f)(*args, **kwargs)
-        else:
+        if not _SESSION_STUFF["enable_backoff"]:
+            _REQUEST_ATTEMPT.number = 1
             return f(*args, **kwargs)
+        end_point = None
+        if end_point_parameter:
+            end_point = kwargs.get(end_point_parameter) or (
+                args[parameters.index(end_point_parameter)]
+                if len(args) > parameters.index(end_point_parameter)
+                else None
+            )
+        return call_with_retries(
+            lambda: f(*args, **kwargs),
+            policy=policy_for(
+                end_point,
+                _SESSION_STUFF["retry_policy"],
+                _SESSION_STUFF["end_point_retry_policies"],
+            ),
+            giveup=_SESSION_STUFF["backoff_giveup"],
+            budget=_SESSION_STUFF["retry_budget"],
+            circuit_breaker=_SESSION_STUFF["circuit_breaker"],
+            on_attempt=_set_attempt_number,
+            description=end_point or f.__name__,
+        )
 
     return wrapper
 
 
+_REQUEST_ATTEMPT = threading.local()
+"""
+Which try of the request being made on this thread, reported to request listeners
+"""
+
+
+def _attempt_number() -> int:
+    return getattr(_REQUEST_ATTEMPT, "number", 1)
+
+
+def _set_attempt_number(attempt: int):
+    _REQUEST_ATTEMPT.number = attempt
+
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+"""
+Bytes read at a time when streaming responses
+"""
+
+
 HEADERS = {
     "content-type": "application/json",
     "User-Agent": USER_AGENT,
 }
+"""
+Responses are compressed with the encodings requests accepts by default, including brotli if the brotli package is installed.
+"""
 
 
 @_add_backoff
-def _json_POST(end_point: str, payload: Union[dict, BaseModel]):
-    session = _calcbench_session()
-    url = _SESSION_STUFF["api_url_base"].format(end_point)
+def _json_POST(
+    end_point: str,
+    payload: Union[dict, BaseModel],
+    parse: Optional[Callable[[Any], Any]] = None,
+):
+    """
+    :param parse: build models from the decoded JSON, timed separately for request listeners
+    """
+    data = _payload_data(payload)
+    event = RequestEvent(end_point=end_point, bytes_sent=len(data.encode("utf-8")))
+    cache = _SESSION_STUFF["response_cache"]
+    if cache:
+        key = _cache_key(cache, "POST", end_point, data)
+        start = time.perf_counter()
+        cached = cache.get(key, _cache_ttl(cache, end_point, payload))
+        if cached is not None:
+            event.network_time = time.perf_counter() - start
+            event.from_cache = True
+            event.bytes_received = len(cached)
+            return _decode(cached, event, parse)
+    start = time.perf_counter()
+    response = _POST(end_point, data, event=event)
+    content = response.content
+    event.network_time = time.perf_counter() - start
+    event.bytes_received = len(content)
+    event.wire_bytes_received = _wire_bytes(response)
+    logger.debug(
+        f"In {event.network_time:.3f}s got, {content[:1000].decode('utf-8', 'replace')}"
+    )
+    return _decode(
+        content,
+        event,
+        parse,
+        on_decoded=(lambda: cache.put(key, content)) if cache else None,
+    )
+
 
+def _decode(
+    content: bytes,
+    event: RequestEvent,
+    parse: Optional[Callable[[Any], Any]],
+    on_decoded: Optional[Callable[[], Any]] = None,
+):
+    start = time.perf_counter()
+    try:
+        response_data = json.loads(content)
+    except json.JSONDecodeError as e:
+        # a RequestException, so truncated responses are retried
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos) from e
+    event.decode_time = time.perf_counter() - start
+    if on_decoded:
+        on_decoded()
+    if parse is not None:
+        start = time.perf_counter()
+        response_data = parse(response_data)
+        event.validation_time = time.perf_counter() - start
+    _emit(event)
+    return response_data
+
+
+def _json_POST_stream(
+    end_point: str,
+    payload: Union[dict, BaseModel],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    parse: Optional[Callable[[Any], Any]] = None,
+) -> Iterator[Any]:
+    """
+    Decode the items of the JSON array returned by the server as the response is downloaded, rather than reading the whole response into memory.
+
+    Back-off only covers making the request, not reading the response.
+
+    :param parse: build a model from each decoded item, timed separately for request listeners
+    """
+    data = _payload_data(payload)
+    event = RequestEvent(end_point=end_point, bytes_sent=len(data.encode("utf-8")))
+    cache = _SESSION_STUFF["response_cache"]
+    if cache:
+        key = _cache_key(cache, "POST", end_point, data)
+        cached = cache.open(key, _cache_ttl(cache, end_point, payload))
+        if cached is not None:
+            event.from_cache = True
+            with cached:
+                yield from _instrumented_items(
+                    _timed_chunks(iter(lambda: cached.read(chunk_size), b""), event),
+                    event,
+                    parse,
+                )
+            return
+    start = time.perf_counter()
+    response = _retried_POST(end_point, data, stream=True, event=event)
+    event.network_time = time.perf_counter() - start
+    try:
+        chunks = _timed_chunks(
+            response.iter_content(chunk_size=chunk_size),
+            event,
+            wire_bytes=lambda: _wire_bytes(response),
+        )
+        if cache:
+            with cache.writer(key) as writer:
+                yield from _instrumented_items(_tee(chunks, writer.write), event, parse)
+        else:
+            yield from _instrumented_items(chunks, event, parse)
+    finally:
+        response.close()
+
+
+def _timed_chunks(
+    chunks: Iterable[bytes],
+    event: RequestEvent,
+    wire_bytes: Optional[Callable[[], Optional[int]]] = None,
+) -> Iterator[bytes]:
+    chunk_iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunk_iterator, None)
+        event.network_time += time.perf_counter() - start
+        if wire_bytes:
+            event.wire_bytes_received = wire_bytes()
+        if chunk is None:
+            return
+        event.bytes_received += len(chunk)
+        yield chunk
+
+
+def _instrumented_items(
+    chunks: Iterable[bytes],
+    event: RequestEvent,
+    parse: Optional[Callable[[Any], Any]],
+) -> Iterator[Any]:
+    """
+    Decode items from chunks timed by :func:`_timed_chunks`, time spent decoding is the time not spent waiting for chunks.
+    """
+    items = _iterate_json_array(chunks)
+    try:
+        while True:
+            start = time.perf_counter()
+            network_time = event.network_time
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finally:
+                event.decode_time += (
+                    time.perf_counter() - start - (event.network_time - network_time)
+                )
+            if parse is not None:
+                start = time.perf_counter()
+                item = parse(item)
+                event.validation_time += time.perf_counter() - start
+            yield item
+    except Exception as e:
+        event.error = repr(e)
+        raise
+    finally:
+        _emit(event)
+
+
+def _tee(chunks: Iterable[bytes], f: Callable[[bytes], Any]) -> Iterator[bytes]:
+    for chunk in chunks:
+        f(chunk)
+        yield chunk
+
+
+def _payload_data(payload: Union[dict, BaseModel]) -> str:
     if isinstance(payload, dict):
-        data = json.dumps(payload)
+        return json.dumps(payload)
     else:
-        data = payload.model_dump_json(exclude_unset=True, exclude_none=True)
+        return payload.model_dump_json(exclude_unset=True, exclude_none=True)
+
+
+def _POST(
+    end_point: str,
+    data: str,
+    stream: bool = False,
+    event: Optional[RequestEvent] = None,
+) -> requests.Response:
+    """
+    :param event: updated with the attempt number and status, emitted to request listeners if the request fails
+    """
+    session = _calcbench_session()
+    url = _SESSION_STUFF["api_url_base"].format(end_point)
 
     logger.debug(f"posting to {url}, {data}")
-    start = datetime.now()
-    response = session.post(
-        url,
-        data=data,
-        headers=HEADERS,
-        verify=_SESSION_STUFF["ssl_verify"],
-        timeout=_SESSION_STUFF["timeout"],
-    )
+    body, headers = _request_body(data)
+    if event is not None:
+        event.attempt = _attempt_number()
+        event.wire_bytes_sent = len(body)
+    release = _acquire_rate_limit()
+    start = time.perf_counter()
     try:
+        response = session.post(
+            url,
+            data=body,
+            headers=headers,
+            verify=_SESSION_STUFF["ssl_verify"],
+            timeout=_SESSION_STUFF["timeout"],
+            stream=stream,
+        )
+        if event is not None:
+            event.status = response.status_code
         response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        logger.exception("Exception {0}, {1}".format(url, payload))
+    except RequestException as e:
+        release()
+        if event is not None:
+            _emit_failure(event, e, time.perf_counter() - start)
+        if isinstance(e, requests.exceptions.HTTPError):
+            logger.exception("Exception {0}, {1}".format(url, data))
         raise e
-    response_data = response.json()
-    logger.debug(f"In {datetime.now() - start} got, {response.text[:1000]}")
-    return response_data
+    except BaseException:
+        release()
+        raise
+    if stream:
+        # the request is in flight until the response has been read
+        _release_on_close(response, release)
+    else:
+        release()
+    return response
+
+
+_retried_POST = _add_backoff(_POST)
+
+
+def _acquire_rate_limit() -> Callable[[], None]:
+    """
+    Wait for the rate limiter set by :func:`set_rate_limit`
+
+    :return: call this when the request is finished
+    """
+    rate_limiter = _SESSION_STUFF["rate_limiter"]
+    if rate_limiter is None:
+        return lambda: None
+    return rate_limiter.acquire()
+
+
+def _release_on_close(response: requests.Response, release: Callable[[], None]):
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            release()
+
+    response.close = close_and_release  # type: ignore
+
+
+def _request_body(data: str) -> Tuple[bytes, Mapping[str, str]]:
+    body = data.encode("utf-8")
+    min_bytes = _SESSION_STUFF["compress_requests_min_bytes"]
+    if min_bytes is not None and len(body) >= min_bytes:
+        return gzip.compress(body, compresslevel=6), {
+            **HEADERS,
+            "Content-Encoding": "gzip",
+        }
+    return body, HEADERS
+
+
+def _wire_bytes(response: requests.Response) -> Optional[int]:
+    """
+    Bytes read from the socket, before decompression
+    """
+    try:
+        wire_bytes = response.raw.tell()
+    except Exception:
+        return None
+    return wire_bytes if isinstance(wire_bytes, int) else None
+
+
+def _emit_failure(event: RequestEvent, e: Exception, network_time: float):
+    response = getattr(e, "response", None)
+    _emit(
+        dataclasses.replace(
+            event,
+            status=response.status_code if response is not None else None,
+            network_time=network_time,
+            bytes_received=len(response.content) if response is not None else 0,
+            error=repr(e),
+        )
+    )
+
+
+def _cache_key(
+    cache: ResponseCache,
+    method: str,
+    end_point: str,
+    data: str,
+    base_url: Optional[str] = None,
+) -> str:
+    """
+    Responses are cached separately for each server and user
+    """
+    return cache.key(
+        method,
+        end_point,
+        data,
+        base_url=_SESSION_STUFF["api_url_base"] if base_url is None else base_url,
+        user=_get_credentials()[0],
+    )
+
+
+def _cache_ttl(
+    cache: ResponseCache, end_point: str, payload: Union[dict, BaseModel]
+) -> Optional[timedelta]:
+    """
+    Responses for date ranges that ended in the past rarely change so they are kept longer
+    """
+    ttl = cache.ttl(end_point)
+    closed_ttl = _SESSION_STUFF["closed_date_range_ttl"]
+    if _SESSION_STUFF["cache_closed_date_ranges"] and ttl is not None:
+        if isinstance(payload, BaseModel):
+            payload = payload.model_dump()
+        end_date = ((payload.get("periodParameters") or {}).get("dateRange") or {}).get(
+            "endDate"
+        )
+        if isinstance(end_date, str):
+            try:
+                end_date = datetime.fromisoformat(end_date)
+            except ValueError:
+                end_date = None
+        if isinstance(end_date, date) and not isinstance(end_date, datetime):
+            end_date = datetime.combine(end_date, datetime.min.time())
+        if end_date and end_date.replace(tzinfo=None) < datetime.now():
+            return None if closed_ttl is None else max(ttl, closed_ttl)
+    return ttl
+
+
+def _iterate_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Incrementally decode a JSON array, yielding each item once it has been completely received.
+
+    A `null` document is treated as an empty array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunk_iterator = iter(chunks)
+    buffer = ""
+    position = 0
+    started = False
+    exhausted = False
+    while True:
+        position = _WHITE_SPACE.match(buffer, position).end()  # type: ignore
+        if started and position < len(buffer):
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # Wait for the separator, a number at the end of the buffer might continue in the next chunk.
+                separator = _WHITE_SPACE.match(buffer, end).end()  # type: ignore
+                if separator < len(buffer) and buffer[separator] in ",]":
+                    yield item
+                    position = separator + (buffer[separator] == ",")
+                    continue
+        if exhausted:
+            if not started and buffer.strip() in ("", "null"):
+                return
+            raise ValueError("Response ended before the JSON array was complete")
+        try:
+            chunk = text_decoder.decode(next(chunk_iterator))
+        except StopIteration:
+            exhausted = True
+            chunk = text_decoder.decode(b"", final=True)
+        buffer = buffer[position:] + chunk
+        position = 0
+        if not started:
+            stripped = buffer.lstrip()
+            if stripped.startswith("["):
+                started = True
+                position = len(buffer) - len(stripped) + 1
+            elif not "null".startswith(stripped):
+                raise ValueError(f"Expected a JSON array, got {stripped[:100]}")
+
+
+_WHITE_SPACE = re.compile(r"[ \t\n\r]*")
 
 
 @_add_backoff
 def _json_GET(path: str, params: dict = {}):
     url = _SESSION_STUFF["domain"].format(path)
-    response = _calcbench_session().get(
-        url,
-        params=params,
-        headers=HEADERS,
-        verify=_SESSION_STUFF["ssl_verify"],
-        timeout=_SESSION_STUFF["timeout"],
-    )
+    event = RequestEvent(end_point=path, method="GET", attempt=_attempt_number())
+    cache = _SESSION_STUFF["response_cache"]
+    if cache:
+        key = _cache_key(
+            cache,
+            "GET",
+            path,
+            json.dumps(params, default=str),
+            base_url=_SESSION_STUFF["domain"],
+        )
+        start = time.perf_counter()
+        cached = cache.get(key, cache.ttl(path))
+        if cached is not None:
+            event.network_time = time.perf_counter() - start
+            event.from_cache = True
+            event.bytes_received = len(cached)
+            return _decode(cached, event, parse=None)
+    session = _calcbench_session()
+    release = _acquire_rate_limit()
+    start = time.perf_counter()
     try:
+        response = session.get(
+            url,
+            params=params,
+            headers=HEADERS,
+            verify=_SESSION_STUFF["ssl_verify"],
+            timeout=_SESSION_STUFF["timeout"],
+        )
+        event.status = response.status_code
         response.raise_for_status()
-    except requests.exceptions.HTTPError as e:
-        logger.exception("Exception {0}, {1}".format(url, params))
+    except RequestException as e:
+        _emit_failure(event, e, time.perf_counter() - start)
+        if isinstance(e, requests.exceptions.HTTPError):
+            logger.exception("Exception {0}, {1}".format(url, params))
         raise e
-    return response.json()
+    finally:
+        release()
+    content = response.content
+    event.network_time = time.perf_counter() - start
+    event.bytes_received = len(content)
+    event.wire_bytes_received = _wire_bytes(response)
+    return _decode(
+        content,
+        event,
+        parse=None,
+        on_decoded=(lambda: cache.put(key, content)) if cache else None,
+    )
 
 
 @_add_backoff
@@ -306,29 +847,39 @@ def enable_backoff(
     backoff_on: bool = True,
     giveup: Callable[[RequestException], bool] = lambda e: isinstance(e, HTTPError)
     and e.response.status_code == 404,
+    policy: Optional[RetryPolicy] = None,
+    end_point_policies: Mapping[str, RetryPolicy] = {},
+    retry_budget: Optional[RetryBudget] = RetryBudget(),
+    circuit_breaker: Optional[CircuitBreaker] = CircuitBreaker(),
 ):
     """Re-try failed requests with exponential back-off
 
-    Requires the backoff package. ``pip install backoff``
-
     If processes make many requests, failures are inevitable.  Call this to retry failed requests.
 
+    Timeouts, connection errors and 408, 425, 429, 500, 502, 503 and 504 responses are retried after a random wait that grows exponentially, or as long as the server asks with a `Retry-After` header.
+    All threads share a retry budget, so retries stop if most requests are failing, and a circuit breaker that pauses requests after many consecutive failures.
+
     By default gives up immediately if the server returns 404
 
     :param backoff_on: toggle backoff
     :param giveup: function that handles exception and decides whether to continue or not.
+    :param policy: how to retry, defaults to :class:`calcbench.retry.RetryPolicy`
+    :param end_point_policies: policies for specific end-points, eg. {"mappedData": RetryPolicy(max_tries=3)}
+    :param retry_budget: retries shared by all threads, None for no limit
+    :param circuit_breaker: pause requests after consecutive failures, None to never pause
 
     Usage::
         >>> calcbench.enable_backoff(giveup=lambda e: e.response and e.response.status_code == 404)
+        >>> from calcbench.retry import RetryPolicy
+        >>> calcbench.enable_backoff(end_point_policies={"footnoteSearch": RetryPolicy(max_tries=3, max_delay=10)})
 
     """
     if backoff_on:
-        try:
-            import backoff
-        except ImportError:
-            print("backoff package not found, `pip install backoff`")
-            raise
         _SESSION_STUFF["backoff_giveup"] = giveup
+        _SESSION_STUFF["retry_policy"] = policy or RetryPolicy()
+        _SESSION_STUFF["end_point_retry_policies"] = dict(end_point_policies)
+        _SESSION_STUFF["retry_budget"] = retry_budget
+        _SESSION_STUFF["circuit_breaker"] = circuit_breaker
 
     _SESSION_STUFF["enable_backoff"] = backoff_on
 
@@ -341,6 +892,163 @@ def set_proxies(proxies: Dict[str, str]):
     _SESSION_STUFF["proxies"] = proxies
 
 
+def set_concurrency(pool_size: int, session_per_thread: bool = False):
+    """Size the connection pool for concurrent requests.
+
+    By default requests share a single session with urllib3's default pool of 10 connections.  Call this before making requests from many threads.
+
+    Logging in happens once, sessions handed out to threads share the login cookies.  The adapters of the session are replaced, their connections are closed.  Functions with a `max_workers` argument do not resize the pool, they warn if it is too small.
+
+    :param pool_size: maximum number of connections kept open to Calcbench, set this to the number of worker threads.
+    :param session_per_thread: give each thread its own session (and connection pool) instead of sharing one session.
+
+    Usage::
+        >>> calcbench.set_concurrency(32)
+        >>> with ThreadPoolExecutor(max_workers=32) as executor:
+        >>>     data = executor.map(lambda ticker: calcbench.standardized(company_identifiers=[ticker]), tickers)
+
+    """
+    if pool_size < 1:
+        raise ValueError("pool_size must be at least 1")
+    with _SESSION_LOCK:
+        _SESSION_STUFF["pool_size"] = pool_size
+        _SESSION_STUFF["session_per_thread"] = session_per_thread
+        session = _SESSION_STUFF["session"]
+        if session:
+            replaced = set(session.adapters.values())
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            for old_adapter in replaced:
+                old_adapter.close()
+
+
+def enable_request_compression(compress_on: bool = True, min_bytes: int = 64 * 1024):
+    """Gzip request bodies larger than `min_bytes`
+
+    Useful for requests with thousands of company identifiers.  Responses are always compressed if the server supports it.  Compression ratios are reported to request listeners, see :class:`calcbench.RequestMetrics`.
+
+    :param compress_on: toggle compression
+    :param min_bytes: smallest request body to compress
+
+    Usage::
+        >>> calcbench.enable_request_compression(min_bytes=16 * 1024)
+
+    """
+    _SESSION_STUFF["compress_requests_min_bytes"] = min_bytes if compress_on else None
+
+
+def set_rate_limit(
+    requests_per_second: Optional[float] = None,
+    max_in_flight: Optional[int] = None,
+    burst: Optional[int] = None,
+    shared_dir: Optional[Union[str, Path]] = None,
+):
+    """Limit the rate of requests to Calcbench
+
+    Requests wait until they are allowed, including retries.  Call with no arguments to remove the limit.
+
+    :param requests_per_second: sustained request rate, None for no limit
+    :param max_in_flight: requests being made at the same time, None for no limit.  Streamed requests are in flight until the response has been read.
+    :param burst: requests that can be made at once after being idle, defaults to one second of requests
+    :param shared_dir: folder in which to keep the limits, so that processes on the same host that use the same folder share the limits.  By default the limits are per process.
+
+    Usage::
+        >>> calcbench.set_rate_limit(requests_per_second=10, max_in_flight=16)
+        >>> # in each worker process
+        >>> calcbench.set_rate_limit(requests_per_second=10, shared_dir="~/.calcbench/rate_limit")
+
+    """
+    _SESSION_STUFF["rate_limiter"] = (
+        RateLimiter(
+            requests_per_second=requests_per_second,
+            max_in_flight=max_in_flight,
+            burst=burst,
+            shared_dir=shared_dir,
+        )
+        if requests_per_second is not None or max_in_flight is not None
+        else None
+    )
+
+
+def enable_response_cache(
+    cache_on: bool = True,
+    cache_dir: Union[str, Path] = "~/.calcbench/response_cache",
+    default_ttl: Optional[timedelta] = timedelta(days=1),
+    end_point_ttls: Mapping[str, Optional[timedelta]] = {},
+    max_size_bytes: int = 2**30,
+    cache_closed_date_ranges: bool = True,
+    closed_date_range_ttl: Optional[timedelta] = timedelta(days=30),
+):
+    """Cache responses on disk
+
+    Requests to the same server, by the same user, with the same end-point and parameters are served from the cache until they expire.  Useful when the same queries are run from many notebooks or jobs.
+
+    :param cache_on: toggle the cache
+    :param cache_dir: folder in which to store responses
+    :param default_ttl: how long responses are kept, None to keep them until they are evicted
+    :param end_point_ttls: time to live by end-point, eg. {"mappedData": timedelta(hours=1), "api/availableMetrics": timedelta(days=7)}
+    :param max_size_bytes: when the cache is bigger than this the least recently used responses are deleted
+    :param cache_closed_date_ranges: keep responses for requests with a date range that ended in the past, for instance point-in-time data with an `end_date`, for `closed_date_range_ttl`
+    :param closed_date_range_ttl: how long responses for date ranges that ended in the past are kept, None to keep them until they are evicted.  Data can be restated or corrected after the range ends.
+
+    Usage::
+        >>> calcbench.enable_response_cache(end_point_ttls={"mappedData": timedelta(hours=4)})
+
+    """
+    _SESSION_STUFF["response_cache"] = (
+        ResponseCache(
+            cache_dir=cache_dir,
+            default_ttl=default_ttl,
+            end_point_ttls=end_point_ttls,
+            max_size_bytes=max_size_bytes,
+        )
+        if cache_on
+        else None
+    )
+    _SESSION_STUFF["cache_closed_date_ranges"] = cache_closed_date_ranges
+    _SESSION_STUFF["closed_date_range_ttl"] = closed_date_range_ttl
+
+
+def enable_disclosure_store(
+    store_on: bool = True,
+    store_dir: Union[str, Path] = "~/.calcbench/disclosures",
+):
+    """Keep disclosure contents on disk
+
+    Disclosures do not change once they are filed.  With the store on, :meth:`DisclosureSearchResults.get_disclosure`, :meth:`DisclosureSearchResults.get_contents` and :func:`disclosure_contents` only go to the server for disclosures that are not in the store.  Use :meth:`DisclosureSearchResults.open_contents` to memory-map large documents.
+
+    :param store_on: toggle the store
+    :param store_dir: folder in which to store disclosures
+
+    Usage::
+        >>> calcbench.enable_disclosure_store()
+
+    """
+    _SESSION_STUFF["disclosure_store"] = (
+        DisclosureStore(store_dir=store_dir) if store_on else None
+    )
+
+
+def enable_disclosure_contents_cache(
+    cache_on: bool = True, max_bytes: int = 256 * 2**20
+):
+    """Keep disclosure contents in memory
+
+    With the cache on, :meth:`DisclosureSearchResults.get_disclosure` and :func:`disclosure_contents` do not go to the server, or the disclosure store, for contents they already got.  The least recently used contents are dropped when the HTML held is larger than `max_bytes`.
+
+    :param cache_on: toggle the cache, turning it off drops the contents held
+    :param max_bytes: most HTML to hold
+
+    Usage::
+        >>> calcbench.enable_disclosure_contents_cache(max_bytes=2**30)
+
+    """
+    _SESSION_STUFF["disclosure_contents_cache"] = (
+        _ContentCache(max_bytes=max_bytes) if cache_on else None
+    )
+
+
 def set_field_values(dataclass, kwargs: dict, date_columns: Iterable[str] = []):
     names = set([f.name for f in dataclasses.fields(dataclass)])
     for k, v in kwargs.items():
@@ -117,10 +117,39 @@ def dimensional_raw(
       >>> )
 
     """
+    payload = _dimensional_raw_payload(
+        company_identifiers=company_identifiers,
+        metrics=metrics,
+        start_year=start_year,
+        start_period=start_period,
+        end_year=end_year,
+        end_period=end_period,
+        period_type=period_type,
+        all_history=all_history,
+        as_originally_reported=as_originally_reported,
+    )
+    return _json_POST(
+        "dimensionalData",
+        payload,
+        parse=lambda response: [DimensionalDataPoint(**p) for p in response],
+    )
+
+
+def _dimensional_raw_payload(
+    company_identifiers: CompanyIdentifiers,
+    metrics: Sequence[str],
+    start_year: Optional[int],
+    start_period: PeriodArgument,
+    end_year: Optional[int],
+    end_period: PeriodArgument,
+    period_type: PeriodType,
+    all_history: bool,
+    as_originally_reported: bool,
+) -> dict:
     if len(metrics) == 0:
         raise (ValueError("Need to supply at least one metric."))
 
-    payload = {
+    return {
         "companiesParameters": {
             "entireUniverse": len(company_identifiers) == 0,
             "companyIdentifiers": company_identifiers,
@@ -140,4 +169,3 @@ def dimensional_raw(
             "AsOriginallyReported": as_originally_reported,
         },
     }
-    return [DimensionalDataPoint(**p) for p in _json_POST("dimensionalData", payload)]
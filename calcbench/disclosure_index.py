@@ -0,0 +1,313 @@
+"""
+Full-text index of disclosures on disk, for searching disclosures without going to the server.
+
+Postings, the positions of each term in each disclosure, are stored in a SQLite database.
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from calcbench.disclosures import disclosure_texts
+from calcbench.models.disclosure_search_results import DisclosureSearchResults
+
+try:
+    import tqdm
+except ImportError:
+    pass
+
+_TOKEN = re.compile(r"\w+")
+
+_QUERY_TOKEN = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    disclosure TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    positions TEXT NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc_id ON postings (doc_id);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower case words in the text
+    """
+    return _TOKEN.findall(text.lower())
+
+
+class _Clause:
+    """
+    A term or a phrase in a query
+    """
+
+    def __init__(self, terms: Sequence[str], negated: bool):
+        self.terms = list(terms)
+        self.negated = negated
+
+
+class DisclosureIndex:
+    """
+    Full-text index of disclosures.
+
+    Queries are words and "quoted phrases".  All of the words and phrases must be in a disclosure, join groups of them with OR to match any group.  Prefix a word or phrase with - to exclude disclosures that contain it.  Results are ranked by TF-IDF.
+
+    Usage::
+
+        >>> index = calcbench.DisclosureIndex("~/.calcbench/disclosure_index")
+        >>> index.add_disclosures(
+        >>>     calcbench.disclosure_search(
+        >>>         company_identifiers=sp500,
+        >>>         disclosure_names=["RiskFactors"],
+        >>>         all_history=True,
+        >>>     )
+        >>> )
+        >>> index.search('"supply chain" tariffs OR "export controls" -china', limit=20)
+
+    """
+
+    def __init__(self, index_dir: Union[str, Path]):
+        """
+        :param index_dir: folder in which to keep the index
+        """
+        self.index_dir = Path(os.path.expanduser(index_dir))
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(self.index_dir / "index.sqlite"), check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def add(self, disclosure: DisclosureSearchResults, text: Optional[str] = None):
+        """
+        Index a disclosure, replacing it if it is already in the index.
+
+        :param text: text of the disclosure, fetched from the server if not supplied
+        """
+        if text is None:
+            text = disclosure.get_contents_text()
+        self._add_many([(disclosure, text)])
+
+    def add_disclosures(
+        self,
+        disclosures: Iterable[DisclosureSearchResults],
+        batch_size: int = 100,
+        progress_bar: Optional["tqdm.std.tqdm"] = None,
+        **kwargs,
+    ):
+        """
+        Fetch and index disclosures, see :func:`calcbench.disclosure_texts`.
+
+        :param batch_size: disclosures written to the index in a transaction
+        :param kwargs: passed to :func:`calcbench.disclosure_texts`
+        """
+        batch: List[Tuple[DisclosureSearchResults, str]] = []
+        for disclosure, text in disclosure_texts(
+            disclosures, progress_bar=progress_bar, **kwargs
+        ):
+            batch.append((disclosure, text))
+            if len(batch) == batch_size:
+                self._add_many(batch)
+                batch = []
+        if batch:
+            self._add_many(batch)
+
+    def search(
+        self, query: str, limit: Optional[int] = None
+    ) -> List[DisclosureSearchResults]:
+        """
+        Disclosures matching the query, the most relevant first.
+
+        :param query: eg. 'goodwill impairment', '"going concern" OR bankruptcy', 'cybersecurity -"no material"'
+        :param limit: maximum number of disclosures to return
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for group in _parse_query(query):
+            for doc_id, score in self._search_group(group).items():
+                scores[doc_id] = max(scores[doc_id], score)
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return self._disclosures(ranked)
+
+    def remove(self, disclosure: DisclosureSearchResults):
+        with self._lock, self._connection:
+            self._delete(_key(disclosure))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM documents"
+            ).fetchone()[0]
+
+    def __contains__(self, disclosure: DisclosureSearchResults) -> bool:
+        with self._lock:
+            return (
+                self._connection.execute(
+                    "SELECT 1 FROM documents WHERE key = ?", (_key(disclosure),)
+                ).fetchone()
+                is not None
+            )
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "DisclosureIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _add_many(self, disclosures: Iterable[Tuple[DisclosureSearchResults, str]]):
+        with self._lock, self._connection:
+            for disclosure, text in disclosures:
+                key = _key(disclosure)
+                self._delete(key)
+                tokens = tokenize(text)
+                doc_id = self._connection.execute(
+                    "INSERT INTO documents (key, disclosure) VALUES (?, ?)",
+                    (key, disclosure.model_dump_json(exclude={"content"})),
+                ).lastrowid
+                positions: Dict[str, List[int]] = defaultdict(list)
+                for position, token in enumerate(tokens):
+                    positions[token].append(position)
+                self._connection.executemany(
+                    "INSERT INTO postings (term, doc_id, positions) VALUES (?, ?, ?)",
+                    (
+                        (term, doc_id, json.dumps(term_positions))
+                        for term, term_positions in positions.items()
+                    ),
+                )
+
+    def _delete(self, key: str):
+        row = self._connection.execute(
+            "SELECT doc_id FROM documents WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            self._connection.execute("DELETE FROM postings WHERE doc_id = ?", row)
+            self._connection.execute("DELETE FROM documents WHERE doc_id = ?", row)
+
+    def _search_group(self, clauses: List[_Clause]) -> Dict[int, float]:
+        """
+        Documents that match all of the clauses, scored by the sum of the TF-IDF of the terms.
+        """
+        positive = [clause for clause in clauses if not clause.negated]
+        if not positive:
+            return {}
+        with self._lock:
+            document_count = self._connection.execute(
+                "SELECT COUNT(*) FROM documents"
+            ).fetchone()[0]
+            postings = {
+                term: self._postings(term)
+                for clause in clauses
+                for term in clause.terms
+            }
+        matches: Optional[Set[int]] = None
+        scores: Counter = Counter()
+        for clause in positive:
+            clause_matches = _clause_matches(clause, postings)
+            matches = clause_matches if matches is None else matches & clause_matches
+        for clause in clauses:
+            if clause.negated:
+                matches -= _clause_matches(clause, postings)  # type: ignore
+        if not matches:
+            return {}
+        for clause in positive:
+            for term in clause.terms:
+                term_postings = postings[term]
+                idf = math.log(1 + document_count / len(term_postings))
+                for doc_id in matches:
+                    scores[doc_id] += (1 + math.log(len(term_postings[doc_id]))) * idf
+        return dict(scores)
+
+    def _postings(self, term: str) -> Dict[int, List[int]]:
+        return {
+            doc_id: json.loads(positions)
+            for doc_id, positions in self._connection.execute(
+                "SELECT doc_id, positions FROM postings WHERE term = ?", (term,)
+            )
+        }
+
+    def _disclosures(self, doc_ids: List[int]) -> List[DisclosureSearchResults]:
+        disclosures: Dict[int, DisclosureSearchResults] = {}
+        with self._lock:
+            for i in range(0, len(doc_ids), 500):
+                chunk = doc_ids[i : i + 500]
+                rows = self._connection.execute(
+                    f"SELECT doc_id, disclosure FROM documents WHERE doc_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for doc_id, disclosure in rows:
+                    disclosures[doc_id] = DisclosureSearchResults.model_validate_json(
+                        disclosure
+                    )
+        return [disclosures[doc_id] for doc_id in doc_ids]
+
+
+def _key(disclosure: DisclosureSearchResults) -> str:
+    key = disclosure._content_key(standardize=False)
+    if key is None:
+        raise ValueError(
+            f"Cannot index {disclosure}, it does not have a fact_id and accession_id"
+        )
+    accession_id, fact_id, network_id, _ = key
+    return json.dumps([accession_id, fact_id, network_id])
+
+
+def _parse_query(query: str) -> List[List[_Clause]]:
+    """
+    Groups of clauses joined by OR
+    """
+    groups: List[List[_Clause]] = [[]]
+    for match in _QUERY_TOKEN.finditer(query):
+        negated_phrase, phrase, word = match.groups()
+        if word == "OR":
+            groups.append([])
+            continue
+        if word is not None:
+            negated = word.startswith("-") and len(word) > 1
+            terms = tokenize(word[1:] if negated else word)
+        else:
+            negated = bool(negated_phrase)
+            terms = tokenize(phrase)
+        if terms:
+            groups[-1].append(_Clause(terms, negated))
+    return [group for group in groups if group]
+
+
+def _clause_matches(
+    clause: _Clause, postings: Dict[str, Dict[int, List[int]]]
+) -> Set[int]:
+    """
+    Documents that contain the term or phrase
+    """
+    documents = set(postings[clause.terms[0]])
+    for term in clause.terms[1:]:
+        documents &= set(postings[term])
+    if len(clause.terms) == 1:
+        return documents
+    matches = set()
+    for doc_id in documents:
+        starts = set(postings[clause.terms[0]][doc_id])
+        for offset, term in enumerate(clause.terms[1:], 1):
+            starts &= {position - offset for position in postings[term][doc_id]}
+            if not starts:
+                break
+        if starts:
+            matches.add(doc_id)
+    return matches
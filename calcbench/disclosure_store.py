@@ -0,0 +1,253 @@
+"""
+On-disk store of disclosure contents.
+
+Disclosures do not change once they are filed so they are kept until they are deleted.  Each HTML blob is stored gzipped once, named by a hash of its contents.  An entry for each disclosure, keyed by accession id, fact id and network id, lists the hashes of its blobs.  Text extracted from the HTML is stored gzipped next to the entry.
+
+Contents can also be kept in memory, bounded by their size, see :func:`calcbench.enable_disclosure_contents_cache`.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from calcbench.models.disclosure_content import DisclosureContent
+
+logger = logging.getLogger(__name__)
+
+BLOB_FILE_SUFFIX = ".html.gz"
+TEXT_FILE_SUFFIX = ".txt.gz"
+
+DisclosureKey = Tuple[int, int, Optional[int], bool]
+"""
+(accession_id, fact_id, network_id, standardize)
+"""
+
+
+class DisclosureStore:
+    """
+    Disclosure contents on disk.
+
+    Usage::
+
+        >>> store = DisclosureStore("~/.calcbench/disclosures")
+        >>> key = DisclosureStore.key(accession_id=1, fact_id=2, network_id=3)
+        >>> store.put(key, content)
+        >>> contents = store.open_contents(key)
+        >>> contents.find(b"goodwill")
+
+    """
+
+    def __init__(self, store_dir: Union[str, Path]):
+        """
+        :param store_dir: folder in which to write disclosures
+        """
+        self.store_dir = Path(os.path.expanduser(store_dir))
+
+    @staticmethod
+    def key(
+        accession_id: int,
+        fact_id: int,
+        network_id: Optional[int] = None,
+        standardize: bool = False,
+    ) -> DisclosureKey:
+        return (accession_id, fact_id, network_id, bool(standardize))
+
+    def get(self, key: DisclosureKey) -> Optional[DisclosureContent]:
+        """
+        The stored disclosure or None if it has not been stored.
+        """
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+        try:
+            blobs = [self._read_blob(h) for h in entry.pop("blob_hashes")]
+        except FileNotFoundError:
+            logger.warning(f"Missing blob for disclosure {key}")
+            return None
+        logger.debug(f"disclosure store hit {key}")
+        return DisclosureContent(**entry, blobs=blobs)
+
+    def put(self, key: DisclosureKey, content: DisclosureContent):
+        entry = content.model_dump(mode="json", exclude={"blobs"})
+        entry["blob_hashes"] = [self._write_blob(blob) for blob in content.blobs]
+        _write_atomic(self._entry_path(key), json.dumps(entry).encode("utf-8"))
+        try:
+            # expanded again the next time it is opened
+            self._expanded_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def open_contents(self, key: DisclosureKey) -> Optional[Union[mmap.mmap, bytes]]:
+        """
+        Memory-map the HTML of a stored disclosure, :attr:`DisclosureContent.contents` encoded as UTF-8.
+
+        The HTML is decompressed to disk the first time it is opened so large documents can be searched without reading them into memory.
+
+        :return: a read-only memory-map, b"" for an empty document, None if the disclosure has not been stored
+        """
+        path = self._expanded_path(key)
+        if not path.exists():
+            content = self.get(key)
+            if content is None:
+                return None
+            _write_atomic(path, content.contents.encode("utf-8"))
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be mapped
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get_text(self, key: DisclosureKey, parser: str) -> Optional[str]:
+        """
+        Text extracted from the disclosure by `parser`, None if it has not been stored.
+        """
+        try:
+            with gzip.open(self._text_path(key, parser), "rb") as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put_text(self, key: DisclosureKey, parser: str, text: str):
+        _write_atomic(
+            self._text_path(key, parser),
+            gzip.compress(text.encode("utf-8"), compresslevel=6),
+        )
+
+    def __contains__(self, key: DisclosureKey) -> bool:
+        return self._entry_path(key).exists()
+
+    def clear(self):
+        """
+        Delete everything in the store
+        """
+        for path in self._files():
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _read_entry(self, key: DisclosureKey) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(key), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _read_blob(self, blob_hash: str) -> str:
+        with gzip.open(self._blob_path(blob_hash), "rb") as f:
+            return f.read().decode("utf-8")
+
+    def _write_blob(self, blob: str) -> str:
+        data = blob.encode("utf-8")
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob_hash)
+        if not path.exists():
+            _write_atomic(path, gzip.compress(data, compresslevel=6))
+        return blob_hash
+
+    def _entry_path(self, key: DisclosureKey) -> Path:
+        return self.store_dir / "disclosures" / str(key[0]) / f"{_key_name(key)}.json"
+
+    def _expanded_path(self, key: DisclosureKey) -> Path:
+        return self.store_dir / "expanded" / str(key[0]) / f"{_key_name(key)}.html"
+
+    def _text_path(self, key: DisclosureKey, parser: str) -> Path:
+        return (
+            self.store_dir
+            / "texts"
+            / str(key[0])
+            / f"{_key_name(key)}.{parser}{TEXT_FILE_SUFFIX}"
+        )
+
+    def _blob_path(self, blob_hash: str) -> Path:
+        return (
+            self.store_dir / "blobs" / blob_hash[:2] / f"{blob_hash}{BLOB_FILE_SUFFIX}"
+        )
+
+    def _files(self) -> Iterator[Path]:
+        for folder, pattern in (
+            ("disclosures", "*/*.json"),
+            ("expanded", "*/*.html"),
+            ("texts", f"*/*{TEXT_FILE_SUFFIX}"),
+            ("blobs", f"*/*{BLOB_FILE_SUFFIX}"),
+        ):
+            if (self.store_dir / folder).exists():
+                yield from (self.store_dir / folder).glob(pattern)
+
+
+def _key_name(key: DisclosureKey) -> str:
+    _, fact_id, network_id, standardize = key
+    name = f"{fact_id}_{'' if network_id is None else network_id}"
+    return f"{name}_standardized" if standardize else name
+
+
+def _write_atomic(path: Path, data: bytes):
+    """
+    Write to a temporary file and move it into place so readers never see a partial file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class _ContentCache:
+    """
+    In-memory cache of disclosure contents.
+
+    The least recently used contents are dropped when the HTML held is larger than `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._contents: "OrderedDict[DisclosureKey, DisclosureContent]" = OrderedDict()
+        self._size_bytes = 0
+
+    def get(self, key: DisclosureKey) -> Optional[DisclosureContent]:
+        with self._lock:
+            content = self._contents.get(key)
+            if content is not None:
+                self._contents.move_to_end(key)
+            return content
+
+    def put(self, key: DisclosureKey, content: DisclosureContent):
+        size = _content_size(content)
+        with self._lock:
+            if key in self._contents:
+                self._size_bytes -= _content_size(self._contents.pop(key))
+            if size > self.max_bytes:
+                return
+            self._contents[key] = content
+            self._size_bytes += size
+            while self._size_bytes > self.max_bytes:
+                _, evicted = self._contents.popitem(last=False)
+                self._size_bytes -= _content_size(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._contents.clear()
+            self._size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+
+def _content_size(content: DisclosureContent) -> int:
+    return sum(len(blob) for blob in content.blobs)
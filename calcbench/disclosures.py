@@ -1,5 +1,19 @@
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date
-from typing import Generator, Iterable, Optional, Sequence
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from calcbench.api_query_params import (
     APIQueryParams,
@@ -11,7 +25,11 @@ from calcbench.api_query_params import (
 from calcbench.models.disclosure import (
     DisclosureAPIPageParameters,
 )
-from calcbench.models.disclosure_search_results import DisclosureSearchResults
+from calcbench.models.disclosure_content import DisclosureContent
+from calcbench.models.disclosure_search_results import (
+    DisclosureSearchResults,
+    _html_to_text,
+)
 from calcbench.models.period import Period
 from calcbench.models.period_type import PeriodType
 
@@ -22,11 +40,14 @@ except ImportError:
 
 
 from calcbench.api_client import (
+    _SESSION_STUFF,
+    _check_pool_size,
     _json_POST,
     logger,
 )
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError:
     "Can't find pandas, won't be able to use the functions that return DataFrames."
@@ -37,6 +58,13 @@ try:
 except ImportError:
     pass
 
+try:
+    import lxml  # noqa: F401
+
+    _FAST_PARSER = "lxml"
+except ImportError:
+    _FAST_PARSER = "html.parser"
+
 
 def disclosure_search(
     company_identifiers: Optional[CompanyIdentifiers] = None,
@@ -59,6 +87,7 @@ def disclosure_search(
     accession_id: Optional[int] = None,
     all_text_blocks: bool = False,
     all_disclosures: bool = False,
+    max_workers: int = 1,
 ) -> Generator[DisclosureSearchResults, None, None]:
     """
     Footnotes and other text
@@ -84,6 +113,7 @@ def disclosure_search(
     :param block_tag_name: Level 2 or 3 XBRL tag.  See the list of FASB tags @ https://www.calcbench.com/disclosure_list#blockTags
     :param all_text_blocks: All level 1 and accounting policy text blocks
     :param all_disclosures: All disclosures, 10-K/Q XBRL notes, 10-K/Q non-XBRL sections and 8-Ks.  Does not include MD&A sections.
+    :param max_workers: threads fetching results.  Companies are searched 30 at a time, with more than one worker the chunks are searched concurrently and the next page of each chunk is fetched while the current page is processed.  Results are returned in the same order.
     :return: A iterator of DisclosureSearchResults
 
     Usage::
@@ -95,9 +125,67 @@ def disclosure_search(
        >>>          company_identifiers=sp500,
        >>>          disclosure_names=["RiskFactors"],
        >>>          all_history=True,
-       >>>          progress_bar=progress_bar
+       >>>          progress_bar=progress_bar,
+       >>>          max_workers=8,
        >>>     )
 
+    """
+    payloads = _disclosure_search_payloads(
+        company_identifiers=company_identifiers,
+        full_text_search_term=full_text_search_term,
+        year=year,
+        period=period,
+        period_type=period_type,
+        document_type=document_type,
+        block_tag_name=block_tag_name,
+        entire_universe=entire_universe,
+        use_fiscal_period=use_fiscal_period,
+        document_name=document_name,
+        all_history=all_history,
+        updated_from=updated_from,
+        batch_size=batch_size,
+        sub_divide=sub_divide,
+        single_company_period_all_disclosures=single_company_period_all_disclosures,
+        disclosure_names=disclosure_names,
+        accession_id=accession_id,
+        all_text_blocks=all_text_blocks,
+        all_disclosures=all_disclosures,
+    )
+    if max_workers > 1:
+        results = _concurrent_document_search_results(
+            payloads, max_workers=max_workers, progress_bar=progress_bar
+        )
+        for r in results:
+            yield r
+    else:
+        for payload in payloads:
+            for r in _document_search_results(payload, progress_bar=progress_bar):
+                yield r
+
+
+def _disclosure_search_payloads(
+    company_identifiers: Optional[CompanyIdentifiers] = None,
+    full_text_search_term: Optional[str] = None,
+    year: Optional[int] = None,
+    period: PeriodArgument = Period.Annual,
+    period_type: Optional[PeriodType] = None,
+    document_type: Optional[str] = None,
+    block_tag_name: Optional[str] = None,
+    entire_universe: bool = False,
+    use_fiscal_period: bool = False,
+    document_name: Optional[str] = None,
+    all_history: bool = False,
+    updated_from: Optional[date] = None,
+    batch_size: int = 100,
+    sub_divide: bool = False,
+    single_company_period_all_disclosures: bool = False,
+    disclosure_names: Sequence[str] = [],
+    accession_id: Optional[int] = None,
+    all_text_blocks: bool = False,
+    all_disclosures: bool = False,
+) -> List[APIQueryParams[DisclosureAPIPageParameters]]:
+    """
+    Validate the arguments to `disclosure_search` and build a payload for each chunk of companies.
     """
     if not any(
         [
@@ -154,6 +242,7 @@ def disclosure_search(
         }
     )
 
+    payloads = []
     if company_identifiers:
         chunk_size = 30
         for i in range(0, len(company_identifiers), chunk_size):
@@ -161,14 +250,13 @@ def disclosure_search(
             company_parameters = CompaniesParameters(
                 companyIdentifiers=company_identifier_chunk, entireUniverse=False
             )
-            payload = APIQueryParams(
-                companiesParameters=company_parameters,
-                periodParameters=period_parameters,
-                pageParameters=page_parameters,
+            payloads.append(
+                APIQueryParams(
+                    companiesParameters=company_parameters,
+                    periodParameters=period_parameters,
+                    pageParameters=page_parameters.model_copy(),
+                )
             )
-
-            for r in _document_search_results(payload, progress_bar=progress_bar):
-                yield r
     else:
         payload = APIQueryParams(
             companiesParameters=CompaniesParameters(
@@ -177,8 +265,8 @@ def disclosure_search(
             periodParameters=period_parameters,
             pageParameters=page_parameters,
         )
-        for r in _document_search_results(payload, progress_bar=progress_bar):
-            yield r
+        payloads.append(payload)
+    return payloads
 
 
 def disclosure_dataframe(
@@ -195,6 +283,8 @@ def disclosure_dataframe(
     entire_universe: bool = False,
     batch_size: int = 100,
     all_disclosures: bool = False,
+    max_workers: int = 1,
+    layout: Literal["wide", "long"] = "wide",
 ) -> "pd.DataFrame":
     """Disclosures/Footnotes in a DataFrame
 
@@ -211,6 +301,8 @@ def disclosure_dataframe(
     :param use_fiscal_period: Index disclosure by fiscal, as opposed to calendar periods.
     :param entire_universe: Data for all companies
     :param all_disclosures: All disclosures, 10-K/Q XBRL notes, 10-K/Q non-XBRL sections and 8-Ks.  Does not include MD&A sections.
+    :param max_workers: threads fetching disclosures, see :func:`disclosure_search`
+    :param layout: "wide" for a column for each disclosure name -> company identifier, "long" for a row for each disclosure indexed by company identifier, disclosure name and period with the fields of the disclosures as columns and the disclosure in the "value" column.
     :return: A DataFrame of DisclosureSearchResults indexed by document name -> company identifier.  An empty frame if no results are found.
 
     Usage::
@@ -223,6 +315,8 @@ def disclosure_dataframe(
       >>>                             na_action="ignore")
 
     """
+    if layout not in ("wide", "long"):
+        raise ValueError(f'layout must be "wide" or "long", not {layout!r}')
     if block_tag_names:
         docs: Iterable[DisclosureSearchResults] = []
         for block_tag_name in block_tag_names:
@@ -238,6 +332,7 @@ def disclosure_dataframe(
                     period_type=period_type,
                     entire_universe=entire_universe,
                     batch_size=batch_size,
+                    max_workers=max_workers,
                 )
             )
     else:
@@ -253,57 +348,260 @@ def disclosure_dataframe(
             entire_universe=entire_universe,
             batch_size=batch_size,
             all_disclosures=all_disclosures,
+            max_workers=max_workers,
         )
-    all_docs = []
-    for doc in docs:
-        period_year = doc.fiscal_year if use_fiscal_period else doc.calendar_year
+    docs = list(docs)
+    years = [
+        doc.fiscal_year if use_fiscal_period else doc.calendar_year for doc in docs
+    ]
+    for doc, period_year in zip(docs, years):
         if not period_year:
             logger.info(f"Bad year for {doc}")
-            continue
-        if period in ("Y", 0) or period_type == PeriodType.Annual:
-            pandas_period = pd.Period(year=period_year, freq="A")  # type: ignore
-        else:
-            try:
-                if (period_type == PeriodType.Quarterly) or all_history:
-                    # The server is not handling period type correctly.  Doing it here because it is easier.  akittredge, July 2021.
-                    if use_fiscal_period:
-                        if doc.fiscal_period == Period.Annual:
-                            quarter = Period.Q4
-                        else:
-                            quarter = doc.fiscal_period
-                    else:
-                        quarter = doc.calendar_period
-                else:
-                    raise ValueError("Must pass period_type or period")
-
-            except KeyError:
-                # This happens for non-XBRL companies
-                logger.info("Strange period for {ticker}".format(doc.ticker))
-                pandas_period = None
-            else:
-                pandas_period = pd.Period(year=period_year, quarter=quarter, freq="Q")  # type: ignore
-        doc_dict = doc.model_dump()
-        all_docs.append(
-            {
-                **doc_dict,
-                **{
-                    "period": pandas_period,
-                    identifier_key: (doc_dict[identifier_key] or ""),
-                    "value": doc,
-                },
-            },
-        )
-    if not all_docs:
+    docs = [doc for doc, period_year in zip(docs, years) if period_year]
+    if not docs:
         # No results, return an empty frame.
         return pd.DataFrame()
-    data = pd.DataFrame(all_docs)
+    years = [period_year for period_year in years if period_year]
+    if period in ("Y", 0) or period_type == PeriodType.Annual:
+        periods = _period_index(years, quarters=None)
+    elif (period_type == PeriodType.Quarterly) or all_history:
+        # The server is not handling period type correctly.  Doing it here because it is easier.  akittredge, July 2021.
+        if use_fiscal_period:
+            quarters = [
+                Period.Q4 if doc.fiscal_period == Period.Annual else doc.fiscal_period
+                for doc in docs
+            ]
+        else:
+            quarters = [doc.calendar_period for doc in docs]
+        periods = _period_index(years, quarters=quarters)
+    else:
+        raise ValueError("Must pass period_type or period")
+    columns: Dict[str, Any] = {
+        identifier_key: [getattr(doc, identifier_key) or "" for doc in docs],
+        "disclosure_type_name": [doc.disclosure_type_name for doc in docs],
+        "period": periods,
+    }
+    if layout == "long":
+        data = pd.DataFrame([dict(doc) for doc in docs]).assign(**columns)
+    else:
+        data = pd.DataFrame(columns)
+    data["value"] = docs
     data = data.set_index(keys=[identifier_key, "disclosure_type_name", "period"])  # type: ignore
-    data = data.loc[~data.index.duplicated()]  # type:ignore There can be duplicates
-    data = data.unstack("disclosure_type_name")["value"]  # type: ignore
+    data = data.loc[~data.index.duplicated()]  # type: ignore There can be duplicates
+    if layout == "long":
+        return data
+    data = data["value"].unstack("disclosure_type_name")  # type: ignore
     data = data.unstack(identifier_key)
     return data
 
 
+def _period_index(
+    years: Sequence[int], quarters: Optional[Sequence[Any]]
+) -> "pd.PeriodIndex":
+    """
+    Annual periods, or quarterly periods if `quarters` is passed.  Quarters that are not 1-4 are NaT.
+    """
+    year_array = np.asarray(years, dtype="int64")
+    if quarters is None:
+        fields = {"year": year_array, "month": np.full(len(years), 12)}
+        freq = "Y"
+    else:
+        quarter_array = np.array(
+            [q if q in (1, 2, 3, 4) else 0 for q in quarters], dtype="int64"
+        )
+        if not quarter_array.all():
+            # This happens for non-XBRL companies
+            logger.info("Strange periods, setting them to NaT")
+        fields = {
+            "year": year_array,
+            "quarter": np.where(quarter_array, quarter_array, 1),
+        }
+        freq = "Q"
+    try:
+        periods = pd.PeriodIndex.from_fields(freq=freq, **fields)
+    except AttributeError:
+        # pandas < 2.2
+        periods = pd.PeriodIndex(freq=freq, **fields)
+    if quarters is not None:
+        periods = periods.where(quarter_array != 0)
+    return periods
+
+
+def disclosure_contents(
+    disclosures: Iterable[DisclosureSearchResults],
+    standardize: bool = False,
+    max_workers: int = 8,
+    progress_bar: Optional["tqdm.std.tqdm"] = None,
+) -> List[DisclosureContent]:
+    """Contents of many disclosures
+
+    Fetches the contents on a pool of threads, the contents of duplicate disclosures are fetched once.  Contents are kept in memory if :func:`calcbench.enable_disclosure_contents_cache` is on and on disk if :func:`calcbench.enable_disclosure_store` is on.
+
+    :param disclosures: disclosures returned from :func:`disclosure_search`
+    :param standardize: Translate the contents into standardized/idiomatic HTML
+    :param max_workers: number of concurrent requests
+    :param progress_bar: Pass a tqdm progress bar to keep an eye on things.
+    :return: The contents, in the same order as `disclosures`
+
+    Usage::
+
+      >>> risk_factors = list(calcbench.disclosure_search(company_identifiers=["msft", "goog"],
+      >>>                                                 disclosure_names=["RiskFactors"],
+      >>>                                                 all_history=True))
+      >>> contents = calcbench.disclosure_contents(risk_factors)
+      >>> word_counts = [len(content.contents.split()) for content in contents]
+
+    """
+    disclosures = list(disclosures)
+    unique: Dict[Any, DisclosureSearchResults] = {}
+    for i, disclosure in enumerate(disclosures):
+        # Disclosures without an id are each fetched
+        key = disclosure._content_key(standardize) or i
+        unique.setdefault(key, disclosure)
+
+    def get_disclosure(disclosure: DisclosureSearchResults) -> DisclosureContent:
+        content = disclosure.get_disclosure(standardize=standardize)
+        if progress_bar is not None:
+            progress_bar.update()
+        return content
+
+    _check_pool_size(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        contents = dict(zip(unique, executor.map(get_disclosure, unique.values())))
+    return [
+        contents[disclosure._content_key(standardize) or i]
+        for i, disclosure in enumerate(disclosures)
+    ]
+
+
+def disclosure_texts(
+    disclosures: Iterable[DisclosureSearchResults],
+    max_workers: Optional[int] = None,
+    fetch_workers: int = 8,
+    parser: Optional[str] = None,
+    chunk_size: int = 64,
+    progress_bar: Optional["tqdm.std.tqdm"] = None,
+) -> Iterator[Tuple[DisclosureSearchResults, str]]:
+    """Text of many disclosures
+
+    Extracts the text from the HTML of disclosures in a pool of processes, while the contents of the next disclosures are fetched.  A few small documents, or `max_workers=1`, are extracted in this process.  Like :meth:`DisclosureSearchResults.get_contents_text` the text is kept in the disclosure store if it is enabled, see :func:`calcbench.enable_disclosure_store`.
+
+    :param disclosures: disclosures returned from :func:`disclosure_search`
+    :param max_workers: processes extracting text, defaults to the number of CPUs
+    :param fetch_workers: concurrent requests for contents, see :func:`disclosure_contents`
+    :param parser: BeautifulSoup parser, defaults to "lxml" if it is installed, otherwise "html.parser".
+    :param chunk_size: number of disclosures fetched at a time
+    :param progress_bar: Pass a tqdm progress bar to keep an eye on things.
+    :return: An iterator of (disclosure, text) in the same order as `disclosures`
+
+    Usage::
+
+      >>> risk_factors = calcbench.disclosure_search(company_identifiers=sp500,
+      >>>                                            disclosure_names=["RiskFactors"],
+      >>>                                            all_history=True)
+      >>> for disclosure, text in calcbench.disclosure_texts(risk_factors):
+      >>>     word_counts[disclosure.ticker] = len(text.split())
+
+    """
+    parser = parser or _FAST_PARSER
+    store = _SESSION_STUFF["disclosure_store"]
+    executor: Optional[ProcessPoolExecutor] = None
+    try:
+        pending: List[Tuple[DisclosureSearchResults, Union[str, Future]]] = []
+        for chunk in _chunks(disclosures, chunk_size):
+            texts: Dict[int, Union[str, Future]] = {}
+            to_fetch = []
+            for i, disclosure in enumerate(chunk):
+                store_key = disclosure._content_key(standardize=False)
+                text = (
+                    store.get_text(store_key, parser) if store and store_key else None
+                )
+                if text is None:
+                    to_fetch.append(i)
+                else:
+                    texts[i] = text
+            contents = disclosure_contents(
+                [chunk[i] for i in to_fetch], max_workers=fetch_workers
+            )
+            if (
+                executor is None
+                and max_workers != 1
+                and sum(len(content.contents or "") for content in contents)
+                >= _PROCESS_POOL_MIN_CHARACTERS
+            ):
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+            for i, content in zip(to_fetch, contents):
+                texts[i] = (
+                    executor.submit(_html_to_text, content.contents, parser)
+                    if executor
+                    else _extract_text(content.contents, parser)
+                )
+            # Results for the previous chunk are returned while this chunk is extracted
+            yield from _finish_texts(pending, parser, progress_bar)
+            pending = [(disclosure, texts[i]) for i, disclosure in enumerate(chunk)]
+        yield from _finish_texts(pending, parser, progress_bar)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+_PROCESS_POOL_MIN_CHARACTERS = 2**20
+"""
+Text is extracted in this process until a chunk has this much HTML, starting a pool of processes takes longer than parsing a few documents
+"""
+
+
+def _extract_text(html: str, parser: str) -> Future:
+    """
+    Extract the text in this process, as a finished future like the ones from the process pool
+    """
+    future: Future = Future()
+    try:
+        future.set_result(_html_to_text(html, parser))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _finish_texts(
+    pending: List[Tuple[DisclosureSearchResults, Union[str, Future]]],
+    parser: str,
+    progress_bar: Optional["tqdm.std.tqdm"],
+) -> Iterator[Tuple[DisclosureSearchResults, str]]:
+    store = _SESSION_STUFF["disclosure_store"]
+    for disclosure, text in pending:
+        if isinstance(text, Future):
+            text = text.result()
+            store_key = disclosure._content_key(standardize=False)
+            if store and store_key:
+                store.put_text(store_key, parser, text)
+        if progress_bar is not None:
+            progress_bar.update()
+        yield disclosure, text
+
+
+def _chunks(
+    disclosures: Iterable[DisclosureSearchResults], chunk_size: int
+) -> Iterator[List[DisclosureSearchResults]]:
+    chunk: List[DisclosureSearchResults] = []
+    for disclosure in disclosures:
+        chunk.append(disclosure)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clear_disclosure_contents_cache():
+    """
+    Drop the disclosure contents held in memory, see :func:`calcbench.enable_disclosure_contents_cache`
+    """
+    cache = _SESSION_STUFF["disclosure_contents_cache"]
+    if cache is not None:
+        cache.clear()
+
+
 def _document_search_results(
     payload: APIQueryParams[DisclosureAPIPageParameters],
     progress_bar: Optional["tqdm.std.tqdm"] = None,
@@ -311,16 +609,117 @@ def _document_search_results(
     """
     Keep making requests until the server returns "moreResults" == false
     """
+    for disclosures in _search_pages(payload):
+        if progress_bar is not None:
+            progress_bar.update(len(disclosures))
+        yield from disclosures
+
+
+def _search_pages(
+    payload: APIQueryParams[DisclosureAPIPageParameters],
+) -> Iterator[List[DisclosureSearchResults]]:
     results = {"moreResults": True}
     while results["moreResults"]:
-        results = _json_POST("footnoteSearch", payload)
+        results = _json_POST("footnoteSearch", payload, parse=_parse_disclosures)
         if not results:
             return
-        disclosures = results["footnotes"]
-        if progress_bar is not None:
-            progress_bar.update(len(disclosures))
-        for result in disclosures:
-            yield DisclosureSearchResults(**result)
+        yield results["footnotes"]
         payload.pageParameters.startOffset = results["nextGroupStartOffset"]
 
     payload.pageParameters.startOffset = None
+
+
+_PREFETCH_PAGES = 2
+"""
+Pages fetched ahead of the caller for each chunk of companies
+"""
+
+_END_OF_PAGES = object()
+
+
+def _concurrent_document_search_results(
+    payloads: Sequence[APIQueryParams[DisclosureAPIPageParameters]],
+    max_workers: int,
+    progress_bar: Optional["tqdm.std.tqdm"] = None,
+) -> Iterator[DisclosureSearchResults]:
+    """
+    Page through each payload on a pool of threads, yield results in the same order as calling :func:`_document_search_results` on each payload.
+
+    Each thread puts pages on a bounded queue, so it fetches the next page while the caller processes the current one.  A chunk is submitted when the chunk `max_workers` before it has been consumed, so chunks that finish early do not pile up and memory is bounded by `max_workers` * `_PREFETCH_PAGES` pages.
+    """
+    _check_pool_size(max_workers)
+    stop = threading.Event()
+    page_queues: List["queue.Queue[Any]"] = [
+        queue.Queue(maxsize=_PREFETCH_PAGES) for _ in payloads
+    ]
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures: List[Future] = []
+
+    def submit(index: int):
+        if index < len(payloads):
+            futures.append(
+                executor.submit(
+                    _fetch_pages,
+                    payloads[index].model_copy(deep=True),
+                    page_queues[index],
+                    stop,
+                )
+            )
+
+    # Chunks are submitted in order so the chunk being consumed is always running or finished.
+    for index in range(max_workers):
+        submit(index)
+    try:
+        for index, page_queue in enumerate(page_queues):
+            while True:
+                page = page_queue.get()
+                if page is _END_OF_PAGES:
+                    break
+                if isinstance(page, BaseException):
+                    raise page
+                if progress_bar is not None:
+                    progress_bar.update(len(page))
+                yield from page
+            submit(index + max_workers)
+    finally:
+        stop.set()
+        # Like shutdown(cancel_futures=True), which needs Python 3.9.  Requests in flight are not waited for, their threads stop when they try to put the page on the queue.
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _fetch_pages(
+    payload: APIQueryParams[DisclosureAPIPageParameters],
+    page_queue: "queue.Queue[Any]",
+    stop: threading.Event,
+):
+    try:
+        for page in _search_pages(payload):
+            if not _put_page(page_queue, page, stop):
+                return
+    except Exception as e:
+        _put_page(page_queue, e, stop)
+    else:
+        _put_page(page_queue, _END_OF_PAGES, stop)
+
+
+def _put_page(page_queue: "queue.Queue[Any]", page: Any, stop: threading.Event) -> bool:
+    """
+    :return: False if the caller stopped consuming pages
+    """
+    while not stop.is_set():
+        try:
+            page_queue.put(page, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _parse_disclosures(results: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if results:
+        results["footnotes"] = [
+            DisclosureSearchResults(**result) for result in results["footnotes"]
+        ]
+    return results
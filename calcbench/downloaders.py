@@ -1,15 +1,39 @@
+import json
 import os
 import shutil
-from typing import Callable, List, Literal, Optional, Sequence, TypeVar, Union
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from pathlib import Path
 
 from requests import HTTPError
 
 
 import calcbench as cb
+from calcbench.api_client import _check_pool_size, logger
 import pandas as pd
 from tqdm.auto import tqdm
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
 
 cb.enable_backoff(
     giveup=lambda e: isinstance(e, HTTPError) and (e.response.status_code in [404, 500])
@@ -17,6 +41,8 @@ cb.enable_backoff(
 
 T = TypeVar("T")
 
+PARQUET_PART_PREFIX = "part-"
+
 
 def iterate_to_dataframe(
     arguments: Sequence[T],
@@ -26,7 +52,7 @@ def iterate_to_dataframe(
 
     Usage::
 
-    >>> %pip install calcbench-api-client[Pandas,Backoff,tqdm]
+    >>> %pip install calcbench-api-client[Pandas,tqdm]
     >>> from calcbench.downloaders import iterate_to_dataframe
     >>> import calcbench as cb
     >>> tickers = cb.tickers(entire_universe=True)
@@ -80,7 +106,7 @@ def iterate_and_save_pandas(
 
     Usage::
 
-    >>> %pip install calcbench-api-client[Pandas,Backoff,tqdm]
+    >>> %pip install calcbench-api-client[Pandas,tqdm]
     >>> from calcbench.downloaders import iterate_and_save_pandas
     >>> import calcbench as cb
     >>> tickers = cb.tickers(entire_universe=True)
@@ -127,6 +153,7 @@ def iterate_and_save_parquet(
     write_mode: Literal["w", "a"] = "w",
     parquet_file: Optional[Union[str, Path]] = None,
     csv_root: Optional[Union[str, Path]] = None,
+    compact: bool = False,
 ):
     """
     Apply the arguments to a function a save to a pyarrow dataset.
@@ -137,10 +164,11 @@ def iterate_and_save_parquet(
     :param write_mode: "w" to start by deleting the dataset directory, "a" to add files.
     :param parquet_file: If supplied, create a single parquet file after we have all the data.
     :param csv_root: folder in which to write the data set as csv files.
+    :param compact: buffer the data and write large files sorted by `partition_cols` with :class:`ParquetDatasetWriter`, rather than a file for each argument.
 
     Usage::
 
-    >>> %pip install calcbench-api-client[Pandas,Backoff,tqdm,pyarrow]
+    >>> %pip install calcbench-api-client[Pandas,tqdm,pyarrow]
     >>> tickers = sorted(cb.tickers(entire_universe=True), key=lambda ticker: hash(ticker)) # randomize the order so the time estimate is better
     >>> iterate_and_save_pyarrow_dataset(
     >>>     arguments=tickers,
@@ -168,40 +196,511 @@ def iterate_and_save_parquet(
     root_path = _set_up_directory(root_path=root_path, write_mode=write_mode)
     if csv_root:
         csv_root = _set_up_directory(root_path=csv_root, write_mode=write_mode)
-    for argument in tqdm(list(arguments)):
-        try:
-            df = f(argument)
-            if df.empty:
-                continue
-        except KeyboardInterrupt:
-            raise
-        except Exception as e:
-            tqdm.write(f"Exception getting {argument} {e}")
-        else:
-            table = pa.Table.from_pandas(df, preserve_index=True)
-            pq.write_to_dataset(
-                table=table,
-                root_path=root_path,
-                partition_cols=partition_cols,
-                **{"allow_truncated_timestamps": True, "coerce_timestamps": "us"},
-            )
-            if csv_root:
-                ds.write_dataset(
-                    data=table,
-                    base_dir=csv_root,
-                    partitioning=partition_cols,
-                    schema=table.schema,
-                    format="csv",
-                    existing_data_behavior="delete_matching",
-                )
+    writer = (
+        ParquetDatasetWriter(root_path, sort_by=partition_cols or [])
+        if compact
+        else None
+    )
+    with writer or nullcontext():
+        for argument in tqdm(list(arguments)):
+            try:
+                df = f(argument)
+                if df.empty:
+                    continue
+            except KeyboardInterrupt:
+                raise
+            except Exception as e:
+                tqdm.write(f"Exception getting {argument} {e}")
+            else:
+                table = pa.Table.from_pandas(df, preserve_index=True)
+                if writer:
+                    writer.write(table)
+                else:
+                    pq.write_to_dataset(
+                        table=table,
+                        root_path=root_path,
+                        partition_cols=partition_cols,
+                        **{
+                            "allow_truncated_timestamps": True,
+                            "coerce_timestamps": "us",
+                        },
+                    )
+                if csv_root:
+                    ds.write_dataset(
+                        data=table,
+                        base_dir=csv_root,
+                        partitioning=partition_cols,
+                        schema=table.schema,
+                        format="csv",
+                        existing_data_behavior="delete_matching",
+                    )
 
     if parquet_file:
-        dataset = ds.dataset(root_path, format="parquet", partitioning="hive")
+        if writer:
+            dataset = ds.dataset(root_path, format="parquet", schema=writer.schema)
+        else:
+            dataset = ds.dataset(root_path, format="parquet", partitioning="hive")
         with pq.ParquetWriter(parquet_file, schema=dataset.schema) as writer:
             for batch in tqdm(dataset.to_batches()):
                 writer.write_batch(batch)
 
 
+class ParquetDatasetWriter:
+    """
+    Write DataFrames to a directory of Parquet files with large row groups and one schema.
+
+    DataFrames are buffered as Arrow tables until the buffer is `buffer_size_bytes`, then sorted and written as row groups of about `row_group_size_bytes`.  Files roll over after `max_rows_per_file` rows.
+    Columns missing from a DataFrame are written as nulls.  If a DataFrame has new columns or types the schema is widened and a new file started, the final schema is written to `_common_metadata`.
+
+    Requires the pyarrow package. ``pip install calcbench-api-client[pyarrow]``
+
+    Usage::
+
+    >>> with ParquetDatasetWriter("~/standardized_PIT_compact/") as writer:
+    >>>     for ticker in tickers:
+    >>>         writer.write(cb.standardized(company_identifiers=[ticker], point_in_time=True))
+    >>> # Read the dataset
+    >>> import pyarrow.dataset as ds
+    >>> import pyarrow.parquet as pq
+    >>> schema = pq.read_schema("~/standardized_PIT_compact/_common_metadata")
+    >>> data = ds.dataset("~/standardized_PIT_compact/", schema=schema).to_table().to_pandas()
+
+    """
+
+    def __init__(
+        self,
+        root_path: Union[str, Path],
+        schema: Optional["pa.Schema"] = None,
+        sort_by: Sequence[str] = ["ticker"],
+        buffer_size_bytes: int = 256 * 2**20,
+        row_group_size_bytes: int = 64 * 2**20,
+        max_rows_per_file: int = 50_000_000,
+        on_commit: Optional[Callable[[List[Any]], None]] = None,
+    ):
+        """
+        :param root_path: folder in which to write the files
+        :param schema: schema of the dataset, if not supplied it is the union of the schemas of the DataFrames
+        :param sort_by: columns to sort by within a flush so row group statistics can be used to skip data
+        :param buffer_size_bytes: in memory size of the data to buffer before writing
+        :param row_group_size_bytes: target in memory size of row groups
+        :param max_rows_per_file: start a new file after this many rows
+        :param on_commit: called with the tokens passed to :meth:`write` once all of their rows are in finished files.  A file is written under a temporary name and renamed when it is finished, at `max_rows_per_file` or :meth:`close`.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.root_path = Path(os.path.expanduser(root_path))
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        self.sort_by = list(sort_by)
+        self.buffer_size_bytes = buffer_size_bytes
+        self.row_group_size_bytes = row_group_size_bytes
+        self.max_rows_per_file = max_rows_per_file
+        self.on_commit = on_commit
+        self._fixed_schema = schema is not None
+        self.schema = schema
+        self._buffer: List["pa.Table"] = []
+        self._buffer_bytes = 0
+        self._buffer_tokens: List[Any] = []
+        self._writer: Optional["pq.ParquetWriter"] = None
+        self._file_path: Optional[Path] = None
+        self._file_rows = 0
+        self._file_tokens: List[Any] = []
+        # Files that were being written when a previous run stopped have no footer, their tokens were never committed
+        for unfinished in self.root_path.glob(f".{PARQUET_PART_PREFIX}*.parquet.tmp"):
+            logger.info(f"removing unfinished file {unfinished}")
+            os.remove(unfinished)
+        existing = sorted(self.root_path.glob(f"{PARQUET_PART_PREFIX}*.parquet"))
+        self._file_number = 0
+        schemas = []
+        for part in existing:
+            try:
+                schemas.append(pq.read_schema(part))
+            except pa.ArrowInvalid:
+                # written by a version that did not use temporary names
+                logger.warning(f"removing unfinished file {part}")
+                os.remove(part)
+                continue
+            self._file_number = max(
+                self._file_number, int(part.stem[len(PARQUET_PART_PREFIX) :]) + 1
+            )
+        if schemas and not self._fixed_schema:
+            self.schema = _unify_schemas(schemas)
+
+    def write(self, data: Union[pd.DataFrame, "pa.Table"], token: Any = None):
+        """
+        :param token: passed to `on_commit` once the data is in finished files, eg. the argument the data was downloaded for
+        """
+        import pyarrow as pa
+
+        if token is not None:
+            self._buffer_tokens.append(token)
+        if isinstance(data, pd.DataFrame):
+            if data.empty:
+                return
+            data = pa.Table.from_pandas(data, preserve_index=True)
+        # Categoricals from different DataFrames have different dictionaries and index types,
+        # Parquet dictionary encodes strings anyway.
+        for i, field in enumerate(data.schema):
+            if pa.types.is_dictionary(field.type):
+                data = data.set_column(
+                    i,
+                    field.with_type(field.type.value_type),
+                    data.column(i).cast(field.type.value_type),
+                )
+        self._buffer.append(data)
+        self._buffer_bytes += data.nbytes
+        if self._buffer_bytes >= self.buffer_size_bytes:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered data.
+        """
+        import pyarrow as pa
+
+        buffer, self._buffer = self._buffer, []
+        tokens, self._buffer_tokens = self._buffer_tokens, []
+        self._buffer_bytes = 0
+        if buffer:
+            if not self._fixed_schema:
+                schema = _unify_schemas(
+                    ([self.schema] if self.schema else []) + [t.schema for t in buffer]
+                )
+                if self.schema is not None and not schema.equals(self.schema):
+                    logger.info("schema changed, starting a new file")
+                    self._close_file()
+                self.schema = schema
+            table = pa.concat_tables([self._conform(t) for t in buffer])
+            self._write_table(self._sorted(table))
+        # Rows of these tokens may be in the open file, or in files closed while writing this table
+        self._file_tokens.extend(tokens)
+        if self._writer is None:
+            self._close_file()
+
+    def close(self):
+        import pyarrow.parquet as pq
+
+        self.flush()
+        self._close_file()
+        if self.schema is not None:
+            pq.write_metadata(self.schema, self.root_path / "_common_metadata")
+
+    def __enter__(self) -> "ParquetDatasetWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _conform(self, table: "pa.Table") -> "pa.Table":
+        import pyarrow as pa
+
+        assert self.schema is not None
+        for field in self.schema:
+            if field.name not in table.column_names:
+                table = table.append_column(
+                    field, pa.nulls(table.num_rows, type=field.type)
+                )
+        extra_columns = set(table.column_names) - set(self.schema.names)
+        if extra_columns:
+            logger.warning(f"dropping columns not in the schema {extra_columns}")
+        return table.select(self.schema.names).cast(self.schema)
+
+    def _sorted(self, table: "pa.Table") -> "pa.Table":
+        sort_by = [c for c in self.sort_by if c in table.column_names]
+        if not sort_by:
+            return table
+        return table.sort_by([(c, "ascending") for c in sort_by])
+
+    def _write_table(self, table: "pa.Table"):
+        import pyarrow.parquet as pq
+
+        row_group_size = max(
+            1, table.num_rows * self.row_group_size_bytes // max(table.nbytes, 1)
+        )
+        offset = 0
+        while offset < table.num_rows:
+            if self._writer is None:
+                self._file_path = (
+                    self.root_path
+                    / f"{PARQUET_PART_PREFIX}{self._file_number:05}.parquet"
+                )
+                self._writer = pq.ParquetWriter(
+                    self._temporary_path(self._file_path),
+                    self.schema,
+                    coerce_timestamps="us",
+                    allow_truncated_timestamps=True,
+                )
+                self._file_number += 1
+            rows = min(
+                table.num_rows - offset, self.max_rows_per_file - self._file_rows
+            )
+            self._writer.write_table(
+                table.slice(offset, rows), row_group_size=row_group_size
+            )
+            offset += rows
+            self._file_rows += rows
+            if self._file_rows >= self.max_rows_per_file:
+                self._close_file()
+
+    def _close_file(self):
+        if self._writer is not None:
+            assert self._file_path is not None
+            self._writer.close()
+            os.replace(self._temporary_path(self._file_path), self._file_path)
+        self._writer = None
+        self._file_path = None
+        self._file_rows = 0
+        tokens, self._file_tokens = self._file_tokens, []
+        if tokens and self.on_commit:
+            self.on_commit(tokens)
+
+    @staticmethod
+    def _temporary_path(file_path: Path) -> Path:
+        """
+        Datasets ignore files starting with "."
+        """
+        return file_path.parent / f".{file_path.name}.tmp"
+
+
+def _unify_schemas(schemas: Sequence["pa.Schema"]) -> "pa.Schema":
+    import pyarrow as pa
+
+    # Columns that are all null in one DataFrame have the null type
+    return pa.unify_schemas(list(schemas), promote_options="permissive")
+
+
+def iterate_to_dataframe_concurrent(
+    arguments: Sequence[T],
+    f: Callable[[T], pd.DataFrame],
+    max_workers: int = 8,
+    ordered: bool = True,
+    retries: int = 2,
+) -> pd.DataFrame:
+    """Apply arguments to a function that returns a DataFrame on a pool of threads and concatenate the results.
+
+    Arguments for which `f` raises are retried after the other arguments are done, arguments that still fail are in `data.attrs["failed_arguments"]`.
+
+    :param arguments: Each item in this sequence will be passed to f
+    :param f: Function that generates a pandas dataframe that will be called on arguments
+    :param max_workers: number of threads calling `f`
+    :param ordered: concatenate frames in the order of `arguments`, as opposed to the order in which they finish
+    :param retries: number of times to retry failed arguments
+
+    Usage::
+
+    >>> from calcbench.downloaders import iterate_to_dataframe_concurrent
+    >>> d = iterate_to_dataframe_concurrent(
+    >>>    cb.tickers(index="SP500"),
+    >>>    lambda ticker: cb.standardized(company_identifiers=[ticker], point_in_time=True),
+    >>>    max_workers=16,
+    >>> )
+    """
+    failed: List[T] = []
+    chunks = [
+        df
+        for _, df in _iterate_concurrently(
+            arguments,
+            f,
+            max_workers=max_workers,
+            ordered=ordered,
+            retries=retries,
+            failed=failed,
+        )
+        if not df.empty
+    ]
+    data = pd.concat(chunks) if chunks else pd.DataFrame()
+    data.attrs["failed_arguments"] = failed
+    return data
+
+
+def iterate_and_save_parquet_concurrent(
+    arguments: Sequence[T],
+    f: Callable[[T], pd.DataFrame],
+    root_path: Union[str, Path],
+    partition_cols: Optional[List[str]] = ["ticker"],
+    write_mode: Literal["w", "a"] = "w",
+    max_workers: int = 8,
+    ordered: bool = False,
+    retries: int = 2,
+    compact: bool = False,
+) -> List[T]:
+    """
+    Apply the arguments to a function on a pool of threads and save to a pyarrow dataset.  Resumable.
+
+    Completed arguments are recorded in a checkpoint file next to `root_path`.  With `write_mode="a"` arguments completed by a previous run are skipped, so an interrupted download is restarted with the same call.
+
+    :param arguments: Each item in this sequence will be passed to f.  Arguments are checkpointed as JSON, or their `str` if they are not JSON serializable.
+    :param f: Function that generates a pandas dataframe that will be called on arguments
+    :param root_path: folder in which to write the pyarrow dataset
+    :param partion_cols: what to name the files in the dataset
+    :param write_mode: "w" to start by deleting the dataset directory and the checkpoint, "a" to resume.
+    :param max_workers: number of threads calling `f`
+    :param ordered: write frames in the order of `arguments`, as opposed to the order in which they finish
+    :param retries: number of times to retry failed arguments
+    :param compact: buffer the data and write large files sorted by `partition_cols` with :class:`ParquetDatasetWriter`, rather than a file for each argument.  Arguments are checkpointed when the files with their data are finished, an interrupted download restarts from the last finished file.
+    :return: the arguments that failed on every try
+
+    Usage::
+
+    >>> failed = iterate_and_save_parquet_concurrent(
+    >>>     arguments=cb.tickers(entire_universe=True),
+    >>>     f=lambda ticker: cb.standardized(company_identifiers=[ticker], point_in_time=True),
+    >>>     root_path="~/standardized_PIT_arrow/",
+    >>>     max_workers=16,
+    >>> )
+    >>> # after an interruption, pick up where it stopped
+    >>> failed = iterate_and_save_parquet_concurrent(..., write_mode="a")
+
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    root_path = _set_up_directory(root_path=root_path, write_mode=write_mode)
+    checkpoint = _Checkpoint(_checkpoint_path(root_path), write_mode=write_mode)
+    remaining = [a for a in arguments if not checkpoint.completed(a)]
+    if len(remaining) < len(arguments):
+        tqdm.write(
+            f"Skipping {len(arguments) - len(remaining)} arguments completed by a previous run"
+        )
+    failed: List[T] = []
+
+    def on_commit(committed: List[Any]):
+        for argument in committed:
+            checkpoint.add(argument[0])
+
+    writer = (
+        ParquetDatasetWriter(
+            root_path, sort_by=partition_cols or [], on_commit=on_commit
+        )
+        if compact
+        else None
+    )
+    with writer or nullcontext():
+        for argument, df in _iterate_concurrently(
+            remaining,
+            f,
+            max_workers=max_workers,
+            ordered=ordered,
+            retries=retries,
+            failed=failed,
+        ):
+            if writer:
+                # wrapped so arguments that are None are committed
+                writer.write(df, token=(argument,))
+                continue
+            if not df.empty:
+                table = pa.Table.from_pandas(df, preserve_index=True)
+                pq.write_to_dataset(
+                    table=table,
+                    root_path=root_path,
+                    partition_cols=partition_cols,
+                    **{"allow_truncated_timestamps": True, "coerce_timestamps": "us"},
+                )
+            checkpoint.add(argument)
+    return failed
+
+
+def _iterate_concurrently(
+    arguments: Sequence[T],
+    f: Callable[[T], pd.DataFrame],
+    max_workers: int,
+    ordered: bool,
+    retries: int,
+    failed: List[T],
+) -> Iterator[Tuple[T, pd.DataFrame]]:
+    """
+    Call f on a pool of threads and yield (argument, frame) in the calling thread.
+
+    Failed arguments are retried after each pass, arguments that fail every try are appended to `failed`.
+
+    At most `max_workers * 2` arguments are submitted at a time so finished frames that have not been consumed do not pile up.
+    """
+    _check_pool_size(max_workers)
+    window = max_workers * 2
+    queue = list(arguments)
+    with tqdm(total=len(queue)) as progress_bar:
+        for attempt in range(retries + 1):
+            retry_queue: List[T] = []
+            to_submit = iter(queue)
+            pending: Deque[Tuple[Future, T]] = deque()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+                def submit():
+                    for argument in islice(to_submit, window - len(pending)):
+                        pending.append((executor.submit(f, argument), argument))
+
+                try:
+                    submit()
+                    while pending:
+                        if ordered:
+                            future, argument = pending.popleft()
+                        else:
+                            wait(
+                                [future for future, _ in pending],
+                                return_when=FIRST_COMPLETED,
+                            )
+                            index = next(
+                                i
+                                for i, (future, _) in enumerate(pending)
+                                if future.done()
+                            )
+                            future, argument = pending[index]
+                            del pending[index]
+                        try:
+                            df = future.result()
+                        except Exception as e:
+                            tqdm.write(
+                                f"Exception getting {argument} {e}, try {attempt + 1}"
+                            )
+                            retry_queue.append(argument)
+                            submit()
+                        else:
+                            submit()
+                            progress_bar.update()
+                            yield argument, df
+                except BaseException:
+                    for future, _ in pending:
+                        future.cancel()
+                    raise
+            if not retry_queue:
+                return
+            queue = retry_queue
+    failed.extend(queue)
+    tqdm.write(f"Failed getting {len(queue)} arguments")
+
+
+def _checkpoint_path(root_path: Union[str, Path]) -> str:
+    return str(root_path).rstrip("/\\") + ".checkpoint"
+
+
+class _Checkpoint:
+    """
+    Arguments that have been saved, one JSON line per argument.
+    """
+
+    def __init__(self, path: str, write_mode: Literal["w", "a"]):
+        self.path = path
+        self._completed: Set[str] = set()
+        if os.path.exists(path):
+            if write_mode == "w":
+                os.remove(path)
+            else:
+                with open(path) as f:
+                    self._completed = {line.rstrip("\n") for line in f if line.strip()}
+
+    def completed(self, argument: object) -> bool:
+        return self._key(argument) in self._completed
+
+    def add(self, argument: object):
+        key = self._key(argument)
+        self._completed.add(key)
+        with open(self.path, "a") as f:
+            f.write(key + "\n")
+
+    def _key(self, argument: object) -> str:
+        return json.dumps(argument, default=str, sort_keys=True)
+
+
 def _set_up_directory(root_path: Union[str, Path], write_mode: Literal["w", "a"]):
     root_path = os.path.expanduser(root_path)
     if write_mode == "w" and os.path.exists(root_path):
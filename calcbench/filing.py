@@ -49,31 +49,52 @@ def filings(
 
     """
 
-    filings = _json_POST(
-        "filingsV2",
-        {
-            "companiesParameters": {
-                "companyIdentifiers": list(company_identifiers),
-                "entireUniverse": entire_universe,
-            },
-            "pageParameters": {
-                "includeNonXBRL": include_non_xbrl,
-                "includePressReleasesAndProxies": include_press_releases_and_proxies,
-                "filingTypes": filing_types,
-            },
-            "periodParameters": {
-                "updateDate": received_date and received_date.isoformat(),
-                "dateRange": start_date
-                and end_date
-                and {
-                    "startDate": start_date.isoformat(),
-                    "endDate": end_date.isoformat(),
-                },
-                "asOriginallyReported": False,
+    payload = _filings_payload(
+        company_identifiers=company_identifiers,
+        entire_universe=entire_universe,
+        include_non_xbrl=include_non_xbrl,
+        received_date=received_date,
+        start_date=start_date,
+        end_date=end_date,
+        include_press_releases_and_proxies=include_press_releases_and_proxies,
+        filing_types=filing_types,
+    )
+    return _json_POST(
+        "filingsV2", payload, parse=lambda filings: [Filing(**f) for f in filings]
+    )
+
+
+def _filings_payload(
+    company_identifiers: CompanyIdentifiers,
+    entire_universe: bool,
+    include_non_xbrl: bool,
+    received_date: Optional[date],
+    start_date: Optional[date],
+    end_date: Optional[date],
+    include_press_releases_and_proxies: bool,
+    filing_types: Sequence[FilingType],
+) -> dict:
+    return {
+        "companiesParameters": {
+            "companyIdentifiers": list(company_identifiers),
+            "entireUniverse": entire_universe,
+        },
+        "pageParameters": {
+            "includeNonXBRL": include_non_xbrl,
+            "includePressReleasesAndProxies": include_press_releases_and_proxies,
+            "filingTypes": filing_types,
+        },
+        "periodParameters": {
+            "updateDate": received_date and received_date.isoformat(),
+            "dateRange": start_date
+            and end_date
+            and {
+                "startDate": start_date.isoformat(),
+                "endDate": end_date.isoformat(),
             },
+            "asOriginallyReported": False,
         },
-    )
-    return [Filing(**f) for f in filings]
+    }
 
 
 def filings_dataframe(
@@ -0,0 +1,267 @@
+"""
+Measure requests to the Calcbench API.
+
+Listeners are called with a :class:`RequestEvent` after each request attempt, use them to export metrics or use :class:`RequestMetrics` to collect histograms in memory.
+"""
+
+import bisect
+import dataclasses
+import logging
+import math
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class RequestEvent:
+    """
+    A request attempt.  Times are in seconds.
+    """
+
+    end_point: str
+    method: str = "POST"
+    status: Optional[int] = None
+    attempt: int = 1
+    """1 for the first try, greater if the request was retried"""
+    bytes_sent: int = 0
+    """Size of the request body in bytes, before compression"""
+    bytes_received: int = 0
+    """Size of the response body after decompression"""
+    wire_bytes_sent: Optional[int] = None
+    """Size of the request body as sent, smaller than `bytes_sent` if it was compressed"""
+    wire_bytes_received: Optional[int] = None
+    """Size of the response body as transferred, None if unknown"""
+    network_time: float = 0.0
+    """Sending the request and receiving the response"""
+    decode_time: float = 0.0
+    """Parsing JSON"""
+    validation_time: float = 0.0
+    """Building models from the JSON"""
+    from_cache: bool = False
+    """The response came from the response cache, see :func:`calcbench.enable_response_cache`"""
+    error: Optional[str] = None
+
+    @property
+    def total_time(self) -> float:
+        return self.network_time + self.decode_time + self.validation_time
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        """
+        Decompressed size of the response / transferred size
+        """
+        if not self.wire_bytes_received:
+            return None
+        return self.bytes_received / self.wire_bytes_received
+
+
+RequestListener = Callable[[RequestEvent], None]
+
+_LISTENERS: List[RequestListener] = []
+_LISTENERS_LOCK = threading.Lock()
+
+
+def add_request_listener(listener: RequestListener) -> RequestListener:
+    """Call `listener` with a :class:`RequestEvent` after each request attempt.
+
+    Listeners are called on the thread that made the request, they should be quick.
+
+    Usage::
+        >>> calcbench.add_request_listener(lambda event: statsd.timing(f"calcbench.{event.end_point}", event.total_time))
+
+    """
+    global _LISTENERS
+    with _LISTENERS_LOCK:
+        # copy so requests in flight can iterate without holding the lock
+        _LISTENERS = _LISTENERS + [listener]
+    return listener
+
+
+def remove_request_listener(listener: RequestListener):
+    global _LISTENERS
+    with _LISTENERS_LOCK:
+        _LISTENERS = [l for l in _LISTENERS if l is not listener]
+
+
+def _emit(event: RequestEvent):
+    for listener in _LISTENERS:
+        try:
+            listener(event)
+        except Exception:
+            logger.exception(f"Exception in request listener {listener}")
+
+
+TIMINGS = ("network_time", "decode_time", "validation_time", "total_time")
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+"""
+Upper bounds, in seconds, of the histogram buckets
+"""
+
+
+class RequestMetrics:
+    """
+    Histograms of request times and totals of bytes, errors and retries by end-point.
+
+    Bytes are counted before and after compression, responses from the cache are counted as transferred uncompressed.
+
+    Usage::
+
+      >>> with calcbench.RequestMetrics() as metrics:
+      >>>     data = calcbench.standardized(company_identifiers=tickers, max_workers=8, companies_per_shard=50)
+      >>> metrics.summary()
+
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = sorted(buckets)
+        self._lock = threading.Lock()
+        self._end_points: Dict[str, "_EndPointMetrics"] = {}
+
+    def __call__(self, event: RequestEvent):
+        with self._lock:
+            metrics = self._end_points.get(event.end_point)
+            if metrics is None:
+                metrics = self._end_points[event.end_point] = _EndPointMetrics(
+                    len(self.buckets) + 1
+                )
+            metrics.requests += 1
+            metrics.errors += event.error is not None
+            metrics.retries += event.attempt > 1
+            metrics.cache_hits += event.from_cache
+            metrics.bytes_sent += event.bytes_sent
+            metrics.bytes_received += event.bytes_received
+            metrics.wire_bytes_sent += (
+                event.bytes_sent
+                if event.wire_bytes_sent is None
+                else event.wire_bytes_sent
+            )
+            metrics.wire_bytes_received += (
+                event.bytes_received
+                if event.wire_bytes_received is None
+                else event.wire_bytes_received
+            )
+            for timing in TIMINGS:
+                seconds = getattr(event, timing)
+                metrics.sums[timing] += seconds
+                metrics.histograms[timing][
+                    bisect.bisect_left(self.buckets, seconds)
+                ] += 1
+
+    def start(self) -> "RequestMetrics":
+        """
+        Start collecting
+        """
+        add_request_listener(self)
+        return self
+
+    def stop(self):
+        remove_request_listener(self)
+
+    def __enter__(self) -> "RequestMetrics":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset(self):
+        with self._lock:
+            self._end_points = {}
+
+    def histogram(self, end_point: str, timing: str = "total_time") -> Dict[float, int]:
+        """
+        Count of requests by bucket upper bound, the last bucket is `math.inf`
+        """
+        with self._lock:
+            metrics = self._end_points.get(end_point)
+            counts = (
+                list(metrics.histograms[timing])
+                if metrics
+                else [0] * (len(self.buckets) + 1)
+            )
+        return dict(zip(list(self.buckets) + [math.inf], counts))
+
+    def summary(self) -> "pd.DataFrame":
+        """
+        A row for each end-point with counts, bytes and the mean and approximate 50th, 90th and 99th percentiles of each timing.
+
+        Percentiles are the upper bound of the bucket they fall in.
+        """
+        import pandas as pd
+
+        rows = []
+        with self._lock:
+            for end_point, metrics in sorted(self._end_points.items()):
+                row = {
+                    "end_point": end_point,
+                    "requests": metrics.requests,
+                    "errors": metrics.errors,
+                    "retries": metrics.retries,
+                    "cache_hits": metrics.cache_hits,
+                    "bytes_sent": metrics.bytes_sent,
+                    "bytes_received": metrics.bytes_received,
+                    "wire_bytes_sent": metrics.wire_bytes_sent,
+                    "wire_bytes_received": metrics.wire_bytes_received,
+                    "request_compression_ratio": _ratio(
+                        metrics.bytes_sent, metrics.wire_bytes_sent
+                    ),
+                    "response_compression_ratio": _ratio(
+                        metrics.bytes_received, metrics.wire_bytes_received
+                    ),
+                }
+                for timing in TIMINGS:
+                    row[f"{timing}_mean"] = metrics.sums[timing] / metrics.requests
+                    for percentile in (50, 90, 99):
+                        row[f"{timing}_p{percentile}"] = self._percentile(
+                            metrics.histograms[timing], percentile
+                        )
+                rows.append(row)
+        return pd.DataFrame(rows).set_index("end_point") if rows else pd.DataFrame()
+
+    def _percentile(self, counts: List[int], percentile: float) -> float:
+        threshold = sum(counts) * percentile / 100
+        seen = 0
+        for upper_bound, count in zip(list(self.buckets) + [math.inf], counts):
+            seen += count
+            if seen >= threshold:
+                return upper_bound
+        return math.inf
+
+
+def _ratio(numerator: int, denominator: int) -> float:
+    return numerator / denominator if denominator else math.nan
+
+
+class _EndPointMetrics:
+    def __init__(self, bucket_count: int):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.wire_bytes_sent = 0
+        self.wire_bytes_received = 0
+        self.sums = {timing: 0.0 for timing in TIMINGS}
+        self.histograms = {timing: [0] * bucket_count for timing in TIMINGS}
@@ -1,3 +1,4 @@
+import mmap
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional, Union
 from typing_extensions import Annotated
@@ -18,7 +19,8 @@ else:
 
 from pydantic import BaseModel, BeforeValidator, WrapValidator
 
-from calcbench.api_client import _json_POST
+from calcbench.api_client import _SESSION_STUFF, _json_POST
+from calcbench.disclosure_store import DisclosureKey, DisclosureStore
 from calcbench.models.disclosure import (
     FootnoteTypeTitle,
     _build_period,
@@ -135,9 +137,24 @@ class DisclosureSearchResults(BaseModel, extra="allow"):
         """
         return self.get_disclosure(standardize=standardize).contents
 
-    def get_contents_text(self) -> str:
-        """Contents of the HTML of the document"""
-        return "".join(BeautifulSoup(self.get_contents(), "html.parser").strings)
+    def get_contents_text(self, parser: str = "html.parser") -> str:
+        """
+        Contents of the HTML of the document
+
+        The text is kept in the disclosure store if it is enabled, see :func:`calcbench.enable_disclosure_store`.  Use :func:`calcbench.disclosure_texts` to extract text from many documents.
+
+        :param parser: BeautifulSoup parser, "lxml" is faster if it is installed.
+        """
+        store = _SESSION_STUFF["disclosure_store"]
+        key = self._content_key(standardize=False)
+        if store and key:
+            text = store.get_text(key, parser)
+            if text is not None:
+                return text
+        text = _html_to_text(self.get_contents(), parser)
+        if store and key:
+            store.put_text(key, parser, text)
+        return text
 
     def get_disclosure(self, standardize: bool = False) -> DisclosureContent:
         """
@@ -147,15 +164,70 @@ class DisclosureSearchResults(BaseModel, extra="allow"):
         """
         if self.content:
             return self.content
-        else:
+        key = self._content_key(standardize)
+        cache = _SESSION_STUFF["disclosure_contents_cache"]
+        store = _SESSION_STUFF["disclosure_store"]
+        content = None
+        if cache is not None and key:
+            content = cache.get(key)
+            if content is not None:
+                return content
+        if store and key:
+            content = store.get(key)
+        if content is None:
             payload = DisclosureContentsParams(disclosure=self, standardize=standardize)
             json = _json_POST("disclosureContents", payload)
-            return DisclosureContent(**json)
+            content = DisclosureContent(**json)
+            if store and key:
+                store.put(key, content)
+        if cache is not None and key:
+            cache.put(key, content)
+        return content
+
+    def open_contents(self, standardize: bool = False) -> Union[mmap.mmap, bytes]:
+        """
+        Memory-mapped HTML of the document, encoded as UTF-8, b"" if the document is empty.  Requires :func:`calcbench.enable_disclosure_store`.
+
+        Use this for large documents, the contents are read from disk as they are accessed rather than loaded into memory.
+
+        :param standardize: Translate the contents into standardized/idiomatic HTML
+        """
+        store = _SESSION_STUFF["disclosure_store"]
+        key = self._content_key(standardize)
+        if not store:
+            raise ValueError("Call calcbench.enable_disclosure_store() first")
+        if not key:
+            raise ValueError(
+                f"Cannot store {self}, it does not have a fact_id and accession_id"
+            )
+        if key not in store:
+            store.put(key, self.get_disclosure(standardize=standardize))
+        return store.open_contents(key)  # type: ignore
+
+    def _content_key(self, standardize: bool) -> Optional[DisclosureKey]:
+        """
+        Key for the disclosure contents cache and the disclosure store, None if the disclosure cannot be identified.
+        """
+        if self.fact_id is None or self.accession_id is None:
+            return None
+        return DisclosureStore.key(
+            accession_id=self.accession_id,
+            fact_id=self.fact_id,
+            network_id=self.network_id,
+            standardize=standardize,
+        )
 
     def __str__(self):
         return f'DisclosureSearchResults(ticker="{self.ticker}", name="{self.name}", fiscal_year={self.fiscal_year}, fiscal_period={self.fiscal_period})'
 
 
+def _html_to_text(html: str, parser: str) -> str:
+    """
+    The strings in the HTML.  A module level function so it can be run in a process pool.
+    """
+    return "".join(BeautifulSoup(html, parser).strings)
+
+
 class DisclosureContentsParams(BaseModel):
     """
     Get contents for a disclosure
@@ -1,7 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Generator, Sequence
+from typing import Generator, Iterable, List, Optional, Sequence, Tuple
 from decimal import Decimal
 
 from calcbench.models.period import Period
@@ -12,7 +13,7 @@ except ImportError:
     "Can't find pandas, won't be able to use the functions that return DataFrames."
     pass
 
-from calcbench.api_client import _json_POST, set_field_values
+from calcbench.api_client import _check_pool_size, _json_POST, set_field_values
 from calcbench.api_query_params import (
     APIQueryParams,
     CompanyIdentifiers,
@@ -85,7 +86,10 @@ def press_release_raw(
     )
     payload = APIQueryParams(
         **{
-            "companiesParameters": {"companyIdentifiers": company_identifiers},
+            "companiesParameters": {
+                "companyIdentifiers": company_identifiers,
+                "entireUniverse": False,
+            },
             "periodParameters": periodParameters,
             "pageParameters": {
                 "standardizeBOPPeriods": True,
@@ -114,22 +118,95 @@ def press_release_data(
         period=period,
     )
 
-    df = pd.DataFrame(
-        [
-            {
-                **fact,
-                **{
-                    "ticker": filing.ticker,
-                    "CIK": filing.cik,
-                    "date_reported": filing.date_reported,
-                },
-            }
-            for filing in filings
-            for fact in filing.facts
-        ]
-    )
+    df = _press_release_data_frame(filings)
     if df.empty:
         return df
     for c in CATEGORICAL_COLUMNS:
         df[c] = pd.Categorical(df[c])
     return df
+
+
+def press_release_data_periods(
+    company_identifiers: CompanyIdentifiers,
+    start_year: int,
+    end_year: int,
+    periods: Sequence[Period] = [Period.Q1, Period.Q2, Period.Q3, Period.Q4],
+    companies_per_request: Optional[int] = None,
+    max_workers: int = 8,
+) -> "pd.DataFrame":
+    """Press release data for many periods
+
+    Makes a request for each year/period, and each chunk of companies, on a pool of threads.
+
+    :param company_identifiers: list of tickers or CIK codes
+    :param start_year: first year for which to get data
+    :param end_year: last year (inclusive) for which to get data
+    :param periods: periods in each year
+    :param companies_per_request: split the companies into requests for this many companies
+    :param max_workers: number of concurrent requests
+    :return: A DataFrame of facts in the order of the years, periods and companies, an empty frame if there are none.
+
+    Usage::
+
+      >>> data = calcbench.press_release.press_release_data_periods(
+      >>>     company_identifiers=["msft", "goog"], start_year=2014, end_year=2023
+      >>> )
+
+    """
+    if companies_per_request:
+        company_chunks = [
+            company_identifiers[i : i + companies_per_request]
+            for i in range(0, len(company_identifiers), companies_per_request)
+        ]
+    else:
+        company_chunks = [company_identifiers]
+    requests: List[Tuple[CompanyIdentifiers, int, Period]] = [
+        (company_chunk, year, period)
+        for year in range(start_year, end_year + 1)
+        for period in periods
+        for company_chunk in company_chunks
+    ]
+
+    def get_frame(request: Tuple[CompanyIdentifiers, int, Period]) -> "pd.DataFrame":
+        company_chunk, year, period = request
+        return _press_release_data_frame(
+            press_release_raw(
+                company_identifiers=company_chunk, year=year, period=period
+            )
+        )
+
+    _check_pool_size(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = [
+            frame for frame in executor.map(get_frame, requests) if not frame.empty
+        ]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    for c in CATEGORICAL_COLUMNS:
+        df[c] = pd.Categorical(df[c])
+    return df
+
+
+def _press_release_data_frame(
+    filings: Iterable[PressReleaseData],
+) -> "pd.DataFrame":
+    """
+    A row for each fact with the ticker, CIK and date reported of its filing
+    """
+    facts: List[dict] = []
+    tickers: List[str] = []
+    CIKs: List[str] = []
+    dates_reported: List[datetime] = []
+    for filing in filings:
+        facts.extend(filing.facts)
+        tickers.extend([filing.ticker] * len(filing.facts))
+        CIKs.extend([filing.cik] * len(filing.facts))
+        dates_reported.extend([filing.date_reported] * len(filing.facts))
+    df = pd.DataFrame(facts)
+    if df.empty:
+        return df
+    df["ticker"] = tickers
+    df["CIK"] = CIKs
+    df["date_reported"] = dates_reported
+    return df
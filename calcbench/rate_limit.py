@@ -0,0 +1,207 @@
+"""
+Limit the rate of requests to Calcbench.
+
+A token bucket limits requests per second, a semaphore limits requests in flight.  With a `shared_dir` the limits are kept in lock files so that all of the processes on a host using the same directory share them.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Callable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f: IO, blocking: bool = True) -> bool:
+        f.seek(0)
+        try:
+            mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK  # type: ignore
+            msvcrt.locking(f.fileno(), mode, 1)  # type: ignore
+        except OSError:
+            if blocking:
+                raise
+            return False
+        return True
+
+    def _unlock(f: IO):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)  # type: ignore
+
+else:
+    import fcntl
+
+    def _lock(f: IO, blocking: bool = True) -> bool:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+
+    def _unlock(f: IO):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """
+    Token bucket and in-flight limit.
+
+    Usage::
+
+      >>> limiter = RateLimiter(requests_per_second=5, max_in_flight=8)
+      >>> release = limiter.acquire()
+      >>> try:
+      >>>     make_request()
+      >>> finally:
+      >>>     release()
+
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        burst: Optional[int] = None,
+        shared_dir: Optional[Union[str, Path]] = None,
+    ):
+        """
+        :param requests_per_second: sustained request rate, None for no limit
+        :param max_in_flight: requests being made at the same time, None for no limit
+        :param burst: requests that can be made at once after being idle, defaults to one second of requests
+        :param shared_dir: folder in which to keep the limits, processes using the same folder share the limits
+        """
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.requests_per_second = requests_per_second
+        self.max_in_flight = max_in_flight
+        self.burst = burst or max(1, int(requests_per_second or 1))
+        self.shared_dir = Path(os.path.expanduser(shared_dir)) if shared_dir else None
+        if self.shared_dir:
+            self.shared_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._semaphore = (
+            threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+        )
+
+    def acquire(self) -> Callable[[], None]:
+        """
+        Wait until a request can be made.
+
+        :return: call this when the request is finished
+        """
+        release = self._acquire_slot()
+        try:
+            wait = self._reserve_token()
+            if wait > 0:
+                logger.debug(f"rate limited, waiting {wait:.3f} seconds")
+                time.sleep(wait)
+        except BaseException:
+            release()
+            raise
+        return release
+
+    def _reserve_token(self) -> float:
+        """
+        Take a token, the bucket can go negative so waiting threads queue.
+
+        :return: seconds to wait before making the request
+        """
+        if self.requests_per_second is None:
+            return 0.0
+        if self.shared_dir:
+            return self._reserve_shared_token()
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = self._refilled(self._tokens, now - self._updated) - 1
+            self._updated = now
+            return max(0.0, -self._tokens / self.requests_per_second)
+
+    def _reserve_shared_token(self) -> float:
+        assert self.shared_dir and self.requests_per_second
+        path = self.shared_dir / "token_bucket.json"
+        with self._lock, open(self.shared_dir / "token_bucket.lock", "a+") as lock:
+            _lock(lock)
+            try:
+                now = time.time()  # shared by processes, unlike monotonic
+                try:
+                    state = json.loads(path.read_text())
+                    tokens = self._refilled(state["tokens"], now - state["updated"])
+                except (FileNotFoundError, ValueError, KeyError):
+                    tokens = float(self.burst)
+                tokens -= 1
+                temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+                temporary_path.write_text(
+                    json.dumps({"tokens": tokens, "updated": now})
+                )
+                os.replace(temporary_path, path)
+            finally:
+                _unlock(lock)
+        return max(0.0, -tokens / self.requests_per_second)
+
+    def _refilled(self, tokens: float, elapsed: float) -> float:
+        assert self.requests_per_second
+        return min(
+            float(self.burst), tokens + max(elapsed, 0) * self.requests_per_second
+        )
+
+    def _acquire_slot(self) -> Callable[[], None]:
+        if self._semaphore is None:
+            return _no_op
+        self._semaphore.acquire()
+        if not self.shared_dir:
+            return _once(self._semaphore.release)
+        try:
+            slot = self._acquire_shared_slot()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        def release():
+            try:
+                _unlock(slot)
+                slot.close()
+            finally:
+                self._semaphore.release()  # type: ignore
+
+        return _once(release)
+
+    def _acquire_shared_slot(self) -> IO:
+        """
+        Lock one of `max_in_flight` files
+        """
+        assert self.shared_dir and self.max_in_flight
+        delay = 0.005
+        while True:
+            for i in range(self.max_in_flight):
+                f = open(self.shared_dir / f"in_flight_{i}.lock", "a+")
+                if _lock(f, blocking=False):
+                    return f
+                f.close()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+
+def _no_op():
+    pass
+
+
+def _once(f: Callable[[], None]) -> Callable[[], None]:
+    called: List[bool] = []
+    lock = threading.Lock()
+
+    def wrapper():
+        with lock:
+            if called:
+                return
+            called.append(True)
+        f()
+
+    return wrapper
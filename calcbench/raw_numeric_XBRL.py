@@ -1,9 +1,24 @@
 from enum import IntEnum
-from typing import Mapping, Sequence, TYPE_CHECKING
+from functools import lru_cache
+import sys
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TYPE_CHECKING,
+)
 from calcbench.api_client import (
     _json_POST,
+    _json_POST_stream,
 )
 from calcbench.api_query_params import CompanyIdentifiers
+from calcbench.standardized_numeric import _batched
 
 if TYPE_CHECKING:
     # https://github.com/microsoft/pyright/issues/1358
@@ -20,11 +35,17 @@ except ImportError:
     from typing_extensions import Literal
 
 try:
+    import numpy as np
     import pandas as pd
 except ImportError:
     "Can't find pandas, won't be able to use the functions that return DataFrames."
     pass
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pass
+
 RAW_XBRL_END_POINT = "rawXBRLData"
 RAW_NON_XBRL_END_POINT = "rawNonXBRLData"
 END_POINTS = Literal[RAW_XBRL_END_POINT, RAW_NON_XBRL_END_POINT]
@@ -46,12 +67,24 @@ def raw_XBRL(
     company_identifiers: CompanyIdentifiers = [],
     entire_universe: bool = False,
     clauses: Sequence[RawDataClause] = [],
+    batch_size: Optional[int] = None,
+    company_chunk_size: Optional[int] = None,
+    period_slices: Sequence[Sequence[RawDataClause]] = [],
+    dimensions: Literal["dict", "columns"] = "dict",
+    engine: Literal["dict", "columnar"] = "dict",
+    dtype_backend: Literal["numpy", "pyarrow"] = "numpy",
 ) -> "pd.DataFrame":
     """As-reported data.
 
     :param company_identifiers: list of tickers or CIK codes
     :param entire_universe: Search all companies
     :param clauses: See the parameters that can be passed @ https://www.calcbench.com/api/rawdataxbrlpoints
+    :param batch_size: Decode the response as it is downloaded and build the DataFrame in batches of this many facts, useful for large requests.
+    :param company_chunk_size: see :func:`raw_xbrl_raw_batches`
+    :param period_slices: see :func:`raw_xbrl_raw_batches`
+    :param dimensions: "dict" for a `dimensions` column of {axis: member} dictionaries, "columns" for a categorical column of members for each axis, so facts can be filtered like `df[df["StatementBusinessSegmentsAxis"] == "AmericasMember"]`.
+    :param engine: "columnar" builds each column with a type, categoricals for the tag, unit of measure, ticker and period, datetime64 for dates and float64 for the value which is named "value".  Uses much less memory for large requests.
+    :param dtype_backend: "pyarrow" to back the columns built by the "columnar" engine with Arrow arrays, requires pyarrow.
 
     :return: an empty dataframe if no records are found.
 
@@ -64,13 +97,41 @@ def raw_XBRL(
         >>> cb.raw_XBRL(company_identifiers=['mmm'], clauses=clauses)
     """
 
-    d = _raw_data_raw(
-        company_identifiers=company_identifiers,
-        entire_universe=entire_universe,
-        clauses=clauses,
-        end_point=RAW_XBRL_END_POINT,
-    )
-    df = pd.DataFrame(d)
+    if engine == "columnar":
+        builder = lambda facts: _raw_XBRL_data_frame_columnar(facts, dtype_backend)
+    else:
+        builder = _raw_XBRL_data_frame
+    if batch_size or company_chunk_size or period_slices:
+        frames = [
+            builder(facts)
+            for facts in raw_xbrl_raw_batches(
+                company_identifiers=company_identifiers,
+                entire_universe=entire_universe,
+                clauses=clauses,
+                batch_size=batch_size or 10_000,
+                company_chunk_size=company_chunk_size,
+                period_slices=period_slices,
+            )
+        ]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if engine == "columnar" and dtype_backend == "numpy":
+            # Batches have different categories so the columns are not categorical after concatenating
+            df = _apply_raw_XBRL_schema(df, columns=_CATEGORY_COLUMNS)
+    else:
+        d = _raw_data_raw(
+            company_identifiers=company_identifiers,
+            entire_universe=entire_universe,
+            clauses=clauses,
+            end_point=RAW_XBRL_END_POINT,
+        )
+        df = builder(d)
+    if dimensions == "columns" and not df.empty:
+        df = _explode_dimensions(df)
+    return df
+
+
+def _raw_XBRL_data_frame(facts: Sequence[Mapping[str, object]]) -> "pd.DataFrame":
+    df = pd.DataFrame(facts)
     if df.empty:
         return df
     for date_column in [
@@ -81,7 +142,119 @@ def raw_XBRL(
         "period_instant",
     ]:
         df[date_column] = pd.to_datetime(df[date_column])  # type: ignore
-    df.rename({"Value": "value"}, inplace=True)  # type: ignore
+    return df
+
+
+_CATEGORY_COLUMNS = [
+    "ticker",
+    "CIK",
+    "entity_name",
+    "XBRL_tag",
+    "unit_of_measure",
+    "fiscal_period",
+    "form_type",
+    "dimension_string",
+]
+
+_RAW_XBRL_SCHEMA: Dict[str, Literal["category", "datetime", "float", "int"]] = {
+    **{column: "category" for column in _CATEGORY_COLUMNS},
+    "filing_date": "datetime",
+    "filing_end_date": "datetime",
+    "period_end": "datetime",
+    "period_start": "datetime",
+    "period_instant": "datetime",
+    "value": "float",
+    "fact_id": "int",
+    "fiscal_year": "int",
+    "accession_id": "int",
+}
+"""
+Types of the columns built by the columnar engine, other columns are left as they are
+"""
+
+
+def _raw_XBRL_data_frame_columnar(
+    facts: Sequence[Mapping[str, Any]],
+    dtype_backend: Literal["numpy", "pyarrow"] = "numpy",
+) -> "pd.DataFrame":
+    """
+    Build each column with its type from the JSON returned by the server, rather than making object columns and converting them.
+    """
+    if not facts:
+        return pd.DataFrame()
+    keys: Dict[str, None] = dict.fromkeys(facts[0])
+    for fact in facts:
+        if len(fact) != len(keys) or fact.keys() != keys.keys():
+            keys.update(dict.fromkeys(fact))
+    columns = {}
+    for key in keys:
+        column = "value" if key == "Value" else key
+        columns[column] = _raw_XBRL_column(
+            [fact.get(key) for fact in facts],
+            _RAW_XBRL_SCHEMA.get(column),
+            dtype_backend,
+        )
+    return pd.DataFrame(columns)
+
+
+def _apply_raw_XBRL_schema(
+    df: "pd.DataFrame", columns: Sequence[str]
+) -> "pd.DataFrame":
+    for column in columns:
+        if column in df.columns:
+            df[column] = _raw_XBRL_column(
+                df[column], _RAW_XBRL_SCHEMA[column], dtype_backend="numpy"
+            )
+    return df
+
+
+def _raw_XBRL_column(
+    values: Sequence[Any],
+    column_type: Optional[Literal["category", "datetime", "float", "int"]],
+    dtype_backend: Literal["numpy", "pyarrow"],
+) -> Any:
+    if dtype_backend == "pyarrow":
+        arrow_types = {
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "datetime": pa.timestamp("ns"),
+            "float": pa.float64(),
+            "int": pa.int64(),
+        }
+        if column_type == "datetime":
+            values = pd.to_datetime(values, format="ISO8601")
+        if column_type:
+            return pd.array(values, dtype=pd.ArrowDtype(arrow_types[column_type]))
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return values
+        if pa.types.is_struct(array.type):
+            # Leave the dimensions as dictionaries
+            return values
+        return pd.array(array, dtype=pd.ArrowDtype(array.type))
+    if column_type == "category":
+        return pd.Categorical(values)
+    if column_type == "datetime":
+        return pd.to_datetime(values, format="ISO8601")
+    if column_type == "float":
+        return np.array(values, dtype="float64")
+    if column_type == "int":
+        return pd.array(values, dtype="Int64")
+    return values
+
+
+def _explode_dimensions(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Replace the dimensions column with a categorical column for each axis.  Each distinct dimension string is parsed once.
+    """
+    codes, dimension_strings = pd.factorize(df["dimension_string"])
+    parsed = [dict(_parse_dimensions(s)) for s in dimension_strings]
+    axes = sorted(set().union(*parsed))
+    df = df.drop(columns="dimensions")
+    for axis in axes:
+        # Facts without a dimension string have code -1, the None at the end
+        members = np.array([p.get(axis) for p in parsed] + [None], dtype=object)
+        df[axis] = pd.Categorical(members[codes])
     return df
 
 
@@ -91,31 +264,116 @@ def _raw_data_raw(
     clauses: Sequence[RawDataClause] = [],
     end_point: END_POINTS = RAW_XBRL_END_POINT,
 ) -> Sequence[Mapping[str, object]]:
+    payload = _raw_data_payload(
+        company_identifiers=company_identifiers,
+        entire_universe=entire_universe,
+        clauses=clauses,
+        end_point=end_point,
+    )
+    return _json_POST(
+        end_point,
+        payload,
+        parse=lambda results: _parse_raw_results(results, end_point=end_point),
+    )
+
+
+def _iterate_raw_data(
+    company_identifiers: CompanyIdentifiers = [],
+    entire_universe: bool = False,
+    clauses: Sequence[RawDataClause] = [],
+    end_point: END_POINTS = RAW_XBRL_END_POINT,
+    company_chunk_size: Optional[int] = None,
+    period_slices: Sequence[Sequence[RawDataClause]] = [],
+) -> Iterator[Mapping[str, object]]:
+    """
+    Split the request into a request for each chunk of companies and each period slice, decode the facts as each response is downloaded.
+    """
+    if entire_universe and company_chunk_size:
+        raise ValueError(
+            "company_chunk_size can not be used with entire_universe, split the request with period_slices"
+        )
+    if company_identifiers and company_chunk_size:
+        company_chunks: List[CompanyIdentifiers] = [
+            company_identifiers[i : i + company_chunk_size]
+            for i in range(0, len(company_identifiers), company_chunk_size)
+        ]
+    else:
+        company_chunks = [company_identifiers]
+    payloads = [
+        _raw_data_payload(
+            company_identifiers=company_chunk,
+            entire_universe=entire_universe,
+            clauses=[*clauses, *period_slice],
+            end_point=end_point,
+        )
+        for company_chunk in company_chunks
+        for period_slice in (period_slices or [[]])
+    ]
+    for payload in payloads:
+        yield from _json_POST_stream(
+            end_point,
+            payload,
+            parse=lambda result: _parse_raw_result(result, end_point=end_point),
+        )
+
+
+def _raw_data_payload(
+    company_identifiers: CompanyIdentifiers,
+    entire_universe: bool,
+    clauses: Sequence[RawDataClause],
+    end_point: END_POINTS,
+) -> dict:
     if end_point not in (RAW_XBRL_END_POINT, RAW_NON_XBRL_END_POINT):
         raise ValueError(
             f"end_point must be either {RAW_XBRL_END_POINT} or {RAW_NON_XBRL_END_POINT}"
         )
-    payload = {
+    return {
         "companiesParameters": {
             "companyIdentifiers": company_identifiers,
             "entireUniverse": entire_universe,
         },
         "pageParameters": {"clauses": clauses},
     }
-    results = _json_POST(end_point, payload)
-    if end_point == RAW_XBRL_END_POINT:
-        for result in results:
-            if result["dimension_string"]:
-                result["dimensions"] = {
-                    d.split(":")[0]: d.split(":")[1]
-                    for d in result["dimension_string"].split(",")
-                }
-            else:
-                result["dimensions"] = []
 
+
+def _parse_raw_results(
+    results: Sequence[Dict[str, Any]], end_point: END_POINTS
+) -> Sequence[Mapping[str, object]]:
+    """
+    Add a dimensions dictionary to XBRL facts
+    """
+    for result in results:
+        _parse_raw_result(result, end_point=end_point)
     return results
 
 
+def _parse_raw_result(result: Dict[str, Any], end_point: END_POINTS) -> Dict[str, Any]:
+    if end_point == RAW_XBRL_END_POINT:
+        result["dimensions"] = _parse_dimension_string(result["dimension_string"])
+    return result
+
+
+def _parse_dimension_string(dimension_string: Optional[str]) -> Dict[str, str]:
+    """
+    "Axis:Member,Axis:Member" -> {"Axis": "Member", "Axis": "Member"}
+    """
+    return dict(_parse_dimensions(dimension_string))
+
+
+@lru_cache(maxsize=2**16)
+def _parse_dimensions(dimension_string: Optional[str]) -> Tuple[Tuple[str, str], ...]:
+    """
+    The same dimension strings appear on many facts so they are parsed once.  The (axis, member) pairs are immutable so they can be shared.
+    """
+    if not dimension_string:
+        return ()
+    dimensions = []
+    for dimension in dimension_string.split(","):
+        axis, _, member = dimension.partition(":")
+        dimensions.append((sys.intern(axis), sys.intern(member.split(":")[0])))
+    return tuple(dimensions)
+
+
 def raw_xbrl_raw(
     company_identifiers: CompanyIdentifiers = [],
     entire_universe: bool = False,
@@ -141,3 +399,49 @@ def raw_xbrl_raw(
         clauses=clauses,
         end_point=RAW_XBRL_END_POINT,
     )
+
+
+def raw_xbrl_raw_batches(
+    company_identifiers: CompanyIdentifiers = [],
+    entire_universe: bool = False,
+    clauses: Sequence[RawDataClause] = [],
+    batch_size: int = 10_000,
+    company_chunk_size: Optional[int] = None,
+    period_slices: Sequence[Sequence[RawDataClause]] = [],
+) -> Generator[List[Mapping[str, object]], None, None]:
+    """XBRL facts in batches, decoded as the response is downloaded.
+
+    Use this for `entire_universe` requests, memory is bounded by the batch size rather than by the size of the response.  Large requests can be split into smaller requests by company and by period so each request finishes before the timeout.
+
+    :param company_identifiers: list of tickers or CIK codes
+    :param entire_universe: Search all companies
+    :param clauses: See the parameters that can be passed @ https://www.calcbench.com/api/rawdataxbrlpoints
+    :param batch_size: number of facts in each batch
+    :param company_chunk_size: request this many companies at a time, `entire_universe` requests can only be split by `period_slices`
+    :param period_slices: make a request for each list of clauses, added to `clauses`.  The slices should not overlap.
+
+    Usage::
+
+      >>> period_slices = [
+      >>>     [{"value": year, "parameter": "fiscalYear", "operator": 1}]
+      >>>     for year in range(2015, 2023)
+      >>> ]
+      >>> for facts in cb.raw_xbrl_raw_batches(
+      >>>     entire_universe=True,
+      >>>     clauses=[{"value": "Revenues", "parameter": "XBRLtag", "operator": 1}],
+      >>>     period_slices=period_slices,
+      >>> ):
+      >>>     process(facts)
+
+    """
+    yield from _batched(
+        _iterate_raw_data(
+            company_identifiers=company_identifiers,
+            entire_universe=entire_universe,
+            clauses=clauses,
+            end_point=RAW_XBRL_END_POINT,
+            company_chunk_size=company_chunk_size,
+            period_slices=period_slices,
+        ),
+        batch_size,
+    )
@@ -2,7 +2,7 @@ import dataclasses
 from dataclasses import dataclass
 from datetime import datetime
 from enum import IntEnum
-from typing import Generator, Sequence
+from typing import Generator, Optional, Sequence
 
 from calcbench.api_client import _try_parse_timestamp
 from calcbench.api_query_params import CompanyIdentifiers
@@ -10,8 +10,9 @@ from calcbench.models.period import Period
 from calcbench.raw_numeric_XBRL import (
     RAW_NON_XBRL_END_POINT,
     RawDataClause,
-    _raw_data_raw,
+    _iterate_raw_data,
 )
+from calcbench.standardized_numeric import _batched
 
 try:
     import pandas as pd
@@ -24,6 +25,8 @@ def non_XBRL_numeric_raw(
     company_identifiers: CompanyIdentifiers,
     entire_universe: bool = False,
     clauses: Sequence[RawDataClause] = [],
+    company_chunk_size: Optional[int] = None,
+    period_slices: Sequence[Sequence[RawDataClause]] = [],
 ) -> Generator["NonXBRLFact", None, None]:
     """Non-XBRL numbers extracted from a variety of SEC filings, mainly earnings press-releases
 
@@ -31,9 +34,13 @@ def non_XBRL_numeric_raw(
 
     A professional Calcbench subscription is required to access this data.
 
+    Facts are decoded as the response is downloaded.
+
     :param company_identifiers: list of tickers or CIK codes
     :param entire_universe: Search all companies
     :param clauses: See the parameters that can be passed @ https://www.calcbench.com/api/rawDataNonXBRLPoints
+    :param company_chunk_size: request this many companies at a time
+    :param period_slices: make a request for each list of clauses, added to `clauses`, see :func:`calcbench.raw_numeric_XBRL.raw_xbrl_raw_batches`
 
     Usage:
         >>> clauses = [
@@ -47,11 +54,13 @@ def non_XBRL_numeric_raw(
         >>> ]
         >>> d2 = list(cb.non_XBRL_numeric_raw(entire_universe=True, clauses=clauses))
     """
-    for o in _raw_data_raw(
+    for o in _iterate_raw_data(
         company_identifiers=company_identifiers,
         entire_universe=entire_universe,
         clauses=clauses,
         end_point=RAW_NON_XBRL_END_POINT,
+        company_chunk_size=company_chunk_size,
+        period_slices=period_slices,
     ):
         yield NonXBRLFact(**o)
 
@@ -60,6 +69,9 @@ def non_XBRL_numeric(
     company_identifiers: CompanyIdentifiers = [],
     entire_universe: bool = False,
     clauses: Sequence[RawDataClause] = [],
+    batch_size: int = 10_000,
+    company_chunk_size: Optional[int] = None,
+    period_slices: Sequence[Sequence[RawDataClause]] = [],
 ) -> "pd.DataFrame":
     """Data frame of non-XBRL numbers.
 
@@ -69,6 +81,9 @@ def non_XBRL_numeric(
     :param company_identifiers: list of tickers or CIK codes
     :param entire_universe: Search all companies
     :param clauses: See the parameters that can be passed @ https://www.calcbench.com/api/rawDataNonXBRLPoints
+    :param batch_size: build the DataFrame in batches of this many facts so only one batch of facts is in memory at a time
+    :param company_chunk_size: request this many companies at a time
+    :param period_slices: make a request for each list of clauses, added to `clauses`, see :func:`calcbench.raw_numeric_XBRL.raw_xbrl_raw_batches`
 
     Usage:
         >>> clauses = [
@@ -77,14 +92,17 @@ def non_XBRL_numeric(
         >>> d = cb.non_XBRL_numeric(company_identifiers=['MSFT'], clauses=clauses)
     """
 
-    facts = list(
-        non_XBRL_numeric_raw(
-            company_identifiers=company_identifiers,
-            entire_universe=entire_universe,
-            clauses=clauses,
-        )
+    facts = non_XBRL_numeric_raw(
+        company_identifiers=company_identifiers,
+        entire_universe=entire_universe,
+        clauses=clauses,
+        company_chunk_size=company_chunk_size,
+        period_slices=period_slices,
     )
-    return pd.DataFrame(facts)
+    frames = [pd.DataFrame(batch) for batch in _batched(facts, batch_size)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
 
 
 class StatementType(IntEnum):
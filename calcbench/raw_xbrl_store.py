@@ -0,0 +1,300 @@
+"""
+Raw XBRL facts in a local Parquet dataset.
+
+Facts are partitioned by fiscal year.  Clauses are evaluated locally, filters on the fiscal year skip partitions and filters on other columns skip row groups using the Parquet statistics.
+
+Requires the pyarrow package. ``pip install calcbench-api-client[pyarrow]``
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from calcbench.api_query_params import CompanyIdentifiers
+from calcbench.downloaders import (
+    PARQUET_PART_PREFIX,
+    ParquetDatasetWriter,
+    _unify_schemas,
+)
+from calcbench.raw_numeric_XBRL import (
+    _CATEGORY_COLUMNS,
+    Operator,
+    RawDataClause,
+    _apply_raw_XBRL_schema,
+    _explode_dimensions,
+    _parse_dimension_string,
+    _raw_XBRL_data_frame_columnar,
+    raw_xbrl_raw_batches,
+)
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+try:
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+PARTITION_COLUMN = "fiscal_year"
+
+_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+class RawXBRLStore:
+    """
+    Raw XBRL facts synced from Calcbench to a folder of Parquet files.
+
+    Usage::
+
+        >>> from calcbench.raw_xbrl_store import RawXBRLStore
+        >>> store = RawXBRLStore("~/calcbench_raw_xbrl")
+        >>> store.sync(
+        >>>     entire_universe=True,
+        >>>     clauses=[{"value": "Revenues", "parameter": "XBRLtag", "operator": 10}],
+        >>>     period_slices=[
+        >>>         [{"value": year, "parameter": "fiscalYear", "operator": 1}]
+        >>>         for year in range(2015, 2023)
+        >>>     ],
+        >>> )
+        >>> store.query(
+        >>>     clauses=[
+        >>>         {"value": "Revenues", "parameter": "XBRLtag", "operator": 10},
+        >>>         {"value": "Y", "parameter": "fiscalPeriod", "operator": 1},
+        >>>         {"value": "2018", "parameter": "fiscalYear", "operator": 1},
+        >>>     ],
+        >>>     company_identifiers=["mmm"],
+        >>> )
+
+    """
+
+    def __init__(self, root_path: Union[str, Path]):
+        """
+        :param root_path: folder in which to keep the facts
+        """
+        self.root_path = Path(os.path.expanduser(root_path))
+
+    def sync(
+        self,
+        company_identifiers: CompanyIdentifiers = [],
+        entire_universe: bool = False,
+        clauses: Sequence[RawDataClause] = [],
+        batch_size: int = 100_000,
+        company_chunk_size: Optional[int] = None,
+        period_slices: Sequence[Sequence[RawDataClause]] = [],
+    ) -> int:
+        """
+        Get facts from Calcbench and add them to the store, see :func:`calcbench.raw_xbrl_raw_batches` for the arguments.
+
+        Facts that are already in the store are replaced, the files that have them are rewritten without them.
+
+        :return: the number of facts written
+        """
+        existing_files = sorted(
+            self.root_path.glob(f"*/{PARQUET_PART_PREFIX}*.parquet")
+        )
+        writers: Dict[str, ParquetDatasetWriter] = {}
+        fact_ids: List["np.ndarray"] = []
+        fact_count = 0
+        try:
+            for facts in raw_xbrl_raw_batches(
+                company_identifiers=company_identifiers,
+                entire_universe=entire_universe,
+                clauses=clauses,
+                batch_size=batch_size,
+                company_chunk_size=company_chunk_size,
+                period_slices=period_slices,
+            ):
+                data = _raw_XBRL_data_frame_columnar(facts)
+                # The dimensions are rebuilt from the dimension string when the facts are read
+                data = data.drop(columns="dimensions", errors="ignore")
+                if PARTITION_COLUMN not in data.columns:
+                    data[PARTITION_COLUMN] = None
+                for year, group in data.groupby(PARTITION_COLUMN, dropna=False):
+                    partition = _NULL_PARTITION if pd.isna(year) else str(int(year))
+                    if partition not in writers:
+                        writers[partition] = ParquetDatasetWriter(
+                            self.root_path / f"{PARTITION_COLUMN}={partition}",
+                            sort_by=["ticker", "XBRL_tag"],
+                        )
+                    writers[partition].write(
+                        _string_columns(
+                            pa.Table.from_pandas(
+                                group.drop(columns=PARTITION_COLUMN),
+                                preserve_index=False,
+                            )
+                        )
+                    )
+                if "fact_id" in data.columns:
+                    fact_ids.append(data["fact_id"].dropna().to_numpy(dtype="int64"))
+                fact_count += len(data)
+        finally:
+            for writer in writers.values():
+                writer.close()
+            if fact_ids:
+                _remove_facts(existing_files, np.unique(np.concatenate(fact_ids)))
+        return fact_count
+
+    def query(
+        self,
+        clauses: Sequence[RawDataClause] = [],
+        company_identifiers: CompanyIdentifiers = [],
+        dimensions: Literal["dict", "columns"] = "dict",
+        engine: Literal["dict", "columnar"] = "dict",
+    ) -> "pd.DataFrame":
+        """
+        Facts in the store, in the same shape as :func:`calcbench.raw_XBRL`.
+
+        :param clauses: evaluated like the server does, `parameter` is matched to a column ignoring case and underscores, "XBRLtag" is the XBRL_tag column.  Contains is not case sensitive.
+        :param company_identifiers: tickers or CIK codes, all companies in the store if not supplied
+        :param dimensions: see :func:`calcbench.raw_XBRL`
+        :param engine: see :func:`calcbench.raw_XBRL`
+
+        :return: an empty dataframe if no facts are found.
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame()
+        expression = _filter_expression(dataset.schema, clauses, company_identifiers)
+        table = dataset.to_table(filter=expression)
+        if not table.num_rows:
+            return pd.DataFrame()
+        data = table.to_pandas()
+        if "fact_id" in data.columns:
+            # A sync can get the same fact twice, eg. from overlapping period slices
+            data = data.drop_duplicates("fact_id", ignore_index=True)
+        if engine == "columnar":
+            data = _apply_raw_XBRL_schema(data, columns=_CATEGORY_COLUMNS)
+        else:
+            data = data.rename(columns={"value": "Value"})
+        if "dimension_string" in data.columns:
+            data["dimensions"] = [
+                _parse_dimension_string(s if isinstance(s, str) else None)
+                for s in data["dimension_string"]
+            ]
+            if dimensions == "columns":
+                data = _explode_dimensions(data)
+        return data
+
+    def _dataset(self) -> Optional["ds.Dataset"]:
+        metadata_paths = sorted(self.root_path.glob("*/_common_metadata"))
+        if not metadata_paths:
+            return None
+        schema = _unify_schemas([pq.read_schema(p) for p in metadata_paths])
+        partition_schema = pa.schema([(PARTITION_COLUMN, pa.int64())])
+        return ds.dataset(
+            self.root_path,
+            format="parquet",
+            schema=_unify_schemas([schema, partition_schema]),
+            partitioning=ds.partitioning(partition_schema, flavor="hive"),
+        )
+
+
+def _remove_facts(file_paths: Sequence[Path], fact_ids: "np.ndarray"):
+    """
+    Rewrite the files without the facts that were synced again.  Emptied files are kept so the numbering of the files written next does not collide.
+    """
+    value_set = pa.array(fact_ids, type=pa.int64())
+    for file_path in file_paths:
+        if "fact_id" not in pq.read_schema(file_path).names:
+            continue
+        existing = pq.read_table(file_path, columns=["fact_id"]).column("fact_id")
+        replaced = pc.is_in(existing.cast(pa.int64()), value_set=value_set)
+        if not pc.any(replaced).as_py():
+            continue
+        table = pq.read_table(file_path)
+        table = table.filter(pc.invert(pc.fill_null(replaced, False)))
+        temporary_path = file_path.with_suffix(".tmp")
+        pq.write_table(table, temporary_path)
+        os.replace(temporary_path, file_path)
+
+
+def _string_columns(table: "pa.Table") -> "pa.Table":
+    """
+    Categoricals with no values do not have string categories
+    """
+    for column in _CATEGORY_COLUMNS:
+        if column in table.column_names:
+            i = table.schema.get_field_index(column)
+            table = table.set_column(
+                i, pa.field(column, pa.string()), table.column(i).cast(pa.string())
+            )
+    return table
+
+
+def _filter_expression(
+    schema: "pa.Schema",
+    clauses: Sequence[RawDataClause],
+    company_identifiers: CompanyIdentifiers,
+) -> Optional["ds.Expression"]:
+    expressions = [_clause_expression(schema, clause) for clause in clauses]
+    if company_identifiers:
+        identifiers = pa.array([str(c).upper() for c in company_identifiers])
+        company_expressions = [
+            pc.is_in(pc.utf8_upper(pc.field(column)), value_set=identifiers)
+            for column in ("ticker", "CIK")
+            if column in schema.names
+        ]
+        if not company_expressions:
+            raise ValueError("The store does not have a ticker or CIK column")
+        expressions.append(_combine(company_expressions, "or"))
+    if not expressions:
+        return None
+    return _combine(expressions, "and")
+
+
+def _combine(expressions: List["ds.Expression"], how: Literal["and", "or"]):
+    combined = expressions[0]
+    for expression in expressions[1:]:
+        combined = combined & expression if how == "and" else combined | expression
+    return combined
+
+
+def _clause_expression(schema: "pa.Schema", clause: RawDataClause) -> "ds.Expression":
+    column = _clause_column(schema, clause["parameter"])
+    field = pc.field(column)
+    column_type = schema.field(column).type
+    operator = Operator(clause["operator"])
+    if operator == Operator.Contains:
+        if not pa.types.is_string(column_type):
+            field = field.cast(pa.string())
+        return pc.match_substring(field, str(clause["value"]), ignore_case=True)
+    value = _clause_value(clause["value"], column_type)
+    if operator == Operator.Equals:
+        return field == value
+    if operator == Operator.NotEquals:
+        return field != value
+    raise ValueError(f"Operator {operator} is not supported")
+
+
+def _clause_column(schema: "pa.Schema", parameter: str) -> str:
+    """
+    "fiscalYear" -> "fiscal_year", "XBRLtag" -> "XBRL_tag"
+    """
+    columns = {_normalize(name): name for name in schema.names}
+    try:
+        return columns[_normalize(parameter)]
+    except KeyError:
+        raise ValueError(f"No column for clause parameter {parameter}") from None
+
+
+def _normalize(name: str) -> str:
+    return name.replace("_", "").lower()
+
+
+def _clause_value(value: Any, column_type: "pa.DataType") -> Any:
+    if pa.types.is_null(column_type):
+        return value
+    try:
+        return pa.scalar(value).cast(column_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Cannot compare {value} to a {column_type} column") from e
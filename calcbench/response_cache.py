@@ -0,0 +1,213 @@
+"""
+On-disk cache of API responses.
+
+Responses are stored gzipped, one file per request, named by a hash of the server, the user, the end-point and the canonical request body.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import IO, Dict, Iterator, Mapping, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".json.gz"
+
+
+class ResponseCache:
+    """
+    Cache of response bodies on disk.
+
+    Entries expire `ttl` after they are written.  When the cache is larger than `max_size_bytes` the least recently read entries are deleted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path],
+        default_ttl: Optional[timedelta] = timedelta(days=1),
+        end_point_ttls: Mapping[str, Optional[timedelta]] = {},
+        max_size_bytes: int = 2**30,
+    ):
+        """
+        :param cache_dir: folder in which to write responses
+        :param default_ttl: how long responses are kept, None to keep them until they are evicted
+        :param end_point_ttls: time to live by end-point, eg. {"mappedData": timedelta(hours=1)}
+        :param max_size_bytes: size of the cache on disk
+        """
+        self.cache_dir = Path(os.path.expanduser(cache_dir))
+        self.default_ttl = default_ttl
+        self.end_point_ttls: Dict[str, Optional[timedelta]] = dict(end_point_ttls)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._size_bytes: Optional[int] = None
+
+    def key(
+        self,
+        method: str,
+        end_point: str,
+        data: str,
+        base_url: str = "",
+        user: Optional[str] = None,
+    ) -> str:
+        """
+        Hash of the request.  JSON bodies are normalized so the order of keys does not matter.
+
+        :param base_url: server the request is made to, responses from different servers are cached separately
+        :param user: user the request is made for, users can be entitled to different data
+        """
+        try:
+            data = json.dumps(json.loads(data), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            pass
+        request = json.dumps([method, base_url, user, end_point, data])
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def ttl(self, end_point: str) -> Optional[timedelta]:
+        return self.end_point_ttls.get(end_point, self.default_ttl)
+
+    def get(self, key: str, ttl: Optional[timedelta]) -> Optional[bytes]:
+        """
+        The cached response or None if there is not a fresh one.
+        """
+        f = self.open(key, ttl)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open(self, key: str, ttl: Optional[timedelta]) -> Optional[IO[bytes]]:
+        """
+        File like object of the cached response, for reading large responses in chunks.
+        """
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if ttl is not None and now - stat.st_mtime > ttl.total_seconds():
+            self._delete(path)
+            return None
+        try:
+            # The access time is used for LRU eviction, the modification time is the write time.
+            os.utime(path, (now, stat.st_mtime))
+            f = gzip.open(path, "rb")
+        except FileNotFoundError:
+            return None
+        logger.debug(f"cache hit {key}")
+        return f  # type: ignore
+
+    def put(self, key: str, body: bytes):
+        with self.writer(key) as writer:
+            writer.write(body)
+
+    def writer(self, key: str) -> "_CacheWriter":
+        """
+        Write a response in chunks.  The entry only appears in the cache if the writer is closed without an exception.
+        """
+        return _CacheWriter(self, key)
+
+    def clear(self):
+        """
+        Delete everything in the cache
+        """
+        for path in self._entries():
+            self._delete(path)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{CACHE_FILE_SUFFIX}"
+
+    def _entries(self) -> Iterator[Path]:
+        if self.cache_dir.exists():
+            yield from self.cache_dir.glob(f"*/*{CACHE_FILE_SUFFIX}")
+
+    def _delete(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if self._size_bytes is not None:
+                self._size_bytes -= size
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._size_bytes is None:
+                self._size_bytes = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._size_bytes += size
+            if self._size_bytes <= self.max_size_bytes:
+                return
+            self._evict()
+
+    def _evict(self):
+        """
+        Delete the least recently read entries until the cache is 90% of its maximum size
+        """
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        target = self.max_size_bytes * 0.9
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size_bytes = size
+
+
+class _CacheWriter:
+    def __init__(self, cache: ResponseCache, key: str):
+        self.cache = cache
+        self.path = cache._path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb", compresslevel=6)
+
+    def write(self, chunk: bytes):
+        self._gzip.write(chunk)
+
+    def commit(self):
+        self._gzip.close()
+        self._file.close()
+        try:
+            replaced_size = self.path.stat().st_size
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(self.temp_path, self.path)
+        self.cache._added(self.path.stat().st_size - replaced_size)
+
+    def abort(self):
+        self._gzip.close()
+        self._file.close()
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "_CacheWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
@@ -0,0 +1,357 @@
+"""
+Retrying failed requests.
+
+Retries wait with jittered exponential backoff, or as long as the server asks with `Retry-After`.  Threads share a retry budget and a circuit breaker so that when the server is struggling the client backs off instead of multiplying the load.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, FrozenSet, Mapping, Optional, TypeVar
+
+import requests
+from requests import RequestException
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RequestException):
+    """
+    Requests are not being made because too many requests failed recently.
+    """
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How to retry requests to an end-point.
+    """
+
+    max_tries: int = 8
+    """Including the first try"""
+    base_delay: float = 1.0
+    """Seconds to wait before the first retry, before jitter"""
+    max_delay: float = 60.0
+    multiplier: float = 2.0
+    jitter: bool = True
+    """Wait a random time between 0 and the backoff delay ("full jitter") so threads that failed together do not retry together"""
+    retry_statuses: FrozenSet[int] = frozenset({408, 425, 429, 500, 502, 503, 504})
+    respect_retry_after: bool = True
+    max_retry_after: float = 300.0
+    """Longest `Retry-After` to honor, in seconds"""
+    idempotent: bool = True
+    """
+    Making the request twice is harmless.  If False only requests the server did not process are retried, connection failures and 429/503 responses.
+    """
+
+    def retryable(self, e: RequestException) -> bool:
+        response = getattr(e, "response", None)
+        if isinstance(e, requests.HTTPError) and response is not None:
+            if not self.idempotent:
+                return response.status_code in (429, 503)
+            return response.status_code in self.retry_statuses
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        if isinstance(e, requests.ConnectionError):
+            return self.idempotent or _not_connected(e)
+        if isinstance(
+            e,
+            (
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.JSONDecodeError,
+            ),
+        ):
+            # a response that is not valid JSON is usually truncated
+            return self.idempotent
+        return False
+
+    def delay(self, attempt: int, e: Optional[RequestException] = None) -> float:
+        """
+        Seconds to wait after try number `attempt` failed
+        """
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if self.respect_retry_after and e is not None:
+            retry_after = _retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+
+class RetryBudget:
+    """
+    Retries allowed, shared by all threads.
+
+    Each retry spends a token, each successful request earns `ratio` tokens and tokens also accrue at `min_retries_per_second`.  When the server is failing most requests the budget runs out and requests fail rather than being retried.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        max_tokens: float = 100.0,
+    ):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Take a token for a retry, False if the budget is exhausted
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens,
+            self._tokens + (now - self._updated) * self.min_retries_per_second,
+        )
+        self._updated = now
+
+
+class CircuitBreaker:
+    """
+    Stop making requests after `failure_threshold` consecutive failures, shared by all threads.
+
+    After `reset_timeout` seconds one request is let through, if it succeeds requests resume.
+    """
+
+    def __init__(self, failure_threshold: int = 20, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_request(self):
+        """
+        :raises CircuitOpenError: if requests should not be made
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0 or self._probing:
+                raise CircuitOpenError(
+                    f"{self._failures} consecutive requests failed, not making requests for {max(remaining, 0):.0f} seconds"
+                )
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("requests are succeeding, closing the circuit breaker")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """
+        The request let through failed without saying whether the server is healthy, let another one through.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        f"{self._failures} consecutive requests failed, pausing requests for {self.reset_timeout} seconds"
+                    )
+                self._opened_at = time.monotonic()
+
+
+def call_with_retries(
+    f: Callable[[], T],
+    policy: RetryPolicy,
+    giveup: Optional[Callable[[RequestException], bool]] = None,
+    budget: Optional[RetryBudget] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    on_attempt: Optional[Callable[[int], None]] = None,
+    description: str = "",
+) -> T:
+    """
+    Call `f` until it does not raise a retryable `RequestException`.
+
+    :param giveup: do not retry exceptions for which this returns True
+    :param on_attempt: called with the try number before each try
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if on_attempt:
+            on_attempt(attempt)
+        if circuit_breaker:
+            circuit_breaker.before_request()
+        try:
+            result = f()
+        except RequestException as e:
+            delay = _retry_delay(
+                e, attempt, policy, giveup, budget, circuit_breaker, description
+            )
+            if delay is None:
+                raise
+            time.sleep(delay)
+        except BaseException:
+            # eg. a response that could not be parsed or KeyboardInterrupt
+            if circuit_breaker:
+                circuit_breaker.release_probe()
+            raise
+        else:
+            _record_success(budget, circuit_breaker)
+            return result
+
+
+async def call_with_retries_async(
+    f: Callable[[], Awaitable[T]],
+    policy: RetryPolicy,
+    giveup: Optional[Callable[[RequestException], bool]] = None,
+    budget: Optional[RetryBudget] = None,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+    on_attempt: Optional[Callable[[int], None]] = None,
+    description: str = "",
+) -> T:
+    """
+    :func:`call_with_retries` for coroutines, waits with `asyncio.sleep`.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if on_attempt:
+            on_attempt(attempt)
+        if circuit_breaker:
+            circuit_breaker.before_request()
+        try:
+            result = await f()
+        except RequestException as e:
+            delay = _retry_delay(
+                e, attempt, policy, giveup, budget, circuit_breaker, description
+            )
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+        except BaseException:
+            # eg. a response that could not be parsed or the task was cancelled
+            if circuit_breaker:
+                circuit_breaker.release_probe()
+            raise
+        else:
+            _record_success(budget, circuit_breaker)
+            return result
+
+
+def _retry_delay(
+    e: RequestException,
+    attempt: int,
+    policy: RetryPolicy,
+    giveup: Optional[Callable[[RequestException], bool]],
+    budget: Optional[RetryBudget],
+    circuit_breaker: Optional[CircuitBreaker],
+    description: str,
+) -> Optional[float]:
+    """
+    Record that try number `attempt` failed with `e`.
+
+    :return: seconds to wait before retrying, None to give up
+    """
+    retryable = policy.retryable(e)
+    if circuit_breaker:
+        if retryable:
+            circuit_breaker.record_failure()
+        else:
+            # the server is answering, eg. a 404
+            circuit_breaker.record_success()
+    if (
+        not retryable
+        or attempt >= policy.max_tries
+        or (giveup is not None and giveup(e))
+    ):
+        return None
+    if budget and not budget.withdraw():
+        logger.warning(f"retry budget exhausted, not retrying {description}")
+        return None
+    delay = policy.delay(attempt, e)
+    logger.info(
+        f"try {attempt} of {description} failed with {e!r}, retrying in {delay:.1f} seconds"
+    )
+    return delay
+
+
+def _record_success(
+    budget: Optional[RetryBudget], circuit_breaker: Optional[CircuitBreaker]
+):
+    if circuit_breaker:
+        circuit_breaker.record_success()
+    if budget:
+        budget.deposit()
+
+
+def policy_for(
+    end_point: Optional[str],
+    default: RetryPolicy,
+    end_point_policies: Mapping[str, RetryPolicy],
+) -> RetryPolicy:
+    if end_point is None:
+        return default
+    return end_point_policies.get(end_point, default)
+
+
+def _retry_after(e: RequestException) -> Optional[float]:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _not_connected(e: RequestException) -> bool:
+    """
+    The connection failed before the request was sent
+    """
+    return any(
+        name in repr(e)
+        for name in ("NewConnectionError", "NameResolutionError", "ConnectTimeout")
+    )
@@ -1,22 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-from typing import TYPE_CHECKING, Optional, Sequence, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+import warnings
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
 
 
 from calcbench.api_query_params import (
     APIQueryParams,
     CompaniesParameters,
+    CompanyIdentifier,
     CompanyIdentifiers,
     DateRange,
     PeriodArgument,
     PeriodParameters,
 )
+from calcbench.models.period import Period
 from calcbench.models.period_type import PeriodType
 from calcbench.models.revisions import Revisions
 from calcbench.models.standardized import StandardizedPoint
 from calcbench.standardized_parameters import StandardizedParameters
 
 
-from calcbench.api_client import _json_POST
+from calcbench.api_client import (
+    _check_pool_size,
+    _json_POST,
+    _json_POST_stream,
+    logger,
+)
+from requests import RequestException
+
+T = TypeVar("T")
 
 
 if TYPE_CHECKING:
@@ -87,6 +118,96 @@ def standardized_raw(
     :param all_modifications: Include data which was either written, modified, or confirmed as XBRL, in the specified date-range or filing_id.
     :param revisions: Restrict results to first or last reported values.  Revisions puts you into pit_V2 mode, which means you get data from the standardized table on the back end.
 
+    """
+    payload = _standardized_raw_payload(
+        company_identifiers=company_identifiers,
+        metrics=metrics,
+        start_year=start_year,
+        start_period=start_period,
+        end_year=end_year,
+        end_period=end_period,
+        entire_universe=entire_universe,
+        point_in_time=point_in_time,
+        include_trace=include_trace,
+        all_history=all_history,
+        year=year,
+        period=period,
+        period_type=period_type,
+        use_fiscal_period=use_fiscal_period,
+        all_face=all_face,
+        all_footnotes=all_footnotes,
+        filing_id=filing_id,
+        all_non_GAAP=all_non_GAAP,
+        all_metrics=all_metrics,
+        pit_V2=pit_V2,
+        start_date=start_date,
+        end_date=end_date,
+        XBRL_only=XBRL_only,
+        all_modifications=all_modifications,
+        revisions=revisions,
+    )
+    return _json_POST(
+        "mappedData",
+        payload,
+        parse=lambda response: [
+            StandardizedPoint(**d) for d in response
+        ],  # It might be faster to use TypeAdapter(List[StandardizedPoint]).validate_python(response) but that signature changed between pydantic 1 and 2 so I am not doing it.
+    )
+
+
+def standardized_raw_batches(
+    batch_size: int = 10_000, **kwargs
+) -> Generator[List[StandardizedPoint], None, None]:
+    """Standardized data in batches, decoded as the response is downloaded.
+
+    Takes the same arguments as :func:`standardized_raw`.  Use this for `entire_universe` or `all_history` requests, memory is bounded by the batch size rather than by the size of the response.
+
+    :param batch_size: number of points in each batch
+
+    Usage::
+
+      >>> for points in calcbench.standardized_raw_batches(entire_universe=True, metrics=["revenue"], all_history=True):
+      >>>     process(points)
+
+    """
+    payload = _standardized_raw_payload(**kwargs)
+    yield from _batched(
+        _json_POST_stream(
+            "mappedData", payload, parse=lambda d: StandardizedPoint(**d)
+        ),
+        batch_size,
+    )
+
+
+def _standardized_raw_payload(
+    company_identifiers: CompanyIdentifiers = [],
+    metrics: Sequence[str] = [],
+    start_year: Optional[int] = None,
+    start_period: PeriodArgument = None,
+    end_year: Optional[int] = None,
+    end_period: PeriodArgument = None,
+    entire_universe: bool = False,
+    point_in_time: bool = False,
+    include_trace: bool = False,
+    all_history: bool = False,
+    year: Optional[int] = None,
+    period: PeriodArgument = None,
+    period_type: Optional[PeriodType] = None,
+    use_fiscal_period: bool = False,
+    all_face: bool = False,
+    all_footnotes: bool = False,
+    filing_id: Optional[int] = None,
+    all_non_GAAP: bool = False,
+    all_metrics: bool = False,
+    pit_V2: Optional[bool] = False,
+    start_date: Optional[Union[datetime, date]] = None,
+    end_date: Optional[Union[datetime, date]] = None,
+    XBRL_only: Optional[bool] = False,
+    all_modifications: Optional[bool] = False,
+    revisions: Optional[Revisions] = Revisions.All,
+) -> APIQueryParams[StandardizedParameters]:
+    """
+    Validate the arguments to `standardized_raw` and build the payload for the mappedData end-point.
     """
     if [
         bool(company_identifiers),
@@ -248,15 +369,11 @@ def standardized_raw(
         XBRLOnly=XBRL_only,
     )
 
-    payload = APIQueryParams(
+    return APIQueryParams(
         pageParameters=page_parameters,
         periodParameters=period_parameters,
         companiesParameters=companies_parameters,
     )
-    response = _json_POST("mappedData", payload)
-    return [
-        StandardizedPoint(**d) for d in response
-    ]  # It might be faster to use TypeAdapter(List[StandardizedPoint]).validate_python(response) but that signature changed between pydantic 1 and 2 so I am not doing it.
 
 
 def standardized(
@@ -273,6 +390,12 @@ def standardized(
     all_modifications: Optional[bool] = False,
     period_type: Optional[PeriodType] = None,
     revisions: Optional[Revisions] = Revisions.All,
+    batch_size: Optional[int] = None,
+    engine: Literal["pydantic", "columnar"] = "pydantic",
+    companies_per_shard: Optional[int] = None,
+    fiscal_year_range: Optional[Tuple[int, int]] = None,
+    years_per_shard: Optional[int] = None,
+    max_workers: int = 1,
 ) -> "pd.DataFrame":
     """Standardized Numeric Data.
 
@@ -295,6 +418,12 @@ def standardized(
     :param all_modifications: Include data which was either written, modified, or confirmed as XBRL, in the specified date-range or filing_id.
     :param period_type: Restrict results to quarterly or annual fiscal periods.
     :param revisions: Restrict results to first or last reported values.  Revisions puts you into pit_V2 mode, which means you get data from the standardized table on the back end.
+    :param batch_size: Decode the response as it is downloaded and build the DataFrame in batches of this many points, useful for large requests.
+    :param engine: "columnar" builds the DataFrame directly from the response without making a `StandardizedPoint` for each point, which is faster and uses less memory for large requests.
+    :param companies_per_shard: Split the request into requests for this many companies.  Failed requests are retried according to `enable_backoff`, a shard that still fails is split until the failing companies are found.  The companies for which data could not be retrieved are in `data.attrs["failed_company_identifiers"]`.
+    :param fiscal_year_range: First and last (inclusive) fiscal years for which to get data.
+    :param years_per_shard: Split `fiscal_year_range` into requests for this many years.  When the request is for the entire universe the year ranges of shards that could not be retrieved are in `data.attrs["failed_shards"]` as `(start_year, end_year)`.
+    :param max_workers: Number of shards requested concurrently.
 
     :return: Dataframe
 
@@ -330,10 +459,21 @@ def standardized(
     company_identifiers = list(company_identifiers)
     if point_in_time and pit_V2 is None:
         pit_V2 = True
-    data_points = standardized_raw(
+    if fiscal_year_range and fiscal_year:
+        raise ValueError(
+            "Use fiscal_year for a single year, fiscal_year_range for ranges."
+        )
+    if years_per_shard and not fiscal_year_range:
+        raise ValueError("years_per_shard requires fiscal_year_range")
+    if engine not in ("pydantic", "columnar"):
+        raise ValueError('engine must be "pydantic" or "columnar"')
+    start_year, end_year = fiscal_year_range or (None, None)
+    standardized_raw_arguments = dict(
         company_identifiers=company_identifiers,
-        all_history=not fiscal_year,
+        all_history=not (fiscal_year or fiscal_year_range),
         year=fiscal_year,
+        start_year=start_year,
+        end_year=end_year,
         period=fiscal_period,
         point_in_time=point_in_time,
         metrics=metrics,
@@ -349,6 +489,47 @@ def standardized(
         period_type=period_type,
         revisions=revisions,
     )
+    if companies_per_shard or years_per_shard:
+        if filing_id:
+            raise ValueError("Requests for a filing_id can not be sharded")
+        return _sharded_data_frame(
+            standardized_raw_arguments,
+            companies_per_shard=companies_per_shard,
+            years_per_shard=years_per_shard,
+            max_workers=max_workers,
+            batch_size=batch_size,
+            engine=engine,
+        )
+    return _standardized_data_frame(
+        standardized_raw_arguments, batch_size=batch_size, engine=engine
+    )
+
+
+def _standardized_data_frame(
+    standardized_raw_arguments: Dict[str, Any],
+    batch_size: Optional[int],
+    engine: Literal["pydantic", "columnar"],
+) -> "pd.DataFrame":
+    point_in_time = standardized_raw_arguments["point_in_time"]
+    if engine == "columnar":
+        payload = _standardized_raw_payload(**standardized_raw_arguments)
+        if batch_size:
+            return _build_data_frame_from_batches(
+                _batched(_json_POST_stream("mappedData", payload), batch_size),
+                point_in_time=point_in_time,
+                builder=build_data_frame_columnar,
+            )
+        return build_data_frame_columnar(
+            _json_POST("mappedData", payload) or [], point_in_time=point_in_time
+        )
+    if batch_size:
+        return _build_data_frame_from_batches(
+            standardized_raw_batches(
+                batch_size=batch_size, **standardized_raw_arguments
+            ),
+            point_in_time=point_in_time,
+        )
+    data_points = standardized_raw(**standardized_raw_arguments)
     if len(data_points) == 0:
         return pd.DataFrame()
     data = build_data_frame(data_points, point_in_time=point_in_time)
@@ -356,6 +537,121 @@ def standardized(
     return data
 
 
+def _sharded_data_frame(
+    standardized_raw_arguments: Dict[str, Any],
+    companies_per_shard: Optional[int],
+    years_per_shard: Optional[int],
+    max_workers: int,
+    batch_size: Optional[int],
+    engine: Literal["pydantic", "columnar"],
+) -> "pd.DataFrame":
+    """
+    Split the request by companies and fiscal years, request the shards concurrently and put the frames back together.
+    """
+    company_identifiers = list(standardized_raw_arguments["company_identifiers"])
+    if companies_per_shard and not company_identifiers:
+        from calcbench.companies import tickers
+
+        company_identifiers = tickers(entire_universe=True)
+    company_chunks = (
+        [
+            company_identifiers[i : i + companies_per_shard]
+            for i in range(0, len(company_identifiers), companies_per_shard)
+        ]
+        if companies_per_shard
+        else [company_identifiers]
+    )
+    start_year = standardized_raw_arguments["start_year"]
+    end_year = standardized_raw_arguments["end_year"]
+    year_ranges = (
+        [
+            (year, min(year + years_per_shard - 1, end_year))
+            for year in range(start_year, end_year + 1, years_per_shard)
+        ]
+        if years_per_shard
+        else [(start_year, end_year)]
+    )
+    shards = [
+        {
+            **standardized_raw_arguments,
+            "company_identifiers": company_chunk,
+            "entire_universe": not company_chunk,
+            "start_year": first_year,
+            "end_year": last_year,
+        }
+        for company_chunk in company_chunks
+        for first_year, last_year in year_ranges
+    ]
+    if shards:
+        # Check the arguments before making requests
+        _standardized_raw_payload(**shards[0])
+    failed_company_identifiers: List[CompanyIdentifier] = []
+    failed_shards: List[Tuple[int, int]] = []
+
+    def get_shard(shard: Dict[str, Any]) -> "pd.DataFrame":
+        return _shard_data_frame(
+            shard,
+            batch_size=batch_size,
+            engine=engine,
+            failed_company_identifiers=failed_company_identifiers,
+            failed_shards=failed_shards,
+        )
+
+    _check_pool_size(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(get_shard, shards))
+    data = _concat_data_frames(frames)
+    failed_company_identifiers = list(dict.fromkeys(failed_company_identifiers))
+    if failed_company_identifiers:
+        warnings.warn(f"Could not get data for {failed_company_identifiers}")
+    data.attrs["failed_company_identifiers"] = failed_company_identifiers
+    if failed_shards:
+        warnings.warn(f"Could not get data for the entire universe for {failed_shards}")
+    data.attrs["failed_shards"] = sorted(failed_shards)
+    return data
+
+
+def _shard_data_frame(
+    shard: Dict[str, Any],
+    batch_size: Optional[int],
+    engine: Literal["pydantic", "columnar"],
+    failed_company_identifiers: List[CompanyIdentifier],
+    failed_shards: List[Tuple[int, int]],
+) -> "pd.DataFrame":
+    """
+    Get a shard, if it fails split the companies in half so one bad company does not lose the data for the others.
+    A shard for the entire universe can not be split, its years are appended to `failed_shards`.
+
+    Retrying is left to `enable_backoff`, only request errors are caught so parse errors are raised.
+    """
+    try:
+        return _standardized_data_frame(shard, batch_size=batch_size, engine=engine)
+    except RequestException as e:
+        logger.warning(
+            f"Exception getting shard {shard['company_identifiers'][:5]}... {shard['start_year']}-{shard['end_year']}, {e}"
+        )
+    company_identifiers = shard["company_identifiers"]
+    if not company_identifiers:
+        failed_shards.append((shard["start_year"], shard["end_year"]))
+        return pd.DataFrame()
+    if len(company_identifiers) == 1:
+        failed_company_identifiers.extend(company_identifiers)
+        return pd.DataFrame()
+    middle = len(company_identifiers) // 2
+    return _concat_data_frames(
+        [
+            _shard_data_frame(
+                {**shard, "company_identifiers": half},
+                batch_size=batch_size,
+                engine=engine,
+                failed_company_identifiers=failed_company_identifiers,
+                failed_shards=failed_shards,
+            )
+            for half in (company_identifiers[:middle], company_identifiers[middle:])
+        ]
+    )
+
+
 ORDERED_REGULAR_COLUMNS = [
     "ticker",
     "metric",
@@ -416,6 +712,81 @@ def build_data_frame(
         data = data.drop(columns=["trace_facts"], errors="ignore")  # type: ignore
     else:
         data = data.reindex(columns=columns)
+    return _format_data_frame(data, point_in_time=point_in_time)
+
+
+def build_data_frame_columnar(
+    raw_data: Iterable[Mapping[str, Any]], point_in_time: bool
+) -> "pd.DataFrame":
+    """
+    Build the same frame as `build_data_frame` directly from the JSON returned by the server.
+
+    Columns are built one at a time rather than making a `StandardizedPoint` and then a dict for each point.  Required fields are checked, dates are parsed into datetime64 columns and periods are checked against the `Period` enum.  `fiscal_period` is categorical.
+    """
+    rows = raw_data if isinstance(raw_data, list) else list(raw_data)
+    if not rows:
+        return pd.DataFrame()
+    columns = ORDERED_PIT_COLUMNS if point_in_time else ORDERED_REGULAR_COLUMNS
+    if point_in_time:
+        keys = set(StandardizedPoint.model_fields).union(*(r.keys() for r in rows))
+        columns = columns + sorted(keys - set(columns) - {"trace_facts"})
+    data = pd.DataFrame(
+        {column: _standardized_column(rows, column) for column in columns}
+    )
+    return _categorical_fiscal_period(
+        _format_data_frame(data, point_in_time=point_in_time)
+    )
+
+
+_REQUIRED_COLUMNS = {
+    name
+    for name, field in StandardizedPoint.model_fields.items()
+    if field.is_required()
+}
+
+_DATE_COLUMNS = {
+    "date_reported",
+    "period_start",
+    "period_end",
+    "date_modified",
+    "date_XBRL_confirmed",
+}
+
+
+def _standardized_column(rows: List[Mapping[str, Any]], column: str) -> "pd.Series":
+    values = [r.get(column) for r in rows]
+    if column in _REQUIRED_COLUMNS and None in values:
+        raise ValueError(f"{column} is missing from a standardized point")
+    if column in _DATE_COLUMNS:
+        return _date_column(values)
+    if column in ("fiscal_period", "calendar_period"):
+        periods = {v: Period(v).value for v in set(values)}
+        return pd.Series(values).map(periods)
+    return pd.Series(values)
+
+
+def _date_column(values: List[Any]) -> "pd.Series":
+    """
+    Parse dates to the dtype pandas gives the datetimes of a `StandardizedPoint`, a column without dates stays None like it does for the pydantic engine.
+    """
+    if all(v is None for v in values):
+        return pd.Series(values, dtype=object)
+    dates = pd.Series(pd.to_datetime(values, format="ISO8601"))
+    unit = getattr(pd.Series([datetime(2000, 1, 1)]).dt, "unit", None)
+    if unit:
+        dates = dates.dt.as_unit(unit)
+    return dates
+
+
+def _categorical_fiscal_period(data: "pd.DataFrame") -> "pd.DataFrame":
+    level = data.index.names.index("fiscal_period")
+    data.index = data.index.set_levels(
+        data.index.levels[level].astype("category"), level=level
+    )
+    return data
+
+
+def _format_data_frame(data: "pd.DataFrame", point_in_time: bool) -> "pd.DataFrame":
     data["fiscal_period"] = (
         data["fiscal_year"].astype(str) + "-" + data["fiscal_period"].astype(str)
     ).astype("string")
@@ -449,3 +820,44 @@ def build_data_frame(
     data = data.set_index(index_columns)
     data = data.sort_index()
     return data
+
+
+def _build_data_frame_from_batches(
+    batches: Iterable[Sequence[Any]],
+    point_in_time: bool,
+    builder: Callable[[Any, bool], "pd.DataFrame"] = build_data_frame,
+) -> "pd.DataFrame":
+    """
+    Build a frame for each batch so only one batch of points is in memory at a time
+    """
+    return _concat_data_frames([builder(batch, point_in_time) for batch in batches])
+
+
+def _concat_data_frames(frames: Sequence["pd.DataFrame"]) -> "pd.DataFrame":
+    """
+    Put frames made by `build_data_frame` together, keeping the column order and index
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    data = pd.concat(frames)
+    columns = list(frames[0].columns)
+    columns = columns + [c for c in data.columns if c not in columns]
+    data = data[columns]
+    if isinstance(
+        frames[0].index.get_level_values("fiscal_period").dtype, pd.CategoricalDtype
+    ):
+        # concatenating categoricals with different categories makes strings
+        data = _categorical_fiscal_period(data)
+    return data.sort_index()
+
+
+def _batched(items: Iterable[T], batch_size: int) -> Generator[List[T], None, None]:
+    batch: List[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
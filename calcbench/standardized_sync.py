@@ -0,0 +1,279 @@
+"""
+Keep a local copy of point-in-time standardized data up to date.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Union
+
+from calcbench.api_client import logger
+from calcbench.api_query_params import CompanyIdentifiers
+from calcbench.standardized_numeric import standardized
+
+try:
+    from typing import Literal
+except ImportError:
+    from typing_extensions import Literal
+
+try:
+    import pandas as pd
+except ImportError:
+    "Can't find pandas, won't be able to use the functions that return DataFrames."
+    pass
+
+STATE_FILE_NAME = "_sync_state.json"
+KEY_INDEX_FILE_NAME = "_key_index.parquet"
+KEY_COLUMN = "standardized_id"
+# identify points without a standardized_id within a partition
+POINT_KEY_COLUMNS = ["metric", "fiscal_period", "date_reported"]
+NULL_SENTINEL = "<null>"
+PARTITION_COLUMN = "ticker"
+
+
+def sync_standardized_point_in_time(
+    root_path: Union[str, Path],
+    company_identifiers: CompanyIdentifiers = [],
+    metrics: Sequence[str] = [],
+    engine: Literal["pydantic", "columnar"] = "columnar",
+    companies_per_shard: Optional[int] = None,
+    max_workers: int = 1,
+) -> "pd.DataFrame":
+    """Incrementally update a local Parquet copy of point-in-time standardized data.
+
+    The first call downloads all history.  Subsequent calls only download points written, modified or confirmed by XBRL since the latest `date_modified`/`date_XBRL_confirmed` seen so far, and upsert them into the dataset by `standardized_id`.  If data could not be retrieved for some companies, see `companies_per_shard`, the high-water mark is not moved so the next sync gets the modifications again.
+
+    The dataset is partitioned by ticker, read it with :func:`read_standardized_point_in_time` or `pd.read_parquet(root_path)`.
+
+    Requires the pyarrow package. ``pip install calcbench-api-client[pyarrow]``
+
+    :param root_path: folder holding the dataset and the sync state
+    :param company_identifiers: Tickers/CIK codes, if not specified sync all companies.  Must be the same every time the dataset is synced.
+    :param metrics: Standardized metrics, if not specified sync all metrics.  Must be the same every time the dataset is synced.
+    :param engine: how to build the DataFrame, see :func:`calcbench.standardized`
+    :param companies_per_shard: split requests into requests for this many companies, see :func:`calcbench.standardized`
+    :param max_workers: number of shards requested concurrently
+    :return: the points that were downloaded in this sync
+
+    Usage::
+
+      >>> # run daily
+      >>> changes = calcbench.sync_standardized_point_in_time(
+      >>>     "~/standardized_PIT", company_identifiers=calcbench.tickers(index="SP500")
+      >>> )
+      >>> data = calcbench.read_standardized_point_in_time("~/standardized_PIT")
+
+    """
+    root_path = Path(os.path.expanduser(root_path))
+    company_identifiers = sorted(str(c) for c in company_identifiers)
+    metrics = sorted(metrics)
+    state = _read_state(root_path)
+    if state and (
+        state["company_identifiers"] != company_identifiers
+        or state["metrics"] != metrics
+    ):
+        raise ValueError(
+            f"{root_path} was synced with different company_identifiers or metrics, use a different root_path"
+        )
+    high_water_mark = (
+        datetime.fromisoformat(state["high_water_mark"])
+        if state and state["high_water_mark"]
+        else None
+    )
+    if high_water_mark:
+        logger.info(f"getting modifications since {high_water_mark}")
+    data = standardized(
+        company_identifiers=company_identifiers,
+        metrics=metrics,
+        point_in_time=True,
+        start_date=high_water_mark,
+        all_modifications=bool(high_water_mark),
+        engine=engine,
+        companies_per_shard=companies_per_shard,
+        max_workers=max_workers,
+    )
+    failed_company_identifiers = data.attrs.get("failed_company_identifiers")
+    if not data.empty:
+        _upsert(root_path, data.reset_index())
+    if failed_company_identifiers:
+        # The next sync gets the history of these companies again
+        logger.warning(
+            f"not updating the high-water mark, could not get data for {failed_company_identifiers}"
+        )
+    elif not data.empty:
+        high_water_mark = max(
+            filter(
+                None,
+                [
+                    high_water_mark,
+                    _column_max(data, "date_modified"),
+                    _column_max(data, "date_XBRL_confirmed"),
+                ],
+            ),
+            default=None,
+        )
+    _write_state(
+        root_path,
+        {
+            "high_water_mark": high_water_mark and high_water_mark.isoformat(),
+            "company_identifiers": company_identifiers,
+            "metrics": metrics,
+            "last_sync": datetime.now().isoformat(),
+        },
+    )
+    return data
+
+
+def read_standardized_point_in_time(root_path: Union[str, Path]) -> "pd.DataFrame":
+    """
+    Read a dataset written by :func:`sync_standardized_point_in_time`
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    root_path = Path(os.path.expanduser(root_path))
+    if not any(root_path.glob(f"{PARTITION_COLUMN}=*")):
+        return pd.DataFrame()
+    dataset = ds.dataset(root_path, format="parquet", partitioning="hive")
+    # Columns that were all null in one partition are typed differently
+    schema = pa.unify_schemas(
+        [fragment.physical_schema for fragment in dataset.get_fragments()]
+        + [pa.schema([(PARTITION_COLUMN, pa.string())])],
+        promote_options="permissive",
+    )
+    dataset = ds.dataset(
+        root_path, format="parquet", partitioning="hive", schema=schema
+    )
+    return dataset.to_table().to_pandas()
+
+
+def _upsert(root_path: Path, data: "pd.DataFrame"):
+    """
+    Replace points with the same standardized_id, partition by partition.  Points without a standardized_id replace points with the same metric, fiscal_period and date_reported.
+
+    Points that moved to another partition, because the company changed ticker, are removed from the partition they were in, which is looked up in the key index so the other partitions are not read.
+    """
+    key_index = _read_key_index(root_path)
+    new_keys = (
+        data[data[KEY_COLUMN].notna()]
+        .drop_duplicates(subset=KEY_COLUMN, keep="last")[[KEY_COLUMN, PARTITION_COLUMN]]
+        .astype({PARTITION_COLUMN: "string"})
+    )
+    previous = key_index.merge(new_keys, on=KEY_COLUMN, suffixes=("", "_new"))
+    moved = previous[previous[PARTITION_COLUMN] != previous[f"{PARTITION_COLUMN}_new"]]
+    for partition, moved_keys in moved.groupby(PARTITION_COLUMN):
+        file_path = root_path / f"{PARTITION_COLUMN}={partition}" / "data.parquet"
+        if file_path.exists():
+            existing = pd.read_parquet(file_path, engine="pyarrow")
+            _write_partition(
+                file_path, existing[~existing[KEY_COLUMN].isin(moved_keys[KEY_COLUMN])]
+            )
+    for partition, changes in data.groupby(PARTITION_COLUMN, observed=True):
+        partition_path = root_path / f"{PARTITION_COLUMN}={partition}"
+        partition_path.mkdir(parents=True, exist_ok=True)
+        file_path = partition_path / "data.parquet"
+        changes = changes.drop(columns=[PARTITION_COLUMN])
+        if file_path.exists():
+            existing = pd.read_parquet(file_path, engine="pyarrow")
+            combined = pd.concat([existing, changes], ignore_index=True)
+            combined = combined[~_point_keys(combined).duplicated(keep="last")]
+        else:
+            combined = changes
+        _write_partition(file_path, combined)
+    _write_key_index(
+        root_path,
+        pd.concat(
+            [key_index[~key_index[KEY_COLUMN].isin(new_keys[KEY_COLUMN])], new_keys],
+            ignore_index=True,
+        ),
+    )
+
+
+def _point_keys(data: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    standardized_id, or the metric, fiscal_period and date_reported for points without one.
+
+    Nulls are filled with a sentinel, they do not compare equal.
+    """
+    keys = data[[c for c in POINT_KEY_COLUMNS if c in data.columns]].astype("string")
+    # the key is float in frames with missing keys
+    keys[KEY_COLUMN] = pd.to_numeric(data[KEY_COLUMN]).astype("Int64").astype("string")
+    has_key = keys[KEY_COLUMN].notna()
+    keys.loc[has_key, keys.columns.drop(KEY_COLUMN)] = None
+    return keys.fillna(NULL_SENTINEL)
+
+
+def _read_key_index(root_path: Path) -> "pd.DataFrame":
+    """
+    The partition of each standardized_id, built from the partitions for datasets synced before there was an index.
+    """
+    index_path = root_path / KEY_INDEX_FILE_NAME
+    if index_path.exists():
+        return pd.read_parquet(index_path, engine="pyarrow")
+    frames = [
+        pd.read_parquet(file_path, engine="pyarrow", columns=[KEY_COLUMN])
+        .dropna()
+        .assign(**{PARTITION_COLUMN: file_path.parent.name.split("=", 1)[1]})
+        for file_path in root_path.glob(f"{PARTITION_COLUMN}=*/data.parquet")
+    ]
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    KEY_COLUMN: pd.Series(dtype="Int64"),
+                    PARTITION_COLUMN: pd.Series(dtype="string"),
+                }
+            )
+        ]
+        + frames,
+        ignore_index=True,
+    ).astype({PARTITION_COLUMN: "string"})
+
+
+def _write_key_index(root_path: Path, key_index: "pd.DataFrame"):
+    temporary_path = root_path / f"{KEY_INDEX_FILE_NAME}.tmp"
+    key_index.to_parquet(temporary_path, engine="pyarrow", index=False)
+    os.replace(temporary_path, root_path / KEY_INDEX_FILE_NAME)
+
+
+def _write_partition(file_path: Path, data: "pd.DataFrame"):
+    if data.empty:
+        os.remove(file_path)
+        file_path.parent.rmdir()
+        return
+    if "fiscal_period" in data.columns:
+        # the categories differ between syncs, files with different dictionaries can not be read as one dataset
+        data = data.astype({"fiscal_period": "string"})
+    temporary_path = file_path.parent / ".data.parquet.tmp"
+    data.to_parquet(
+        temporary_path,
+        engine="pyarrow",
+        index=False,
+        coerce_timestamps="us",
+        allow_truncated_timestamps=True,
+    )
+    os.replace(temporary_path, file_path)
+
+
+def _column_max(data: "pd.DataFrame", column: str) -> Optional[datetime]:
+    if column not in data.columns:
+        return None
+    value = pd.to_datetime(data[column]).max()
+    return None if pd.isna(value) else value.to_pydatetime()
+
+
+def _read_state(root_path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(root_path / STATE_FILE_NAME) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_state(root_path: Path, state: Dict[str, Any]):
+    root_path.mkdir(parents=True, exist_ok=True)
+    temporary_path = root_path / f"{STATE_FILE_NAME}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temporary_path, root_path / STATE_FILE_NAME)
@@ -32,11 +32,13 @@ setup(
     extras_require={
         "Pandas": ["Pandas>=1.0.0"],
         "Listener": ["azure-servicebus==7.2.0", "pytz"],
-        "Backoff": ["backoff"],
         "BeautifulSoup": ["beautifulsoup4"],
+        "lxml": ["lxml"],
         "tqdm": ["tqdm"],
         "Keyring": ["keyring"],
         "pyarrow": ["pyarrow"],
+        "aiohttp": ["aiohttp"],
+        "Brotli": ["brotli"],
     },
     url="https://github.com/calcbench/python_api_client",
     project_urls={
@@ -0,0 +1,78 @@
+"""
+Fakes shared by the tests.
+"""
+
+import random
+import threading
+import time
+
+from calcbench.models.disclosure_search_results import DisclosureSearchResults
+
+
+class FakeEndPoint:
+    """
+    Stands in for a function that makes requests, eg. `_json_POST`.
+
+    Records the calls from any thread, raises `errors` in turn, then answers with :meth:`respond`.
+    """
+
+    def __init__(self, *errors: Exception, delay: float = 0):
+        """
+        :param delay: answer after a random wait of up to this many seconds, so calls from threads interleave
+        """
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.payloads = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, end_point=None, payload=None, parse=None):
+        with self.lock:
+            self.calls += 1
+            self.payloads.append(payload)
+            self.threads.add(threading.get_ident())
+            error = self.errors.pop(0) if self.errors else None
+        if self.delay:
+            time.sleep(random.uniform(0, self.delay))
+        if error is not None:
+            raise error
+        return self.respond(payload, parse)
+
+    def respond(self, payload, parse):
+        return "ok"
+
+
+def disclosure(fact_id) -> DisclosureSearchResults:
+    return DisclosureSearchResults(
+        fact_id=fact_id,
+        entity_name="Company",
+        accession_id=1,
+        footnote_type=None,
+        SEC_URL=None,
+        sec_filing_id=None,
+        blob_id=None,
+        fiscal_year=2020,
+        fiscal_period="Y",
+        calendar_year=2020,
+        calendar_period="Y",
+        filing_date="2021-02-01",
+        received_date="2021-02-01",
+        document_type=None,
+        guide_link=None,
+        page_url=None,
+        entity_id=1,
+        id_detail=False,
+        local_name=None,
+        CIK=None,
+        sec_accession_number=None,
+        network_id=None,
+        ticker="T",
+        filing_type=1,
+        description="Risk Factors",
+        disclosure_type_name="RiskFactors",
+        period_end_date=None,
+        footnote_type_title=None,
+        date_reported=None,
+        name="RiskFactors",
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+import requests
+
+from calcbench import aio
+from calcbench.api_client import (
+    _SESSION_STUFF,
+    enable_backoff,
+    enable_response_cache,
+    set_rate_limit,
+)
+from calcbench.instrumentation import add_request_listener, remove_request_listener
+from calcbench.models.dimensional import DimensionalDataPoint
+from calcbench.models.disclosure_search_results import DisclosureSearchResults
+from calcbench.models.filing import Filing
+from calcbench.models.standardized import StandardizedPoint
+from calcbench.retry import RetryPolicy
+
+from fakes import disclosure
+
+PAGE_SIZE = 2
+
+POINT = {
+    "ticker": "MSFT",
+    "metric": "revenue",
+    "fiscal_year": 2020,
+    "fiscal_period": "Y",
+    "calendar_year": 2020,
+    "calendar_period": "Y",
+    "preliminary": False,
+    "CIK": "0000789019",
+    "value": 1.0,
+}
+
+DISCLOSURE = disclosure(1).model_dump(mode="json")
+
+
+class FakeCalcbench:
+    """
+    Answers the end-points used by the async functions, the first `failures` requests to the API fail with `failure_status`.
+    """
+
+    def __init__(self, failures: int = 0, failure_status: int = 503):
+        self.failures = failures
+        self.failure_status = failure_status
+        self.logins = 0
+        self.requests = []
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers["content-length"]))
+                if self.path == "/account/LogOnAjax":
+                    with fake.lock:
+                        fake.logins += 1
+                    return self._send(b"true", cookie="auth=1")
+                end_point = self.path.split("/")[-1]
+                with fake.lock:
+                    fake.requests.append((end_point, dict(self.headers)))
+                    failed = fake.failures > 0
+                    fake.failures -= failed
+                if failed:
+                    return self._send(b"", status=fake.failure_status)
+                response = fake.response(end_point, json.loads(payload))
+                self._send(json.dumps(response).encode())
+
+            def _send(self, body, status=200, cookie=None):
+                self.send_response(status)
+                if cookie:
+                    self.send_header("Set-Cookie", cookie)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    def response(self, end_point, payload):
+        if end_point == "mappedData":
+            return [POINT] * 3
+        if end_point == "dimensionalData":
+            return [{**POINT, "container": "c", "dimensions": {}, "label": "Cloud"}] * 2
+        if end_point == "filingsV2":
+            return [{"standardized_XBRL": True, "filing_id": 1}]
+        if end_point == "rawXBRLData":
+            return [{"fact_id": 1, "dimension_string": "Axis:Member"}]
+        if end_point == "footnoteSearch":
+            start = payload["pageParameters"].get("startOffset") or 0
+            end = start + PAGE_SIZE
+            return {
+                "footnotes": [DISCLOSURE] * len(range(start, min(end, 5))),
+                "moreResults": end < 5,
+                "nextGroupStartOffset": end,
+            }
+        raise ValueError(end_point)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        port = self.server.server_address[1]
+        _SESSION_STUFF["api_url_base"] = f"http://127.0.0.1:{port}/api/{{0}}"
+        _SESSION_STUFF["logon_url"] = f"http://127.0.0.1:{port}/account/LogOnAjax"
+        _SESSION_STUFF["domain"] = f"http://127.0.0.1:{port}/{{0}}"
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run(coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await aio.close()
+
+    return asyncio.run(run_and_close())
+
+
+class AsyncTest(TestCase):
+    def setUp(self):
+        self.original = dict(_SESSION_STUFF)
+        _SESSION_STUFF["calcbench_user_name"] = "user@calcbench.com"
+        _SESSION_STUFF["calcbench_password"] = "password"
+        _SESSION_STUFF["response_cache"] = None
+        _SESSION_STUFF["enable_backoff"] = False
+        self.events = []
+        add_request_listener(self.events.append)
+
+    def tearDown(self):
+        remove_request_listener(self.events.append)
+        _SESSION_STUFF.update(self.original)  # type: ignore
+        aio.set_max_concurrency(10)
+
+    def test_standardized_raw(self):
+        with FakeCalcbench():
+            points = run(
+                aio.standardized_raw(
+                    company_identifiers=["msft"], metrics=["revenue"], all_history=True
+                )
+            )
+        self.assertEqual(len(points), 3)
+        self.assertIsInstance(points[0], StandardizedPoint)
+        (event,) = self.events
+        self.assertEqual((event.end_point, event.status), ("mappedData", 200))
+
+    def test_dimensional_raw(self):
+        with FakeCalcbench():
+            points = run(
+                aio.dimensional_raw(company_identifiers=["msft"], metrics=["revenue"])
+            )
+        self.assertEqual(len(points), 2)
+        self.assertIsInstance(points[0], DimensionalDataPoint)
+
+    def test_filings(self):
+        with FakeCalcbench():
+            filings = run(aio.filings(company_identifiers=["msft"]))
+        self.assertIsInstance(filings[0], Filing)
+
+    def test_raw_xbrl_raw(self):
+        with FakeCalcbench():
+            facts = run(aio.raw_xbrl_raw(company_identifiers=["msft"]))
+        self.assertEqual(facts[0]["dimensions"], {"Axis": "Member"})
+
+    def test_disclosure_search_pages(self):
+        async def search():
+            return [
+                d
+                async for d in aio.disclosure_search(
+                    company_identifiers=["msft"],
+                    disclosure_names=["RiskFactors"],
+                    all_history=True,
+                )
+            ]
+
+        with FakeCalcbench() as fake:
+            disclosures = run(search())
+        self.assertEqual(len(disclosures), 5)
+        self.assertIsInstance(disclosures[0], DisclosureSearchResults)
+        self.assertEqual(len(fake.requests), 3)
+
+    def test_failed_requests_are_retried(self):
+        enable_backoff(policy=RetryPolicy(base_delay=0), circuit_breaker=None)
+        with FakeCalcbench(failures=2) as fake:
+            filings = run(aio.filings(company_identifiers=["msft"]))
+        self.assertEqual(len(filings), 1)
+        self.assertEqual(len(fake.requests), 3)
+        self.assertEqual([e.attempt for e in self.events], [1, 2, 3])
+        self.assertEqual([e.status for e in self.events], [503, 503, 200])
+
+    def test_http_errors_are_requests_errors(self):
+        with FakeCalcbench(failures=1, failure_status=404):
+            with self.assertRaises(requests.HTTPError) as context:
+                run(aio.filings(company_identifiers=["msft"]))
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def test_response_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            enable_response_cache(cache_dir=cache_dir)
+            with FakeCalcbench() as fake:
+                first = run(aio.filings(company_identifiers=["msft"]))
+                second = run(aio.filings(company_identifiers=["msft"]))
+        self.assertEqual(first, second)
+        self.assertEqual(len(fake.requests), 1)
+        self.assertEqual([e.from_cache for e in self.events], [False, True])
+
+    def test_rate_limit(self):
+        set_rate_limit(max_in_flight=1)
+
+        async def many():
+            return await asyncio.gather(
+                *[aio.filings(company_identifiers=[str(i)]) for i in range(5)]
+            )
+
+        with FakeCalcbench() as fake:
+            run(many())
+        self.assertEqual(len(fake.requests), 5)
+        # every slot was given back
+        self.assertTrue(_SESSION_STUFF["rate_limiter"]._semaphore.acquire(False))
+
+    def test_set_max_concurrency_resizes_the_pool(self):
+        async def resize():
+            await aio.filings(company_identifiers=["msft"])
+            aio.set_max_concurrency(3)
+            await aio.filings(company_identifiers=["msft"])
+            return aio._STATE.session.connector.limit
+
+        with FakeCalcbench() as fake:
+            limit = run(resize())
+        self.assertEqual(limit, 3)
+        self.assertEqual(fake.logins, 1)
+        self.assertEqual(len(fake.requests), 2)
@@ -0,0 +1,185 @@
+import gzip
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from calcbench import api_client
+from calcbench.api_client import (
+    _SESSION_STUFF,
+    _calcbench_session,
+    _check_pool_size,
+    _iterate_json_array,
+    enable_request_compression,
+    set_concurrency,
+)
+from calcbench.instrumentation import add_request_listener, remove_request_listener
+
+
+class SessionTest(TestCase):
+    def setUp(self):
+        self.original = dict(_SESSION_STUFF)
+        _SESSION_STUFF["session"] = None
+
+    def tearDown(self):
+        _SESSION_STUFF.update(self.original)  # type: ignore
+
+    def _fake_login(self):
+        session = api_client._new_session()
+        session.cookies.set("auth", "cookie")
+        return session
+
+    def test_login_once(self):
+        """
+        Many threads asking for a session should only log in once
+        """
+        with patch.object(
+            api_client, "_logged_in_session", side_effect=self._fake_login
+        ) as login:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                sessions = list(executor.map(lambda _: _calcbench_session(), range(64)))
+        self.assertEqual(login.call_count, 1)
+        self.assertEqual(len(set(id(s) for s in sessions)), 1)
+
+    def test_session_per_thread(self):
+        set_concurrency(32, session_per_thread=True)
+        with patch.object(
+            api_client, "_logged_in_session", side_effect=self._fake_login
+        ) as login:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                sessions = list(executor.map(lambda _: _calcbench_session(), range(4)))
+        self.assertEqual(login.call_count, 1)
+        for session in sessions:
+            self.assertEqual(session.cookies.get("auth"), "cookie")
+            adapter = session.get_adapter("https://www.calcbench.com")
+            self.assertEqual(adapter._pool_maxsize, 32)  # type: ignore
+
+    def test_set_concurrency_closes_replaced_adapters(self):
+        session = self._fake_login()
+        _SESSION_STUFF["session"] = session
+        old_adapter = session.get_adapter("https://www.calcbench.com")
+        with patch.object(old_adapter, "close") as close:
+            set_concurrency(32)
+        close.assert_called_once()
+        self.assertIsNot(session.get_adapter("https://www.calcbench.com"), old_adapter)
+
+    def test_thread_session_follows_shared_session(self):
+        """
+        A new shared session should get new thread sessions, even if it is allocated at the address of the old one
+        """
+        set_concurrency(4, session_per_thread=True)
+        _SESSION_STUFF["session"] = self._fake_login()
+        first = _calcbench_session()
+        self.assertIs(_calcbench_session(), first)
+        _SESSION_STUFF["session"] = self._fake_login()
+        self.assertIsNot(_calcbench_session(), first)
+
+    def test_check_pool_size(self):
+        """
+        Functions with max_workers should warn instead of resizing the pool
+        """
+        set_concurrency(4)
+        with self.assertWarns(UserWarning):
+            _check_pool_size(8)
+        self.assertEqual(_SESSION_STUFF["pool_size"], 4)
+
+
+class IterateJSONArrayTest(TestCase):
+    def _chunks(self, text: str, size: int):
+        encoded = text.encode("utf-8")
+        return [encoded[i : i + size] for i in range(0, len(encoded), size)]
+
+    def test_chunk_boundaries(self):
+        """
+        Items should decode the same no matter where the chunks split, including inside multi-byte characters and numbers
+        """
+        items = [
+            {"ticker": "MSFT", "value": 12345.678, "label": "café ☃"},
+            123456,
+            "a, string ] with [ brackets",
+            None,
+            [1, 2, {"a": []}],
+        ]
+        text = (
+            " [ "
+            + " ,\n".join(json.dumps(i, ensure_ascii=False) for i in items)
+            + " ] "
+        )
+        for size in range(1, len(text) + 2):
+            self.assertEqual(
+                list(_iterate_json_array(self._chunks(text, size))), items, size
+            )
+
+    def test_empty(self):
+        for text in ["[]", "null", "", " [ ] "]:
+            self.assertEqual(list(_iterate_json_array(self._chunks(text, 1))), [])
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(_iterate_json_array(self._chunks('[{"a": 1}, {"a"', 3)))
+
+
+class CompressionTest(TestCase):
+    def setUp(self):
+        self.original = dict(_SESSION_STUFF)
+
+    def tearDown(self):
+        _SESSION_STUFF.update(self.original)  # type: ignore
+
+    def test_request_and_response_compression(self):
+        requests_received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["content-length"]))
+                requests_received.append((dict(self.headers), body))
+                response = gzip.compress(
+                    json.dumps([{"ticker": "MSFT"}] * 1000).encode()
+                )
+                self.send_response(200)
+                self.send_header("content-encoding", "gzip")
+                self.send_header("content-length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            _SESSION_STUFF["api_url_base"] = (
+                f"http://127.0.0.1:{server.server_address[1]}/api/{{0}}"
+            )
+            _SESSION_STUFF["session"] = api_client._new_session()
+            _SESSION_STUFF["response_cache"] = None
+            enable_request_compression(min_bytes=100)
+            events = []
+            add_request_listener(events.append)
+            try:
+                payload = {"companyIdentifiers": [f"T{i}" for i in range(1000)]}
+                result = api_client._json_POST("mappedData", payload)
+            finally:
+                remove_request_listener(events.append)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(len(result), 1000)
+        headers, body = requests_received[0]
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertIn("gzip", headers["Accept-Encoding"])
+        self.assertEqual(json.loads(gzip.decompress(body)), payload)
+        (event,) = events
+        self.assertEqual(event.wire_bytes_sent, len(body))
+        self.assertEqual(event.bytes_sent, len(gzip.decompress(body)))
+        self.assertGreater(event.compression_ratio, 10)
+
+    def test_small_requests_are_not_compressed(self):
+        enable_request_compression(min_bytes=100)
+        body, headers = api_client._request_body('{"a": 1}')
+        self.assertEqual(body, b'{"a": 1}')
+        self.assertNotIn("Content-Encoding", headers)
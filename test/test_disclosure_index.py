@@ -0,0 +1,50 @@
+import tempfile
+from unittest import TestCase
+
+from calcbench.disclosure_index import DisclosureIndex
+
+from fakes import disclosure
+
+DOCUMENTS = {
+    1: "Our supply chain depends on suppliers in China.  Tariffs may hurt margins.",
+    2: "Export controls restrict sales.  The chain of supply is long.",
+    3: "Tariffs, tariffs and more tariffs on our supply chain.",
+    4: "Goodwill impairment was recorded.",
+}
+
+
+class DisclosureIndexTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = DisclosureIndex(self.directory.name)
+        for fact_id, text in DOCUMENTS.items():
+            self.index.add(disclosure(fact_id), text)
+
+    def tearDown(self):
+        self.index.close()
+        self.directory.cleanup()
+
+    def search(self, query):
+        return [d.fact_id for d in self.index.search(query)]
+
+    def test_phrase(self):
+        self.assertEqual(sorted(self.search('"supply chain"')), [1, 3])
+        self.assertEqual(self.search('"chain supply"'), [])
+
+    def test_ranking(self):
+        self.assertEqual(self.search("tariffs supply"), [3, 1])
+
+    def test_boolean(self):
+        self.assertEqual(self.search('"supply chain" -china'), [3])
+        self.assertEqual(sorted(self.search('"export controls" OR goodwill')), [2, 4])
+        self.assertEqual(self.search("-tariffs"), [])
+
+    def test_replace_and_persist(self):
+        self.index.add(disclosure(4), "Tariffs on imports.")
+        self.assertEqual(self.search("goodwill"), [])
+        self.index.close()
+        self.index = DisclosureIndex(self.directory.name)
+        self.assertEqual(len(self.index), 4)
+        self.assertIn(disclosure(4), self.index)
+        results = self.index.search("imports")
+        self.assertEqual(results, [disclosure(4)])
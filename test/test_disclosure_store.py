@@ -0,0 +1,68 @@
+import tempfile
+from unittest import TestCase
+
+from calcbench.disclosure_store import DisclosureStore
+from calcbench.models.disclosure_content import DisclosureContent
+
+
+def content(blobs):
+    return DisclosureContent(
+        blobs=blobs,
+        entity_id=1,
+        entity_name="Company",
+        document_type=None,
+        sec_html_url="",
+        accession_id=10,
+        label="Risk Factors",
+        fact_id=20,
+        disclosure_type=1,
+        is_detail=False,
+        fiscal_period="Y",
+        fiscal_year=2020,
+        last_in_group=True,
+        networkID=30,
+    )
+
+
+class DisclosureStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = DisclosureStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        key = DisclosureStore.key(accession_id=10, fact_id=20, network_id=30)
+        self.assertIsNone(self.store.get(key))
+        self.assertNotIn(key, self.store)
+        original = content(["<p>one</p>", "<p>two</p>"])
+        self.store.put(key, original)
+        self.assertIn(key, self.store)
+        self.assertEqual(self.store.get(key), original)
+        standardized = DisclosureStore.key(10, 20, 30, standardize=True)
+        self.assertIsNone(self.store.get(standardized))
+
+    def test_blobs_are_stored_once(self):
+        self.store.put(DisclosureStore.key(10, 20, 30), content(["<p>same</p>"]))
+        self.store.put(DisclosureStore.key(11, 21, 31), content(["<p>same</p>"]))
+        blobs = list((self.store.store_dir / "blobs").glob("*/*"))
+        self.assertEqual(len(blobs), 1)
+
+    def test_open_contents(self):
+        key = DisclosureStore.key(10, 20, 30)
+        self.assertIsNone(self.store.open_contents(key))
+        original = content(["<p>one</p>", "<p>två</p>"])
+        self.store.put(key, original)
+        with self.store.open_contents(key) as contents:
+            self.assertEqual(contents[:], original.contents.encode("utf-8"))
+        self.store.clear()
+        self.assertIsNone(self.store.get(key))
+
+    def test_open_empty_contents(self):
+        key = DisclosureStore.key(10, 20, 30)
+        self.store.put(key, content([]))
+        self.assertEqual(self.store.open_contents(key), b"")
+        self.store.put(key, content(["<p>one</p>"]))
+        with self.store.open_contents(key) as contents:
+            self.assertEqual(contents[:], b"<p>one</p>")
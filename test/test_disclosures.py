@@ -0,0 +1,336 @@
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+import calcbench as cb
+from calcbench.models.disclosure_content import DisclosureContent
+from calcbench.models.period import Period
+from calcbench.disclosure_store import _ContentCache
+
+from fakes import FakeEndPoint, disclosure
+
+PAGE_SIZE = 3
+RESULTS_PER_COMPANY = 7
+
+
+class FakeFootnoteSearch(FakeEndPoint):
+    """
+    Pages through `RESULTS_PER_COMPANY` results per company.
+    """
+
+    def __init__(self, fail_on=None):
+        super().__init__(delay=0.005)
+        self.fail_on = fail_on
+
+    def respond(self, payload, parse):
+        companies = payload.companiesParameters.companyIdentifiers
+        if self.fail_on in companies:
+            raise ValueError(f"failed getting {self.fail_on}")
+        results = [
+            (company, i) for company in companies for i in range(RESULTS_PER_COMPANY)
+        ]
+        start = payload.pageParameters.startOffset or 0
+        end = start + PAGE_SIZE
+        return {
+            "footnotes": results[start:end],
+            "moreResults": end < len(results),
+            "nextGroupStartOffset": end,
+        }
+
+
+class ConcurrentDisclosureSearchTest(TestCase):
+    tickers = [f"T{i}" for i in range(95)]
+
+    def search(self, **kwargs):
+        return list(
+            cb.disclosure_search(
+                company_identifiers=self.tickers,
+                disclosure_names=["RiskFactors"],
+                all_history=True,
+                **kwargs,
+            )
+        )
+
+    def test_same_order_as_sequential(self):
+        search = FakeFootnoteSearch()
+        with patch("calcbench.disclosures._json_POST", search):
+            sequential = self.search()
+            concurrent = self.search(max_workers=4)
+        self.assertEqual(len(sequential), len(self.tickers) * RESULTS_PER_COMPANY)
+        self.assertEqual(concurrent, sequential)
+        self.assertGreater(len(search.threads), 1)
+
+    def test_error_is_raised_in_order(self):
+        search = FakeFootnoteSearch(fail_on="T65")
+        with patch("calcbench.disclosures._json_POST", search):
+            results = cb.disclosure_search(
+                company_identifiers=self.tickers,
+                disclosure_names=["RiskFactors"],
+                all_history=True,
+                max_workers=4,
+            )
+            received = []
+            with self.assertRaises(ValueError):
+                for result in results:
+                    received.append(result)
+        # the first two chunks of thirty companies
+        self.assertEqual(len(received), 60 * RESULTS_PER_COMPANY)
+
+    def test_stop_early(self):
+        with patch("calcbench.disclosures._json_POST", FakeFootnoteSearch()):
+            results = cb.disclosure_search(
+                company_identifiers=self.tickers,
+                disclosure_names=["RiskFactors"],
+                all_history=True,
+                max_workers=4,
+            )
+            next(results)
+            results.close()
+
+    def test_stop_early_does_not_wait_for_requests(self):
+        class SlowFootnoteSearch(FakeFootnoteSearch):
+            def respond(self, payload, parse):
+                if "T0" not in payload.companiesParameters.companyIdentifiers:
+                    time.sleep(2)
+                return super().respond(payload, parse)
+
+        with patch("calcbench.disclosures._json_POST", SlowFootnoteSearch()):
+            results = cb.disclosure_search(
+                company_identifiers=self.tickers,
+                disclosure_names=["RiskFactors"],
+                all_history=True,
+                max_workers=4,
+            )
+            next(results)
+            start = time.perf_counter()
+            results.close()
+            self.assertLess(time.perf_counter() - start, 1)
+
+    def test_finished_chunks_are_bounded(self):
+        """
+        Chunks that finish before they are consumed do not start more chunks
+        """
+
+        class OnePageFootnoteSearch(FakeFootnoteSearch):
+            def respond(self, payload, parse):
+                return {**super().respond(payload, parse), "moreResults": False}
+
+        search = OnePageFootnoteSearch()
+        with patch("calcbench.disclosures._json_POST", search):
+            results = cb.disclosure_search(
+                company_identifiers=self.tickers,
+                disclosure_names=["RiskFactors"],
+                all_history=True,
+                max_workers=2,
+            )
+            next(results)
+            time.sleep(0.2)
+            self.assertEqual(search.calls, 2)
+            self.assertEqual(len(list(results)), 4 * PAGE_SIZE - 1)
+        self.assertEqual(search.calls, 4)
+
+
+class FakeDisclosureContents(FakeEndPoint):
+    def __init__(self):
+        super().__init__(delay=0.005)
+
+    @property
+    def fact_ids(self):
+        return [payload.disclosure.fact_id for payload in self.payloads]
+
+    def respond(self, payload, parse):
+        fact_id = payload.disclosure.fact_id
+        return {
+            "blobs": [f"<p>{fact_id}</p>"],
+            "entity_id": 1,
+            "entity_name": "Company",
+            "document_type": None,
+            "sec_html_url": "",
+            "accession_id": 1,
+            "label": "Risk Factors",
+            "fact_id": fact_id,
+            "disclosure_type": 1,
+            "is_detail": False,
+            "fiscal_period": "Y",
+            "fiscal_year": 2020,
+            "last_in_group": True,
+            "networkID": 1,
+        }
+
+
+class DisclosureContentsTest(TestCase):
+    def setUp(self):
+        cb.enable_disclosure_contents_cache()
+
+    def tearDown(self):
+        cb.enable_disclosure_contents_cache(cache_on=False)
+
+    def test_ordered_and_cached(self):
+        fake = FakeDisclosureContents()
+        disclosures = [disclosure(fact_id) for fact_id in [5, 3, 8, 3, 1]]
+        with patch("calcbench.models.disclosure_search_results._json_POST", fake):
+            contents = cb.disclosure_contents(disclosures, max_workers=3)
+            self.assertEqual([content.fact_id for content in contents], [5, 3, 8, 3, 1])
+            self.assertEqual(sorted(fake.fact_ids), [1, 3, 5, 8])
+            self.assertEqual(disclosures[2].get_contents(), "<p>8</p>")
+        self.assertEqual(len(fake.fact_ids), 4)
+
+    def test_same_fact_id_in_other_filings(self):
+        fake = FakeDisclosureContents()
+
+        def contents(end_point, payload):
+            return {
+                **fake(end_point, payload),
+                "blobs": [f"<p>{payload.disclosure.accession_id}</p>"],
+            }
+
+        disclosures = [disclosure(1), disclosure(1)]
+        disclosures[1].accession_id = 2
+        with patch("calcbench.models.disclosure_search_results._json_POST", contents):
+            self.assertEqual(
+                [c.contents for c in cb.disclosure_contents(disclosures)],
+                ["<p>1</p>", "<p>2</p>"],
+            )
+            self.assertEqual(disclosures[1].get_contents(), "<p>2</p>")
+        self.assertEqual(len(fake.fact_ids), 2)
+
+    def test_cache_off(self):
+        cb.enable_disclosure_contents_cache(cache_on=False)
+        fake = FakeDisclosureContents()
+        with patch("calcbench.models.disclosure_search_results._json_POST", fake):
+            disclosure(1).get_contents()
+            disclosure(1).get_contents()
+        self.assertEqual(fake.fact_ids, [1, 1])
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = _ContentCache(max_bytes=20)
+        fake = FakeDisclosureContents()
+        contents = {
+            fact_id: DisclosureContent(
+                **fake("", SimpleNamespace(disclosure=disclosure(fact_id)))
+            )
+            for fact_id in [1, 2, 3]
+        }
+        cache.put((1, 1, None, False), contents[1])
+        cache.put((1, 2, None, False), contents[2])
+        cache.get((1, 1, None, False))
+        cache.put((1, 3, None, False), contents[3])
+        self.assertIsNone(cache.get((1, 2, None, False)))
+        self.assertIsNotNone(cache.get((1, 1, None, False)))
+        self.assertIsNotNone(cache.get((1, 3, None, False)))
+
+
+class DisclosureTextsTest(TestCase):
+    def setUp(self):
+        cb.clear_disclosure_contents_cache()
+        self.directory = tempfile.TemporaryDirectory()
+        cb.enable_disclosure_store(store_dir=self.directory.name)
+
+    def tearDown(self):
+        cb.enable_disclosure_store(store_on=False)
+        cb.clear_disclosure_contents_cache()
+        self.directory.cleanup()
+
+    def test_ordered_and_stored(self):
+        fake = FakeDisclosureContents()
+        disclosures = [disclosure(fact_id) for fact_id in range(10)]
+        with patch("calcbench.models.disclosure_search_results._json_POST", fake):
+            texts = list(
+                cb.disclosure_texts(
+                    disclosures, max_workers=2, parser="html.parser", chunk_size=3
+                )
+            )
+            self.assertEqual(texts, [(d, str(d.fact_id)) for d in disclosures])
+            cb.clear_disclosure_contents_cache()
+            self.assertEqual(disclosures[4].get_contents_text(), "4")
+            again = list(cb.disclosure_texts(disclosures, parser="html.parser"))
+        self.assertEqual(again, texts)
+        self.assertEqual(len(fake.fact_ids), 10)
+
+    def test_process_pool(self):
+        fake = FakeDisclosureContents()
+        disclosures = [disclosure(fact_id) for fact_id in range(10)]
+        with patch(
+            "calcbench.models.disclosure_search_results._json_POST", fake
+        ), patch("calcbench.disclosures._PROCESS_POOL_MIN_CHARACTERS", 0):
+            texts = list(
+                cb.disclosure_texts(
+                    disclosures, max_workers=2, parser="html.parser", chunk_size=3
+                )
+            )
+        self.assertEqual(texts, [(d, str(d.fact_id)) for d in disclosures])
+
+    def test_small_documents_in_process(self):
+        fake = FakeDisclosureContents()
+        disclosures = [disclosure(fact_id) for fact_id in range(10)]
+        with patch(
+            "calcbench.models.disclosure_search_results._json_POST", fake
+        ), patch("calcbench.disclosures.ProcessPoolExecutor") as executor:
+            texts = list(cb.disclosure_texts(disclosures, parser="html.parser"))
+            with patch("calcbench.disclosures._PROCESS_POOL_MIN_CHARACTERS", 0):
+                list(
+                    cb.disclosure_texts(
+                        [disclosure(fact_id) for fact_id in range(10, 20)],
+                        max_workers=1,
+                        parser="html.parser",
+                    )
+                )
+        executor.assert_not_called()
+        self.assertEqual(texts, [(d, str(d.fact_id)) for d in disclosures])
+
+
+class DisclosureDataFrameTest(TestCase):
+    def docs(self):
+        docs = []
+        for fact_id, ticker, name, year, period in [
+            (1, "B", "RiskFactors", 2020, Period.Annual),
+            (2, "A", "RiskFactors", 2020, Period.Q1),
+            (3, "A", "MDA", 2021, Period.Q2),
+            (4, "A", "MDA", 2021, Period.Q2),
+            (5, "C", "MDA", None, Period.Q2),
+        ]:
+            doc = disclosure(fact_id)
+            doc.ticker = ticker
+            doc.disclosure_type_name = name
+            doc.fiscal_year = year
+            doc.fiscal_period = period
+            docs.append(doc)
+        return docs
+
+    def dataframe(self, **kwargs):
+        with patch(
+            "calcbench.disclosures.disclosure_search", return_value=iter(self.docs())
+        ):
+            return cb.disclosure_dataframe(
+                company_identifiers=["A", "B", "C"],
+                disclosure_names=["RiskFactors", "MDA"],
+                **kwargs,
+            )
+
+    def test_wide(self):
+        data = self.dataframe(all_history=True)
+        self.assertEqual(
+            list(data.columns),
+            [("MDA", "A"), ("MDA", "B"), ("RiskFactors", "A"), ("RiskFactors", "B")],
+        )
+        self.assertEqual(list(data.index.astype(str)), ["2020Q1", "2020Q4", "2021Q2"])
+        self.assertEqual(data.loc["2021Q2", ("MDA", "A")].fact_id, 3)
+        self.assertEqual(data.loc["2020Q4", ("RiskFactors", "B")].fact_id, 1)
+
+    def test_annual(self):
+        data = self.dataframe(year=2020, period=0)
+        self.assertEqual(list(data.index.astype(str)), ["2020", "2021"])
+
+    def test_long(self):
+        data = self.dataframe(all_history=True, layout="long")
+        self.assertEqual(list(data["fact_id"]), [1, 2, 3])
+        self.assertEqual(
+            list(data.index.names), ["ticker", "disclosure_type_name", "period"]
+        )
+        self.assertEqual([doc.fact_id for doc in data["value"]], [1, 2, 3])
+
+    def test_unknown_layout(self):
+        with self.assertRaises(ValueError):
+            self.dataframe(all_history=True, layout="tall")
@@ -0,0 +1,170 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from calcbench.downloaders import (
+    ParquetDatasetWriter,
+    _iterate_concurrently,
+    iterate_and_save_parquet_concurrent,
+    iterate_to_dataframe_concurrent,
+)
+
+
+class ConcurrentDownloaderTest(TestCase):
+    def test_ordered_and_retries(self):
+        calls = {}
+
+        def f(n: int) -> pd.DataFrame:
+            calls[n] = calls.get(n, 0) + 1
+            if n == 3 and calls[n] == 1:
+                raise ValueError("flaky")
+            if n == 5:
+                raise ValueError("always fails")
+            return pd.DataFrame({"ticker": [f"T{n}"], "value": [n]})
+
+        data = iterate_to_dataframe_concurrent(
+            list(range(8)), f, max_workers=4, retries=1
+        )
+        self.assertEqual(list(data["value"]), [0, 1, 2, 4, 6, 7, 3])
+        self.assertEqual(data.attrs["failed_arguments"], [5])
+        self.assertEqual(calls[5], 2)
+
+    def test_bounded_submission(self):
+        """
+        Arguments are submitted as frames are consumed, not all at once
+        """
+        calls = []
+
+        def f(n: int) -> pd.DataFrame:
+            calls.append(n)
+            return pd.DataFrame({"value": [n]})
+
+        for ordered in (True, False):
+            calls.clear()
+            consumed = []
+            for argument, _ in _iterate_concurrently(
+                list(range(20)), f, max_workers=2, ordered=ordered, retries=0, failed=[]
+            ):
+                consumed.append(argument)
+                self.assertLessEqual(len(calls) - len(consumed), 4)
+            self.assertEqual(sorted(consumed), list(range(20)))
+            if ordered:
+                self.assertEqual(consumed, list(range(20)))
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root_path = os.path.join(directory, "dataset")
+            calls = []
+
+            def f(ticker: str) -> pd.DataFrame:
+                calls.append(ticker)
+                if ticker == "C":
+                    raise ValueError("fails")
+                return pd.DataFrame({"ticker": [ticker], "value": [1.0]})
+
+            failed = iterate_and_save_parquet_concurrent(
+                ["A", "B", "C"], f, root_path=root_path, retries=0
+            )
+            self.assertEqual(failed, ["C"])
+            calls.clear()
+            failed = iterate_and_save_parquet_concurrent(
+                ["A", "B", "C", "D"],
+                f,
+                root_path=root_path,
+                write_mode="a",
+                retries=0,
+            )
+            self.assertEqual(sorted(calls), ["C", "D"])
+            self.assertEqual(
+                sorted(pd.read_parquet(root_path)["ticker"].astype(str)),
+                ["A", "B", "D"],
+            )
+
+
+class ParquetDatasetWriterTest(TestCase):
+    def test_unified_schema_and_row_groups(self):
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as directory:
+            with ParquetDatasetWriter(
+                directory, buffer_size_bytes=1, row_group_size_bytes=2**20
+            ) as writer:
+                writer.write(
+                    pd.DataFrame(
+                        {"ticker": pd.Categorical(["B", "A"]), "value": [1, 2]}
+                    )
+                )
+                # new column, wider dictionary and a column that was all null
+                writer.write(
+                    pd.DataFrame(
+                        {
+                            "ticker": pd.Categorical([f"T{i}" for i in range(300)]),
+                            "value": range(300),
+                            "note": ["x"] * 300,
+                        }
+                    )
+                )
+                writer.write(pd.DataFrame({"ticker": ["C"], "note": [None]}))
+            files = sorted(os.listdir(directory))
+            self.assertEqual(
+                files, ["_common_metadata", "part-00000.parquet", "part-00001.parquet"]
+            )
+            schema = pq.read_schema(os.path.join(directory, "_common_metadata"))
+            data = ds.dataset(directory, schema=schema).to_table().to_pandas()
+            self.assertEqual(len(data), 303)
+            self.assertEqual(list(data["ticker"][:2].astype(str)), ["A", "B"])
+            self.assertTrue(data["note"].iloc[:2].isna().all())
+            self.assertTrue(pd.isna(data[data["ticker"] == "C"]["value"]).all())
+
+    def test_compact_checkpoints_finished_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root_path = os.path.join(directory, "dataset")
+            iterate_and_save_parquet_concurrent(
+                ["A", "B"],
+                lambda ticker: pd.DataFrame({"ticker": [ticker], "value": [1.0]}),
+                root_path=root_path,
+                compact=True,
+            )
+            self.assertEqual(
+                sorted(os.listdir(root_path)),
+                ["_common_metadata", "part-00000.parquet"],
+            )
+            with open(root_path + ".checkpoint") as f:
+                self.assertEqual(sorted(f.read().split()), ['"A"', '"B"'])
+
+    def test_resume_after_crash(self):
+        """
+        Tokens are committed when their file is finished, unfinished files are removed when writing resumes
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            committed = []
+            writer = ParquetDatasetWriter(
+                directory,
+                buffer_size_bytes=1,
+                max_rows_per_file=2,
+                on_commit=committed.extend,
+            )
+            for ticker in ["A", "B", "C"]:
+                writer.write(pd.DataFrame({"ticker": [ticker], "value": [1.0]}), ticker)
+            # the process dies, "C" is in a file without a footer
+            self.assertEqual(committed, ["A", "B"])
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                [".part-00001.parquet.tmp", "part-00000.parquet"],
+            )
+            # an unfinished file written without a temporary name
+            with open(os.path.join(directory, "part-00003.parquet"), "wb") as f:
+                f.write(b"PAR1")
+
+            with ParquetDatasetWriter(directory, on_commit=committed.extend) as writer:
+                writer.write(pd.DataFrame({"ticker": ["C"], "value": [1.0]}), "C")
+            self.assertEqual(committed, ["A", "B", "C"])
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                ["_common_metadata", "part-00000.parquet", "part-00001.parquet"],
+            )
+            data = pd.read_parquet(directory)
+            self.assertEqual(sorted(data["ticker"]), ["A", "B", "C"])
@@ -0,0 +1,96 @@
+import json
+import math
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from calcbench import api_client
+from calcbench.api_client import _SESSION_STUFF, _json_POST, _json_POST_stream
+from calcbench.instrumentation import (
+    RequestEvent,
+    RequestMetrics,
+    add_request_listener,
+    remove_request_listener,
+)
+
+
+def _response(status: int, body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.url = "https://www.calcbench.com/api/test"
+    return response
+
+
+class RequestEventTest(TestCase):
+    def setUp(self):
+        self.original = dict(_SESSION_STUFF)
+        _SESSION_STUFF["response_cache"] = None
+        self.events = []
+        add_request_listener(self.events.append)
+
+    def tearDown(self):
+        remove_request_listener(self.events.append)
+        _SESSION_STUFF.update(self.original)  # type: ignore
+
+    def _session(self, *responses: requests.Response):
+        session = MagicMock()
+        session.post.side_effect = list(responses)
+        return patch.object(api_client, "_calcbench_session", return_value=session)
+
+    def test_retried_request(self):
+        _SESSION_STUFF["enable_backoff"] = True
+        _SESSION_STUFF["backoff_giveup"] = lambda e: False
+        body = json.dumps([{"a": 1}, {"a": 2}]).encode()
+        with self._session(_response(500, b"oops"), _response(200, body)), patch(
+            "time.sleep"
+        ):
+            result = _json_POST(
+                "test", {"q": 1}, parse=lambda items: [i["a"] for i in items]
+            )
+        self.assertEqual(result, [1, 2])
+        failed, succeeded = self.events
+        self.assertEqual((failed.status, failed.attempt), (500, 1))
+        self.assertIsNotNone(failed.error)
+        self.assertEqual((succeeded.status, succeeded.attempt), (200, 2))
+        self.assertIsNone(succeeded.error)
+        self.assertEqual(succeeded.bytes_received, len(body))
+        self.assertEqual(succeeded.bytes_sent, len('{"q": 1}'))
+        self.assertGreater(succeeded.validation_time, 0)
+
+    def test_stream(self):
+        response = _response(200, b"")
+        response.raw = MagicMock()
+        response.iter_content = lambda chunk_size: iter([b'[{"a": 1},', b' {"a": 2}]'])
+        with self._session(response):
+            items = list(_json_POST_stream("test", {}, parse=lambda item: item["a"]))
+        self.assertEqual(items, [1, 2])
+        (event,) = self.events
+        self.assertEqual(event.bytes_received, 20)
+        self.assertGreater(event.decode_time, 0)
+
+
+class RequestMetricsTest(TestCase):
+    def test_summary(self):
+        metrics = RequestMetrics(buckets=[0.1, 1])
+        for network_time in [0.05, 0.5, 0.5, 5]:
+            metrics(
+                RequestEvent(
+                    end_point="mappedData",
+                    network_time=network_time,
+                    bytes_received=10,
+                )
+            )
+        metrics(RequestEvent(end_point="footnoteSearch", attempt=2, error="500"))
+        self.assertEqual(
+            metrics.histogram("mappedData", "network_time"),
+            {0.1: 1, 1: 2, math.inf: 1},
+        )
+        summary = metrics.summary()
+        self.assertEqual(summary.loc["mappedData", "requests"], 4)
+        self.assertEqual(summary.loc["mappedData", "bytes_received"], 40)
+        self.assertEqual(summary.loc["mappedData", "network_time_p50"], 1)
+        self.assertEqual(summary.loc["mappedData", "network_time_p99"], math.inf)
+        self.assertEqual(summary.loc["footnoteSearch", "errors"], 1)
+        self.assertEqual(summary.loc["footnoteSearch", "retries"], 1)
@@ -0,0 +1,79 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import calcbench as cb
+from calcbench.models.period import Period
+
+from fakes import FakeEndPoint
+
+
+def filing(ticker, year, period):
+    return {
+        "ticker": ticker,
+        "cik": f"cik_{ticker}",
+        "fiscal_year": year,
+        "fiscal_period": period,
+        "date_reported": "2021-02-01T16:05:00",
+        "facts": [
+            {
+                "fact_id": i,
+                "effective_value": i * 1.5,
+                "UOM": "USD",
+                "statement_type": "income" if i % 2 else "balance",
+                "fiscal_period": period,
+            }
+            for i in range(2)
+        ],
+    }
+
+
+class FakePressReleaseGroups(FakeEndPoint):
+    def respond(self, payload, parse):
+        period = payload.periodParameters
+        return [
+            filing(ticker, period.year, int(period.period))
+            for ticker in payload.companiesParameters.companyIdentifiers
+        ]
+
+
+class PressReleaseDataTest(TestCase):
+    def test_press_release_data(self):
+        with patch("calcbench.press_release._json_POST", FakePressReleaseGroups()):
+            data = cb.press_release_data(
+                company_identifiers=["msft", "goog"], year=2020, period=Period.Q1
+            )
+        self.assertEqual(len(data), 4)
+        self.assertEqual(list(data["ticker"]), ["msft", "msft", "goog", "goog"])
+        self.assertEqual(list(data["CIK"]), ["cik_msft"] * 2 + ["cik_goog"] * 2)
+        self.assertEqual(data["UOM"].dtype, "category")
+
+    def test_periods(self):
+        fake = FakePressReleaseGroups()
+        with patch("calcbench.press_release._json_POST", fake):
+            data = cb.press_release_data_periods(
+                company_identifiers=["msft", "goog", "ibm"],
+                start_year=2019,
+                end_year=2020,
+                periods=[Period.Q1, Period.Q2],
+                companies_per_request=2,
+                max_workers=3,
+            )
+        self.assertEqual(len(fake.payloads), 8)
+        self.assertEqual(len(data), 2 * 2 * 3 * 2)
+        self.assertEqual(list(data.index), list(range(len(data))))
+        self.assertEqual(
+            list(data.drop_duplicates(["ticker", "fiscal_period"])["ticker"])[:6],
+            ["msft", "goog", "ibm", "msft", "goog", "ibm"],
+        )
+        for column in ("UOM", "statement_type", "fiscal_period"):
+            self.assertEqual(data[column].dtype, "category")
+        self.assertEqual(
+            set(data["statement_type"].cat.categories), {"income", "balance"}
+        )
+
+    def test_periods_no_data(self):
+        with patch("calcbench.press_release._json_POST", return_value=[]):
+            data = cb.press_release_data_periods(
+                company_identifiers=["msft"], start_year=2020, end_year=2020
+            )
+        self.assertTrue(data.empty)
@@ -0,0 +1,79 @@
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from calcbench.rate_limit import RateLimiter
+
+
+class RateLimiterTest(TestCase):
+    def test_requests_per_second(self):
+        limiter = RateLimiter(requests_per_second=10, burst=2)
+        with patch("time.sleep") as sleep:
+            for _ in range(4):
+                limiter.acquire()()
+        waits = [args[0] for args, _ in sleep.call_args_list]
+        # the burst is free, then requests queue a tenth of a second apart
+        self.assertEqual(len(waits), 2)
+        self.assertAlmostEqual(waits[0], 0.1, delta=0.02)
+        self.assertAlmostEqual(waits[1], 0.2, delta=0.02)
+
+    def test_max_in_flight(self):
+        limiter = RateLimiter(max_in_flight=2)
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def request():
+            release = limiter.acquire()
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+            release()
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
+
+    def test_release_once(self):
+        limiter = RateLimiter(max_in_flight=1)
+        release = limiter.acquire()
+        release()
+        release()
+        limiter.acquire()()
+
+    def test_shared_token_bucket(self):
+        with tempfile.TemporaryDirectory() as shared_dir:
+            first = RateLimiter(requests_per_second=1, shared_dir=shared_dir)
+            second = RateLimiter(requests_per_second=1, shared_dir=shared_dir)
+            with patch("time.sleep") as sleep:
+                first.acquire()()
+                sleep.assert_not_called()
+                second.acquire()()
+            (wait,), _ = sleep.call_args
+            self.assertAlmostEqual(wait, 1, delta=0.1)
+
+    def test_shared_in_flight(self):
+        with tempfile.TemporaryDirectory() as shared_dir:
+            first = RateLimiter(max_in_flight=1, shared_dir=shared_dir)
+            second = RateLimiter(max_in_flight=1, shared_dir=shared_dir)
+            release = first.acquire()
+            acquired = threading.Event()
+
+            def acquire():
+                second.acquire()()
+                acquired.set()
+
+            thread = threading.Thread(target=acquire)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+            release()
+            self.assertTrue(acquired.wait(5))
+            thread.join()
@@ -0,0 +1,177 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+import calcbench as cb
+
+from fakes import FakeEndPoint
+
+
+def fact(ticker, year, i):
+    return {
+        "ticker": ticker,
+        "fiscal_year": year,
+        "value": i,
+        "dimension_string": "Segment:Americas" if i % 2 else None,
+        "filing_date": "2021-02-01",
+        "filing_end_date": "2020-12-31",
+        "period_end": "2020-12-31",
+        "period_start": "2020-01-01",
+        "period_instant": None,
+    }
+
+
+class FakeRawData(FakeEndPoint):
+    def respond(self, payload, parse):
+        years = [
+            clause["value"]
+            for clause in payload["pageParameters"]["clauses"]
+            if clause["parameter"] == "fiscalYear"
+        ]
+        for ticker in payload["companiesParameters"]["companyIdentifiers"]:
+            for year in years:
+                for i in range(3):
+                    yield parse(fact(ticker, year, i))
+
+
+class RawXBRLBatchesTest(TestCase):
+    tickers = ["A", "B", "C", "D", "E"]
+    period_slices = [
+        [{"value": year, "parameter": "fiscalYear", "operator": 1}]
+        for year in (2019, 2020)
+    ]
+
+    def test_chunks_and_slices(self):
+        fake = FakeRawData()
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", fake):
+            batches = list(
+                cb.raw_xbrl_raw_batches(
+                    company_identifiers=self.tickers,
+                    clauses=[
+                        {"value": "Revenues", "parameter": "XBRLtag", "operator": 1}
+                    ],
+                    batch_size=4,
+                    company_chunk_size=2,
+                    period_slices=self.period_slices,
+                )
+            )
+        self.assertEqual(len(fake.payloads), 6)
+        self.assertEqual(
+            [p["companiesParameters"]["companyIdentifiers"] for p in fake.payloads],
+            [["A", "B"], ["A", "B"], ["C", "D"], ["C", "D"], ["E"], ["E"]],
+        )
+        self.assertTrue(
+            all(len(p["pageParameters"]["clauses"]) == 2 for p in fake.payloads)
+        )
+        facts = [f for batch in batches for f in batch]
+        self.assertEqual(len(facts), 5 * 2 * 3)
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual(facts[1]["dimensions"], {"Segment": "Americas"})
+        self.assertEqual(facts[0]["dimensions"], {})
+        self.assertIsNot(facts[1]["dimensions"], facts[4]["dimensions"])
+
+    def test_entire_universe_can_not_be_chunked(self):
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", FakeRawData()):
+            with self.assertRaises(ValueError):
+                list(
+                    cb.raw_xbrl_raw_batches(entire_universe=True, company_chunk_size=2)
+                )
+
+    def test_data_frame(self):
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", FakeRawData()):
+            data = cb.raw_XBRL(
+                company_identifiers=self.tickers,
+                batch_size=7,
+                period_slices=self.period_slices,
+            )
+        self.assertEqual(len(data), 30)
+        self.assertEqual(list(data["value"]), [0, 1, 2] * 10)
+        self.assertEqual(list(data["ticker"][:7]), ["A"] * 3 + ["B"] * 3 + ["C"])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(data["filing_date"]))
+
+    def test_dimension_columns(self):
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", FakeRawData()):
+            data = cb.raw_XBRL(
+                company_identifiers=["A"],
+                batch_size=2,
+                period_slices=self.period_slices,
+                dimensions="columns",
+            )
+        self.assertNotIn("dimensions", data.columns)
+        self.assertEqual(data["Segment"].dtype, "category")
+        self.assertEqual(
+            list(data["Segment"].astype(object).fillna("")),
+            ["", "Americas", "", "", "Americas", ""],
+        )
+
+
+class DimensionStringTest(TestCase):
+    def test_parse(self):
+        from calcbench.raw_numeric_XBRL import _parse_dimension_string
+
+        self.assertEqual(_parse_dimension_string(None), {})
+        self.assertEqual(_parse_dimension_string(""), {})
+        self.assertEqual(
+            _parse_dimension_string("SegmentAxis:AmericasMember,ProductAxis:Cars"),
+            {"SegmentAxis": "AmericasMember", "ProductAxis": "Cars"},
+        )
+
+    def test_not_shared(self):
+        from calcbench.raw_numeric_XBRL import _parse_dimension_string
+
+        dimensions = _parse_dimension_string("SegmentAxis:AmericasMember")
+        dimensions["SegmentAxis"] = "EuropeMember"
+        _parse_dimension_string(None)["SegmentAxis"] = "EuropeMember"
+        self.assertEqual(
+            _parse_dimension_string("SegmentAxis:AmericasMember"),
+            {"SegmentAxis": "AmericasMember"},
+        )
+        self.assertEqual(_parse_dimension_string(None), {})
+
+
+class ColumnarRawXBRLTest(TestCase):
+    facts = [
+        {
+            "ticker": ticker,
+            "XBRL_tag": "Revenues",
+            "unit_of_measure": "USD",
+            "Value": i,
+            "fiscal_year": 2020,
+            "fiscal_period": "Y",
+            "dimension_string": None,
+            "filing_date": "2021-02-01T00:00:00",
+            "period_instant": None,
+        }
+        for i, ticker in enumerate(["A", "B", "A", "C"])
+    ]
+
+    def raw_XBRL(self, **kwargs):
+        def fake(end_point, payload, parse=None):
+            for fact in self.facts:
+                yield parse(dict(fact))
+
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", fake):
+            return cb.raw_XBRL(
+                company_identifiers=["A", "B", "C"],
+                batch_size=3,
+                engine="columnar",
+                **kwargs,
+            )
+
+    def test_types(self):
+        data = self.raw_XBRL()
+        self.assertNotIn("Value", data.columns)
+        self.assertEqual(data["value"].dtype, "float64")
+        self.assertEqual(list(data["value"]), [0.0, 1.0, 2.0, 3.0])
+        for column in ("ticker", "XBRL_tag", "unit_of_measure", "fiscal_period"):
+            self.assertEqual(data[column].dtype, "category", column)
+        self.assertEqual(list(data["ticker"]), ["A", "B", "A", "C"])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(data["filing_date"]))
+        self.assertTrue(data["period_instant"].isna().all())
+
+    def test_pyarrow(self):
+        data = self.raw_XBRL(dtype_backend="pyarrow")
+        self.assertIsInstance(data["value"].dtype, pd.ArrowDtype)
+        self.assertIsInstance(data["ticker"].dtype, pd.ArrowDtype)
+        self.assertEqual(list(data["ticker"]), ["A", "B", "A", "C"])
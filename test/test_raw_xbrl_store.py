@@ -0,0 +1,121 @@
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+
+from calcbench.raw_xbrl_store import RawXBRLStore
+
+
+def fact(fact_id, ticker, tag, year, value, dimension_string=None):
+    return {
+        "fact_id": fact_id,
+        "ticker": ticker,
+        "CIK": f"{ord(ticker):010}",
+        "XBRL_tag": tag,
+        "Value": value,
+        "unit_of_measure": "USD",
+        "dimension_string": dimension_string,
+        "fiscal_year": year,
+        "fiscal_period": "Y",
+        "filing_date": f"{(year or 2020) + 1}-02-15T00:00:00",
+        "period_instant": None,
+    }
+
+
+FACTS = [
+    fact(1, "A", "Revenues", 2019, 10.0),
+    fact(2, "A", "RevenueFromContractWithCustomer", 2020, 11.0, "SegmentAxis:US"),
+    fact(3, "B", "Revenues", 2020, 20.0),
+    fact(4, "B", "NetIncomeLoss", 2020, 2.0),
+    fact(5, "C", "Revenues", None, 30.0),
+]
+
+
+class RawXBRLStoreTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = RawXBRLStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sync(self, facts):
+        def fake(end_point, payload, parse=None):
+            for f in facts:
+                yield parse(dict(f))
+
+        with patch("calcbench.raw_numeric_XBRL._json_POST_stream", fake):
+            return self.store.sync(entire_universe=True, batch_size=2)
+
+    def test_empty(self):
+        self.assertTrue(self.store.query().empty)
+
+    def test_clauses(self):
+        self.assertEqual(self.sync(FACTS), 5)
+        data = self.store.query(
+            clauses=[
+                {"value": "revenue", "parameter": "XBRLtag", "operator": 10},
+                {"value": "2020", "parameter": "fiscalYear", "operator": 1},
+            ]
+        )
+        self.assertEqual(sorted(data["fact_id"]), [2, 3])
+        self.assertIn("Value", data.columns)
+        data = self.store.query(
+            clauses=[{"value": "Revenues", "parameter": "XBRLtag", "operator": 21}],
+            company_identifiers=["a", "b"],
+        )
+        self.assertEqual(sorted(data["fact_id"]), [2, 4])
+        data = self.store.query(
+            clauses=[{"value": "2021-02-15", "parameter": "filingDate", "operator": 1}]
+        )
+        self.assertEqual(sorted(data["fact_id"]), [2, 3, 4, 5])
+        self.assertEqual(len(self.store.query()), 5)
+        data = self.store.query(
+            clauses=[{"value": 2019, "parameter": "fiscalYear", "operator": 21}]
+        )
+        self.assertEqual(sorted(data["fact_id"]), [2, 3, 4])
+
+    def test_resync_and_shape(self):
+        self.sync(FACTS)
+        self.sync([fact(3, "B", "Revenues", 2020, 21.0)])
+        data = self.store.query(
+            company_identifiers=["B"], engine="columnar", dimensions="columns"
+        )
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data.set_index("fact_id").loc[3, "value"], 21.0)
+        self.assertEqual(data["ticker"].dtype, "category")
+        data = self.store.query(company_identifiers=["A"])
+        self.assertEqual(
+            data.set_index("fact_id")["dimensions"].to_dict(),
+            {1: {}, 2: {"SegmentAxis": "US"}},
+        )
+
+    def test_resynced_facts_replace_old_copies(self):
+        self.sync(FACTS)
+        self.sync(
+            [
+                fact(1, "A", "Revenues", 2020, 12.0),
+                fact(3, "B", "SalesRevenueNet", 2020, 21.0),
+            ]
+        )
+        self.assertTrue(
+            self.store.query(
+                clauses=[{"value": "2019", "parameter": "fiscalYear", "operator": 1}]
+            ).empty
+        )
+        data = self.store.query(
+            clauses=[{"value": "Revenues", "parameter": "XBRLtag", "operator": 1}]
+        )
+        self.assertEqual(sorted(data["fact_id"]), [1, 5])
+        self.assertEqual(data.set_index("fact_id").loc[1, "Value"], 12.0)
+        self.assertEqual(len(self.store.query()), 5)
+        self.sync([fact(6, "D", "Revenues", 2019, 1.0)])
+        self.assertEqual(len(self.store.query()), 6)
+
+    def test_unknown_parameter(self):
+        self.sync(FACTS)
+        with self.assertRaises(ValueError):
+            self.store.query(
+                clauses=[{"value": "x", "parameter": "nope", "operator": 1}]
+            )
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import TestCase
+
+from calcbench.api_client import _SESSION_STUFF, _cache_ttl, enable_response_cache
+from calcbench.response_cache import ResponseCache
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.directory.name, max_size_bytes=10_000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key_is_canonical(self):
+        self.assertEqual(
+            self.cache.key("POST", "mappedData", '{"a": 1, "b": [1, 2]}'),
+            self.cache.key("POST", "mappedData", '{"b":[1,2],"a":1}'),
+        )
+        self.assertNotEqual(
+            self.cache.key("POST", "mappedData", '{"a": 1}'),
+            self.cache.key("POST", "dimensionalData", '{"a": 1}'),
+        )
+
+    def test_key_includes_server_and_user(self):
+        keys = {
+            self.cache.key("POST", "mappedData", "{}", base_url=base_url, user=user)
+            for base_url in (
+                "https://www.calcbench.com/api/{0}",
+                "https://test/api/{0}",
+            )
+            for user in ("a@calcbench.com", "b@calcbench.com")
+        }
+        self.assertEqual(len(keys), 4)
+
+    def test_closed_date_ranges_expire(self):
+        original = dict(_SESSION_STUFF)
+        try:
+            enable_response_cache(
+                cache_dir=self.directory.name,
+                default_ttl=timedelta(hours=1),
+                closed_date_range_ttl=timedelta(days=2),
+            )
+            cache = _SESSION_STUFF["response_cache"]
+            closed = {"periodParameters": {"dateRange": {"endDate": "2020-01-01"}}}
+            self.assertEqual(_cache_ttl(cache, "mappedData", closed), timedelta(days=2))
+            self.assertEqual(_cache_ttl(cache, "mappedData", {}), timedelta(hours=1))
+        finally:
+            _SESSION_STUFF.update(original)  # type: ignore
+
+    def test_round_trip_and_ttl(self):
+        key = self.cache.key("POST", "mappedData", "{}")
+        self.assertIsNone(self.cache.get(key, ttl=None))
+        self.cache.put(key, b"[1, 2, 3]")
+        self.assertEqual(self.cache.get(key, ttl=timedelta(hours=1)), b"[1, 2, 3]")
+        path = self.cache._path(key)
+        an_hour_ago = time.time() - 3601
+        os.utime(path, (an_hour_ago, an_hour_ago))
+        self.assertIsNone(self.cache.get(key, ttl=timedelta(hours=1)))
+        self.assertFalse(path.exists())
+
+    def test_failed_write_is_not_cached(self):
+        key = self.cache.key("POST", "mappedData", "{}")
+        with self.assertRaises(RuntimeError):
+            with self.cache.writer(key) as writer:
+                writer.write(b"[1, ")
+                raise RuntimeError("connection dropped")
+        self.assertIsNone(self.cache.get(key, ttl=None))
+
+    def test_least_recently_used_evicted(self):
+        keys = [self.cache.key("POST", "mappedData", str(i)) for i in range(10)]
+        for i, key in enumerate(keys):
+            self.cache.put(key, os.urandom(2_000))  # random bytes do not compress
+            if i:
+                self.cache.get(keys[0], ttl=None)  # keep the first one fresh
+            time.sleep(0.01)
+        self.assertIsNotNone(self.cache.get(keys[0], ttl=None))
+        self.assertIsNone(self.cache.get(keys[1], ttl=None))
+        self.assertLessEqual(
+            sum(p.stat().st_size for p in self.cache._entries()), 10_000
+        )
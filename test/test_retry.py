@@ -0,0 +1,127 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import requests
+
+from calcbench import api_client
+from calcbench.api_client import _SESSION_STUFF, _add_backoff, enable_backoff
+from calcbench.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+    call_with_retries,
+)
+
+from fakes import FakeEndPoint
+
+
+def _http_error(status: int, headers: dict = {}) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return requests.HTTPError(response=response)
+
+
+@patch("time.sleep")
+class RetryTest(TestCase):
+    def test_retryable(self, sleep):
+        policy = RetryPolicy()
+        self.assertTrue(policy.retryable(_http_error(503)))
+        self.assertFalse(policy.retryable(_http_error(404)))
+        self.assertTrue(policy.retryable(requests.ReadTimeout()))
+        not_idempotent = RetryPolicy(idempotent=False)
+        self.assertFalse(not_idempotent.retryable(_http_error(500)))
+        self.assertFalse(not_idempotent.retryable(requests.ReadTimeout()))
+        self.assertTrue(not_idempotent.retryable(_http_error(429)))
+        self.assertTrue(not_idempotent.retryable(requests.ConnectTimeout()))
+
+    def test_retry_after(self, sleep):
+        f = FakeEndPoint(_http_error(429, {"Retry-After": "7"}))
+        result = call_with_retries(f, RetryPolicy(base_delay=0.01))
+        self.assertEqual(result, "ok")
+        self.assertEqual(f.calls, 2)
+        (delay,), _ = sleep.call_args
+        self.assertEqual(delay, 7)
+
+    def test_max_tries(self, sleep):
+        f = FakeEndPoint(*[_http_error(500)] * 10)
+        with self.assertRaises(requests.HTTPError):
+            call_with_retries(f, RetryPolicy(max_tries=3))
+        self.assertEqual(f.calls, 3)
+
+    def test_budget(self, sleep):
+        budget = RetryBudget(ratio=0, min_retries_per_second=0, max_tokens=2)
+        f = FakeEndPoint(*[_http_error(500)] * 10)
+        with self.assertRaises(requests.HTTPError):
+            call_with_retries(f, RetryPolicy(), budget=budget)
+        self.assertEqual(f.calls, 3)
+
+    def test_circuit_breaker(self, sleep):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        f = FakeEndPoint(*[_http_error(500)] * 2)
+        with self.assertRaises(requests.HTTPError):
+            call_with_retries(f, RetryPolicy(max_tries=2), circuit_breaker=breaker)
+        self.assertTrue(breaker.is_open)
+        with self.assertRaises(CircuitOpenError):
+            call_with_retries(f, RetryPolicy(), circuit_breaker=breaker)
+        with patch("time.monotonic", return_value=10**9):
+            # after the reset timeout one request is let through
+            self.assertEqual(
+                call_with_retries(f, RetryPolicy(), circuit_breaker=breaker), "ok"
+            )
+        self.assertFalse(breaker.is_open)
+
+    def test_circuit_breaker_probe_raises(self, sleep):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        with self.assertRaises(requests.HTTPError):
+            call_with_retries(
+                FakeEndPoint(_http_error(500)),
+                RetryPolicy(max_tries=1),
+                circuit_breaker=breaker,
+            )
+        with patch("time.monotonic", return_value=10**9):
+            with self.assertRaises(KeyError):
+                call_with_retries(
+                    FakeEndPoint(KeyError()), RetryPolicy(), circuit_breaker=breaker
+                )
+            # the next request is let through
+            self.assertEqual(
+                call_with_retries(
+                    FakeEndPoint(), RetryPolicy(), circuit_breaker=breaker
+                ),
+                "ok",
+            )
+        self.assertFalse(breaker.is_open)
+
+    def test_invalid_json_retried(self, sleep):
+        calls = []
+
+        def get():
+            calls.append(1)
+            return api_client._decode(
+                b'[{"a": 1', api_client.RequestEvent(end_point="e"), parse=None
+            )
+
+        with self.assertRaises(requests.exceptions.JSONDecodeError):
+            call_with_retries(get, RetryPolicy(max_tries=3))
+        self.assertEqual(len(calls), 3)
+
+    def test_end_point_policies(self, sleep):
+        original = dict(_SESSION_STUFF)
+        try:
+            enable_backoff(
+                giveup=lambda e: False,
+                end_point_policies={"footnoteSearch": RetryPolicy(max_tries=2)},
+            )
+            f = FakeEndPoint(*[_http_error(500)] * 10)
+            get = _add_backoff(lambda end_point: f())
+            with self.assertRaises(requests.HTTPError):
+                get("footnoteSearch")
+            self.assertEqual(f.calls, 2)
+            f.calls = 0
+            with self.assertRaises(requests.HTTPError):
+                get(end_point="mappedData")
+            self.assertEqual(f.calls, 8)
+        finally:
+            _SESSION_STUFF.update(original)  # type: ignore
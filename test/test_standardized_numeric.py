@@ -0,0 +1,180 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+from requests import RequestException
+
+from calcbench import standardized_numeric
+from calcbench.models.standardized import StandardizedPoint
+from calcbench.standardized_numeric import (
+    build_data_frame,
+    build_data_frame_columnar,
+)
+
+
+def _point(i: int) -> dict:
+    return {
+        "ticker": f"T{i % 3}",
+        "metric": "revenue" if i % 2 else "netincome",
+        "fiscal_year": 2010 + i % 4,
+        "fiscal_period": i % 5,
+        "calendar_year": 2010 + i % 4,
+        "calendar_period": i % 5,
+        "value": float(i) if i % 3 else i,
+        "preliminary": bool(i % 2),
+        "XBRL": True,
+        "CIK": "0000789019",
+        "date_reported": f"2021-02-{1 + i % 27:02d}T08:42:38",
+        "period_start": "2020-01-01T00:00:00",
+        "period_end": "2020-12-31T00:00:00",
+        "date_modified": "2021-03-01T00:00:00.123",
+        "date_XBRL_confirmed": "2021-03-01T00:00:00",
+        "revision_number": i,
+        "standardized_id": i,
+        "filing_type": "10-K",
+    }
+
+
+class ColumnarDataFrameTest(TestCase):
+    def test_same_as_pydantic(self):
+        """
+        The columnar engine should build the same frame as the pydantic engine
+        """
+        rows = [_point(i) for i in range(200)]
+        for point_in_time in (True, False):
+            expected = build_data_frame(
+                [StandardizedPoint(**r) for r in rows], point_in_time=point_in_time
+            )
+            actual = build_data_frame_columnar(rows, point_in_time=point_in_time)
+            fiscal_periods = actual.index.levels[
+                actual.index.names.index("fiscal_period")
+            ]
+            actual.index = actual.index.set_levels(
+                fiscal_periods.astype("string"), level="fiscal_period"
+            )
+            if point_in_time:
+                expected = expected.drop(columns="date_downloaded")
+                actual = actual.drop(columns="date_downloaded")
+                self.assertEqual(set(expected.columns), set(actual.columns))
+                actual = actual[expected.columns]
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+            self.assertTrue(pd.api.types.is_datetime64_any_dtype(actual["period_end"]))
+
+    def test_dtypes(self):
+        """
+        fiscal_period is categorical, dates have the same dtype as the pydantic engine, even when they are all missing
+        """
+        rows = [{**_point(i), "date_XBRL_confirmed": None} for i in range(20)]
+        expected = build_data_frame(
+            [StandardizedPoint(**r) for r in rows], point_in_time=True
+        )
+        actual = build_data_frame_columnar(rows, point_in_time=True)
+        for column in standardized_numeric._DATE_COLUMNS - {"date_reported"}:
+            self.assertEqual(actual[column].dtype, expected[column].dtype, column)
+        self.assertEqual(
+            actual.index.get_level_values("date_reported").dtype,
+            expected.index.get_level_values("date_reported").dtype,
+        )
+        self.assertIsInstance(
+            actual.index.get_level_values("fiscal_period").dtype, pd.CategoricalDtype
+        )
+
+    def test_batches_stay_categorical(self):
+        data = standardized_numeric._build_data_frame_from_batches(
+            [[_point(i) for i in range(0, 10)], [_point(i) for i in range(10, 30)]],
+            point_in_time=False,
+            builder=build_data_frame_columnar,
+        )
+        fiscal_periods = data.index.get_level_values("fiscal_period")
+        self.assertIsInstance(fiscal_periods.dtype, pd.CategoricalDtype)
+        self.assertTrue(data.index.is_monotonic_increasing)
+
+    def test_missing_required_field(self):
+        row = _point(1)
+        del row["ticker"]
+        with self.assertRaises(ValueError):
+            build_data_frame_columnar([row], point_in_time=False)
+
+
+class ShardingTest(TestCase):
+    def test_failing_company_is_isolated(self):
+        """
+        A company that always fails should not lose the data for the other companies in its shard
+        """
+
+        def fake_data_frame(arguments, batch_size, engine):
+            if "BAD" in arguments["company_identifiers"]:
+                raise RequestException("server error")
+            rows = [
+                {**_point(i), "ticker": ticker, "fiscal_year": arguments["start_year"]}
+                for ticker in arguments["company_identifiers"]
+                for i in range(2)
+            ]
+            return build_data_frame_columnar(rows, point_in_time=False)
+
+        tickers = ["A", "B", "BAD", "C", "D", "E"]
+        with patch.object(
+            standardized_numeric, "_standardized_data_frame", fake_data_frame
+        ), self.assertWarns(UserWarning):
+            data = standardized_numeric.standardized(
+                company_identifiers=tickers,
+                metrics=["revenue"],
+                fiscal_year_range=(2010, 2013),
+                companies_per_shard=3,
+                years_per_shard=2,
+                max_workers=2,
+            )
+        self.assertEqual(data.attrs["failed_company_identifiers"], ["BAD"])
+        self.assertEqual(
+            sorted(data.index.get_level_values("ticker").unique()),
+            ["A", "B", "C", "D", "E"],
+        )
+        self.assertEqual(
+            sorted(data.index.get_level_values("fiscal_period").str[:4].unique()),
+            ["2010", "2012"],
+        )
+
+    def test_parse_error_is_raised(self):
+        """
+        A response that can not be parsed is a bug, not a failed company
+        """
+
+        def fake_data_frame(arguments, batch_size, engine):
+            raise ValueError("bad response")
+
+        with patch.object(
+            standardized_numeric, "_standardized_data_frame", fake_data_frame
+        ), self.assertRaises(ValueError):
+            standardized_numeric.standardized(
+                company_identifiers=["A", "B"],
+                metrics=["revenue"],
+                companies_per_shard=1,
+            )
+
+    def test_failing_entire_universe_shard_is_recorded(self):
+        """
+        A shard for the entire universe can not be split, its years are recorded
+        """
+
+        def fake_data_frame(arguments, batch_size, engine):
+            if arguments["start_year"] == 2012:
+                raise RequestException("server error")
+            rows = [
+                {**_point(i), "fiscal_year": arguments["start_year"]} for i in range(2)
+            ]
+            return build_data_frame_columnar(rows, point_in_time=False)
+
+        with patch.object(
+            standardized_numeric, "_standardized_data_frame", fake_data_frame
+        ), self.assertWarns(UserWarning):
+            data = standardized_numeric.standardized(
+                metrics=["revenue"],
+                fiscal_year_range=(2010, 2013),
+                years_per_shard=2,
+            )
+        self.assertEqual(data.attrs["failed_shards"], [(2012, 2013)])
+        self.assertEqual(data.attrs["failed_company_identifiers"], [])
+        self.assertEqual(
+            list(data.index.get_level_values("fiscal_period").str[:4].unique()),
+            ["2010"],
+        )
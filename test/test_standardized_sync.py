@@ -0,0 +1,162 @@
+import tempfile
+import warnings
+from datetime import datetime
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import pandas as pd
+import requests
+
+from calcbench import standardized_sync
+from calcbench.standardized_numeric import build_data_frame_columnar
+
+
+def _point(standardized_id: int, ticker: str, value: float, modified: str) -> dict:
+    return {
+        "ticker": ticker,
+        "metric": "revenue",
+        "fiscal_year": 2020,
+        "fiscal_period": standardized_id % 5,
+        "calendar_year": 2020,
+        "calendar_period": standardized_id % 5,
+        "value": value,
+        "preliminary": False,
+        "CIK": "1",
+        "date_reported": "2021-01-01T00:00:00",
+        "date_modified": modified,
+        "standardized_id": standardized_id,
+    }
+
+
+class SyncTest(TestCase):
+    def test_incremental_sync(self):
+        pulls = [
+            [
+                _point(1, "MSFT", 1, "2021-01-01T00:00:00"),
+                _point(2, "MSFT", 2, "2021-01-02T00:00:00"),
+                _point(3, "ORCL", 3, "2021-01-03T00:00:00"),
+            ],
+            [
+                _point(2, "MSFT", 20, "2021-02-01T00:00:00"),
+                _point(4, "GOOG", 4, "2021-02-02T00:00:00"),
+            ],
+        ]
+        calls = []
+
+        def fake_standardized(**kwargs):
+            calls.append(kwargs)
+            return build_data_frame_columnar(pulls[len(calls) - 1], point_in_time=True)
+
+        with tempfile.TemporaryDirectory() as root_path, patch.object(
+            standardized_sync, "standardized", fake_standardized
+        ):
+            for _ in pulls:
+                standardized_sync.sync_standardized_point_in_time(
+                    root_path, company_identifiers=["MSFT", "ORCL", "GOOG"]
+                )
+            data = standardized_sync.read_standardized_point_in_time(root_path)
+            state = standardized_sync._read_state(Path(root_path))
+
+        self.assertIsNone(calls[0]["start_date"])
+        self.assertEqual(calls[1]["start_date"], datetime(2021, 1, 3))
+        self.assertTrue(calls[1]["all_modifications"])
+        self.assertEqual(state["high_water_mark"], "2021-02-02T00:00:00")
+        values = data.set_index("standardized_id")["value"].sort_index()
+        self.assertEqual(values.to_dict(), {1: 1, 2: 20, 3: 3, 4: 4})
+        self.assertEqual(
+            data.set_index("standardized_id")["ticker"]
+            .astype(str)
+            .sort_index()
+            .tolist(),
+            ["MSFT", "MSFT", "ORCL", "GOOG"],
+        )
+
+    def test_ticker_change(self):
+        pulls = [
+            [
+                _point(1, "FB", 1, "2021-01-01T00:00:00"),
+                _point(2, "FB", 2, "2021-01-01T00:00:00"),
+            ],
+            [_point(1, "META", 10, "2021-02-01T00:00:00")],
+        ]
+
+        with tempfile.TemporaryDirectory() as root_path, patch.object(
+            standardized_sync,
+            "standardized",
+            lambda **kwargs: build_data_frame_columnar(
+                pulls.pop(0), point_in_time=True
+            ),
+        ):
+            while pulls:
+                standardized_sync.sync_standardized_point_in_time(
+                    root_path, company_identifiers=["META"]
+                )
+            data = standardized_sync.read_standardized_point_in_time(root_path)
+
+        data = data.set_index("standardized_id").sort_index()
+        self.assertEqual(data["value"].to_dict(), {1: 10, 2: 2})
+        self.assertEqual(data["ticker"].astype(str).tolist(), ["META", "FB"])
+
+    def test_resync_point_without_key(self):
+        """
+        Points without a standardized_id are replaced, not duplicated, when they are synced again
+        """
+        point = {**_point(1, "MSFT", 1, "2021-01-01T00:00:00"), "standardized_id": None}
+        pulls = [
+            [point, _point(2, "MSFT", 2, "2021-01-01T00:00:00")],
+            [{**point, "value": 10.0, "date_modified": "2021-02-01T00:00:00"}],
+        ]
+
+        with tempfile.TemporaryDirectory() as root_path, patch.object(
+            standardized_sync,
+            "standardized",
+            lambda **kwargs: build_data_frame_columnar(
+                pulls.pop(0), point_in_time=True
+            ),
+        ):
+            while pulls:
+                standardized_sync.sync_standardized_point_in_time(
+                    root_path, company_identifiers=["MSFT"]
+                )
+            data = standardized_sync.read_standardized_point_in_time(root_path)
+
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[data["standardized_id"].isna()]["value"].tolist(), [10])
+
+    @patch("time.sleep")
+    def test_failed_shard(self, sleep):
+        failing = {"ORCL"}
+        points = {
+            "MSFT": _point(1, "MSFT", 1, "2021-01-01T00:00:00"),
+            "ORCL": _point(2, "ORCL", 2, "2021-01-02T00:00:00"),
+        }
+        start_dates = []
+
+        def fake_json_POST(end_point, payload):
+            start_dates.append(payload.periodParameters.dateRange)
+            (ticker,) = payload.companiesParameters.companyIdentifiers
+            if ticker in failing:
+                raise requests.HTTPError(response=requests.Response())
+            return [points[ticker]]
+
+        with tempfile.TemporaryDirectory() as root_path, patch(
+            "calcbench.standardized_numeric._json_POST", fake_json_POST
+        ), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            standardized_sync.sync_standardized_point_in_time(
+                root_path, company_identifiers=["MSFT", "ORCL"], companies_per_shard=1
+            )
+            state = standardized_sync._read_state(Path(root_path))
+            self.assertIsNone(state["high_water_mark"])
+            failing.clear()
+            start_dates.clear()
+            standardized_sync.sync_standardized_point_in_time(
+                root_path, company_identifiers=["MSFT", "ORCL"], companies_per_shard=1
+            )
+            state = standardized_sync._read_state(Path(root_path))
+            data = standardized_sync.read_standardized_point_in_time(root_path)
+
+        self.assertEqual(start_dates, [None, None])
+        self.assertEqual(state["high_water_mark"], "2021-01-02T00:00:00")
+        self.assertEqual(sorted(data["standardized_id"]), [1, 2])